@@ -3,14 +3,15 @@
 import os
 import json
 import logging
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from auth.gmail_service import build_service
 from config.settings import settings
 from models.database import get_db_manager
 
@@ -25,6 +26,11 @@ class GmailAuthHandler:
         self.redirect_uri = settings.GOOGLE_REDIRECT_URI
         self.scopes = settings.GMAIL_SCOPES
         
+        # Per-user Gmail service cache: user_email -> (service, expires_at)
+        self._service_cache = {}
+        self._service_cache_lock = threading.Lock()
+        self.service_expiry_margin = timedelta(minutes=5)
+        
     def get_authorization_url(self, user_id: str, state: str = None) -> Tuple[str, str]:
         """
         Generate OAuth authorization URL for Gmail access
@@ -211,6 +217,7 @@ class GmailAuthHandler:
                 'scopes': []
             }
             get_db_manager().create_or_update_user(user.to_dict(), credentials_data)
+            self.invalidate_gmail_service(user_email)
             
             logger.info(f"Revoked credentials for user: {user_email}")
             return True
@@ -243,12 +250,11 @@ class GmailAuthHandler:
             True if Gmail access is working, False otherwise
         """
         try:
-            credentials = self.get_valid_credentials(user_email)
-            if not credentials:
+            service = self.get_gmail_service(user_email)
+            if not service:
                 return False
             
-            # Build Gmail service and test with a simple call
-            service = build('gmail', 'v1', credentials=credentials)
+            # Test the cached Gmail service with a simple call
             profile = service.users().getProfile(userId='me').execute()
             
             logger.info(f"Gmail access test successful for {user_email}")
@@ -258,6 +264,45 @@ class GmailAuthHandler:
             logger.error(f"Gmail access test failed for {user_email}: {str(e)}")
             return False
     
+    def get_gmail_service(self, user_email: str):
+        """
+        Get a cached Gmail service for a user, rebuilding it when the credentials expire
+        
+        Args:
+            user_email: Email of the user
+            
+        Returns:
+            Gmail service object or None if the user has no valid credentials
+        """
+        with self._service_cache_lock:
+            cached = self._service_cache.get(user_email)
+        
+        if cached and datetime.utcnow() < cached[1]:
+            return cached[0]
+        
+        credentials = self.get_valid_credentials(user_email)
+        if not credentials:
+            self.invalidate_gmail_service(user_email)
+            return None
+        
+        service = build_service('gmail', 'v1', credentials)
+        
+        # Expire the cached service shortly before the access token does
+        if credentials.expiry:
+            expires_at = credentials.expiry - self.service_expiry_margin
+        else:
+            expires_at = datetime.utcnow() + timedelta(minutes=settings.GMAIL_SERVICE_CACHE_TTL_MINUTES)
+        
+        with self._service_cache_lock:
+            self._service_cache[user_email] = (service, expires_at)
+        
+        return service
+    
+    def invalidate_gmail_service(self, user_email: str):
+        """Drop a user's cached Gmail service"""
+        with self._service_cache_lock:
+            self._service_cache.pop(user_email, None)
+    
     def get_user_by_email(self, user_email: str) -> Optional[Dict]:
         """
         Get user information by email
@@ -286,7 +331,7 @@ class GmailAuthHandler:
             Dictionary containing user information
         """
         try:
-            oauth2_service = build('oauth2', 'v2', credentials=credentials)
+            oauth2_service = build_service('oauth2', 'v2', credentials)
             user_info = oauth2_service.userinfo().get().execute()
             return user_info
             
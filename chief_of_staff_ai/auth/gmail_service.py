@@ -0,0 +1,121 @@
+# Builds Google API service objects from cached discovery documents over a pooled transport
+
+import json
+import logging
+import queue
+import threading
+from typing import Dict
+
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import build_http
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PooledHttp:
+    """
+    Thread-safe httplib2 transport backed by a pool of keep-alive connections
+
+    httplib2.Http objects are not thread-safe, so each request checks out its own
+    Http object and returns it afterwards; open TLS connections are reused across
+    requests instead of being re-negotiated for every service built.
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._pool = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+        # Attributes read by google_auth_httplib2.AuthorizedHttp
+        template = build_http()
+        self.timeout = template.timeout
+        self.follow_redirects = template.follow_redirects
+        self.redirect_codes = template.redirect_codes
+        self.connections = {}
+
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                return build_http()
+
+        # Pool exhausted: wait for another thread to return a connection
+        return self._pool.get()
+
+    def request(self, *args, **kwargs):
+        http = self._checkout()
+        try:
+            return http.request(*args, **kwargs)
+        finally:
+            self._pool.put(http)
+
+    def close(self):
+        """Close every idle pooled connection"""
+        while True:
+            try:
+                http = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            http.close()
+            with self._lock:
+                self._created -= 1
+
+
+# Parsed discovery documents, shared by every service built in this process
+_discovery_documents: Dict[str, Dict] = {}
+_discovery_lock = threading.Lock()
+
+# Keep-alive connections shared by every Google API call in this process
+http_pool = PooledHttp(max_size=settings.GOOGLE_HTTP_POOL_SIZE)
+
+
+def get_discovery_document(api: str, version: str) -> Dict:
+    """Load and parse a discovery document once, preferring the copy bundled with the client library"""
+    key = f"{api}.{version}"
+
+    with _discovery_lock:
+        document = _discovery_documents.get(key)
+        if document is None:
+            content = get_static_doc(api, version)
+            if content is None:
+                # Not bundled: let the client library fetch it once, then reuse the parsed copy
+                service = build(api, version, http=build_http(), static_discovery=False, cache_discovery=False)
+                content = service._rootDesc
+            document = json.loads(content) if isinstance(content, str) else content
+            _discovery_documents[key] = document
+
+    return document
+
+
+def build_service(api: str, version: str, credentials: Credentials):
+    """
+    Build a Google API service object without re-reading its discovery document
+
+    Args:
+        api: API name, e.g. 'gmail'
+        version: API version, e.g. 'v1'
+        credentials: Valid Google credentials
+
+    Returns:
+        Service object whose requests run over the shared connection pool
+    """
+    return build_from_document(
+        get_discovery_document(api, version),
+        http=AuthorizedHttp(credentials, http=http_pool)
+    )
+
+
+def is_thread_safe_http(http) -> bool:
+    """Check whether a service's transport can be shared between threads"""
+    return isinstance(getattr(http, 'http', None), PooledHttp)
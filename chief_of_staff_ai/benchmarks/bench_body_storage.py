@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: inline email bodies vs the compressed email_bodies side table
+
+Builds a SQLite database in the previous layout, with body_text, body_html and
+body_clean stored inline in emails, copies it, and lets DatabaseManager migrate
+the copy into email_bodies. Reports the size of both databases, times a page of
+the list view query on each, the same page through the ORM with to_dict(), and
+loading the body of a single email from the side table on demand.
+
+Usage:
+    python benchmarks/bench_body_storage.py
+    python benchmarks/bench_body_storage.py --messages 5000 --paragraphs 80
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+WORK_DIR = tempfile.mkdtemp(prefix='bench_body_storage_')
+LEGACY_PATH = os.path.join(WORK_DIR, 'legacy.db')
+MIGRATED_PATH = os.path.join(WORK_DIR, 'migrated.db')
+
+# Settings are read at import time; point DatabaseManager at the migrated copy
+os.environ['DATABASE_URL'] = f'sqlite:///{MIGRATED_PATH}'
+os.environ['FLASK_DEBUG'] = 'False'
+
+from harness import run_benchmark, print_results
+
+from models.database import get_db_manager, Email, with_bodies
+
+PAGE_SIZE = 50
+
+
+def build_legacy_database(path: str, count: int, paragraphs: int):
+    """Create an emails table with bodies stored inline, as before email_bodies existed"""
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE emails (id INTEGER PRIMARY KEY, user_id INTEGER, gmail_id VARCHAR(255), '
+        'sender VARCHAR(255), sender_name VARCHAR(255), subject TEXT, '
+        'body_text TEXT, body_html TEXT, body_clean TEXT, body_preview TEXT, snippet TEXT, '
+        'email_date DATETIME, normalizer_version VARCHAR(50))'
+    )
+    connection.execute('CREATE INDEX idx_emails_user_date ON emails (user_id, email_date)')
+
+    started = datetime(2026, 1, 1)
+    rows = []
+    for index in range(count):
+        text = '\n\n'.join(
+            f"Paragraph {p} of message {index}: please review the attached numbers before Friday's call."
+            for p in range(paragraphs)
+        )
+        html = '<html><head><style>td { font-family: Arial; }</style></head><body><table>' + ''.join(
+            f'<tr><td style="padding:8px"><p>Paragraph {p} of message {index}: '
+            f'please review the <b>attached numbers</b> before Friday\'s call.</p></td></tr>'
+            for p in range(paragraphs)
+        ) + '</table></body></html>'
+        rows.append((
+            index + 1, 1, f'm{index}', f'sender{index % 40}@example.com', f'Sender {index % 40}',
+            f'Quarterly report {index}', text, html, text, text[:300], text[:120],
+            (started + timedelta(minutes=index)).isoformat(' '), 'v1'
+        ))
+
+    connection.executemany('INSERT INTO emails VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    connection.commit()
+    connection.execute('VACUUM')
+    connection.close()
+
+
+def vacuum(path: str):
+    connection = sqlite3.connect(path)
+    connection.execute('VACUUM')
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark inline vs side-table email body storage')
+    parser.add_argument('--messages', type=int, default=2000, help='Number of synthetic emails')
+    parser.add_argument('--paragraphs', type=int, default=40, help='Paragraphs per body')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    args = parser.parse_args()
+
+    build_legacy_database(LEGACY_PATH, args.messages, args.paragraphs)
+    shutil.copyfile(LEGACY_PATH, MIGRATED_PATH)
+
+    # Creating the manager runs the migration into email_bodies
+    db = get_db_manager()
+    db.engine.dispose()
+    vacuum(MIGRATED_PATH)
+
+    pages = list(range(0, args.messages, PAGE_SIZE))
+    legacy = sqlite3.connect(LEGACY_PATH)
+
+    def list_legacy(offset: int):
+        # The previous mapping selected every column, bodies included
+        return legacy.execute(
+            'SELECT * FROM emails WHERE user_id = 1 ORDER BY email_date DESC LIMIT ? OFFSET ?',
+            (PAGE_SIZE, offset)
+        ).fetchall()
+
+    def list_migrated(offset: int):
+        with db.get_session() as session:
+            emails = session.query(Email).filter(Email.user_id == 1).order_by(
+                Email.email_date.desc()
+            ).limit(PAGE_SIZE).offset(offset).all()
+            return [email.to_dict() for email in emails]
+
+    def list_migrated_raw(offset: int):
+        connection = db.engine.raw_connection()
+        try:
+            return connection.execute(
+                'SELECT * FROM emails WHERE user_id = 1 ORDER BY email_date DESC LIMIT ? OFFSET ?',
+                (PAGE_SIZE, offset)
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def load_body(email_id: int):
+        with db.get_session() as session:
+            email = session.query(Email).options(with_bodies('body_html')).filter(Email.id == email_id).one()
+            return email.body.body_html
+
+    print_results(
+        f"List view, {PAGE_SIZE} emails per page ({args.messages} emails, {args.paragraphs} paragraphs)",
+        [
+            run_benchmark('inline bodies, SELECT *', list_legacy, pages, args.repeat),
+            run_benchmark('email_bodies, SELECT *', list_migrated_raw, pages, args.repeat),
+            run_benchmark('email_bodies, ORM + to_dict', list_migrated, pages, args.repeat)
+        ]
+    )
+    print_results(
+        'Single body on demand',
+        [run_benchmark('email_bodies, body_html', load_body, list(range(1, min(args.messages, 500) + 1)), args.repeat)]
+    )
+
+    legacy.close()
+    legacy_kb = os.path.getsize(LEGACY_PATH) / 1024
+    migrated_kb = os.path.getsize(MIGRATED_PATH) / 1024
+    print(f"\nDatabase size: inline {legacy_kb:.0f} KB, email_bodies {migrated_kb:.0f} KB "
+          f"({legacy_kb / migrated_kb:.1f}x smaller)")
+
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
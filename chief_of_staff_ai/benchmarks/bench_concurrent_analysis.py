@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sequential vs concurrent Claude analysis calls
+
+Replaces the Anthropic client with one that sleeps for a random API latency
+(no network, no API key) and compares one-at-a-time calls, as
+process_user_emails_intelligently used to make them, with ConcurrentAnalyzer at
+several concurrency limits. Wall time is what matters here, so this reports it
+directly instead of using the CPU-oriented harness.
+
+Usage:
+    python benchmarks/bench_concurrent_analysis.py
+    python benchmarks/bench_concurrent_analysis.py --emails 50 --min-latency 2 --max-latency 8
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import harness  # noqa: F401  (makes the application packages importable)
+
+from processors.concurrent_analysis import ConcurrentAnalyzer
+
+
+class SimulatedMessages:
+    def __init__(self, latencies):
+        self.latencies = latencies
+
+    async def create(self, **request):
+        await asyncio.sleep(self.latencies[request['email_index']])
+        return request['email_index']
+
+
+class SimulatedAsyncClient:
+    def __init__(self, latencies):
+        self.messages = SimulatedMessages(latencies)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sequential vs concurrent analysis calls')
+    parser.add_argument('--emails', type=int, default=50, help='Number of emails analyzed')
+    parser.add_argument('--min-latency', type=float, default=0.2, help='Fastest simulated call, in seconds')
+    parser.add_argument('--max-latency', type=float, default=1.0, help='Slowest simulated call, in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 16, 50], help='Limits to compare')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    latencies = [rng.uniform(args.min_latency, args.max_latency) for _ in range(args.emails)]
+
+    def build_request(index: int) -> dict:
+        return {'email_index': index}
+
+    async def run(concurrency: int):
+        analyzer = ConcurrentAnalyzer(concurrency, client_factory=lambda: SimulatedAsyncClient(latencies))
+        return [result async for result in analyzer.stream(range(args.emails), build_request)]
+
+    print(f"\nAnalysis of {args.emails} emails, simulated latency {args.min_latency}-{args.max_latency}s per call")
+    print(f"{'case':<28} {'seconds':>9} {'speedup':>8}")
+
+    sequential = sum(latencies)
+    print(f"{'sequential (sum of calls)':<28} {sequential:>9.2f} {1:>7.2f}x")
+
+    for concurrency in args.concurrency:
+        started = time.perf_counter()
+        results = asyncio.run(run(concurrency))
+        elapsed = time.perf_counter() - started
+        assert sorted(index for index, _ in results) == list(range(args.emails))
+        print(f"{f'concurrent, limit {concurrency}':<28} {elapsed:>9.2f} {sequential / elapsed:>7.2f}x")
+
+    print(f"\nSlowest single call: {max(latencies):.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Benchmark: HTML-to-text backends used by EmailNormalizer
+
+Times the previous BeautifulSoup get_text() extraction against every backend
+in processors/html_to_text.py over a corpus of HTML emails. Without --corpus a
+synthetic corpus is generated in the shapes that dominate real inboxes:
+table-layout marketing mail with hidden preheaders, Outlook conditional
+comments and large <style> blocks, transactional receipts, and short personal
+replies with quoted history.
+
+A real corpus can be supplied as a directory of .html files (used as is) and/or
+.eml files (their first text/html part is used).
+
+Usage:
+    python benchmarks/bench_html_to_text.py
+    python benchmarks/bench_html_to_text.py --messages 500 --repeat 5
+    python benchmarks/bench_html_to_text.py --corpus ~/mail-samples
+"""
+
+import argparse
+import os
+import random
+from email import policy
+from email.parser import BytesParser
+
+from harness import run_benchmark, print_results
+
+from processors.html_to_text import BACKENDS, LINE_BREAK
+
+STYLE_BLOCK = '<style type="text/css">' + ''.join(
+    f'.c{n} {{ font-family: Helvetica, Arial, sans-serif; font-size: {10 + n % 8}px; color: #{n * 9973 % 0xffffff:06x}; }}\n'
+    for n in range(120)
+) + '@media only screen and (max-width: 600px) { .stack { display: block !important; width: 100% !important; } }</style>'
+
+# Text of the hidden preview line shown by mail clients but not in the message body
+PREHEADER = 'Preview:'
+
+WORDS = ('quarterly launch offer member exclusive review invoice shipping order account update '
+         'team schedule project budget deadline meeting agenda notes draft proposal client').split()
+
+
+def sentence(rng: random.Random, words: int = 14) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def marketing_email(rng: random.Random, index: int) -> str:
+    """Nested-table newsletter with preheader, MSO comments, tracking pixel and footer"""
+    products = ''.join(
+        f'''<tr><td class="stack" width="50%" style="padding:12px"><table role="presentation" width="100%"><tr>
+        <td><a href="https://shop.example.com/p/{index}/{n}?utm_source=email&amp;utm_medium={n}">
+        <img src="https://cdn.example.com/i/{n}.jpg" alt="Product {n}" width="260" style="display:block;border:0"></a></td></tr>
+        <tr><td class="c{n % 120}" style="font-size:16px;line-height:22px">{sentence(rng, 8)}</td></tr>
+        <tr><td><span style="font-weight:bold">&euro;{rng.randint(5, 500)}.99</span>&nbsp;&ndash;&nbsp;{sentence(rng, 5)}</td></tr>
+        </table></td></tr>'''
+        for n in range(rng.randint(6, 14))
+    )
+    return f'''<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml"><head><meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+<title>Newsletter {index}</title>{STYLE_BLOCK}
+<!--[if mso]><xml><o:OfficeDocumentSettings><o:PixelsPerInch>96</o:PixelsPerInch></o:OfficeDocumentSettings></xml><![endif]-->
+</head><body style="margin:0;padding:0">
+<div style="display:none;max-height:0;overflow:hidden">{PREHEADER} {sentence(rng)} &zwnj;&nbsp;&zwnj;&nbsp;&zwnj;&nbsp;</div>
+<center><table role="presentation" width="100%" cellpadding="0" cellspacing="0" border="0"><tr><td align="center">
+<!--[if mso]><table width="600"><tr><td><![endif]-->
+<table role="presentation" width="600" style="max-width:600px"><tr><td><h1 style="font-size:28px">{sentence(rng, 6)}</h1></td></tr>
+<tr><td><p>{sentence(rng, 30)}</p><p>{sentence(rng, 25)}</p></td></tr>
+{products}
+<tr><td style="font-size:11px;color:#999">You are receiving this because you subscribed.<br>
+<a href="https://example.com/unsubscribe?u={index}">Unsubscribe</a> | <a href="https://example.com/prefs">Preferences</a><br>
+Example Inc., 1 Market St, San Francisco, CA</td></tr></table>
+<!--[if mso]></td></tr></table><![endif]-->
+</td></tr></table></center>
+<img src="https://t.example.com/open/{index}.gif" width="1" height="1" style="display:none" alt="">
+<script type="application/ld+json">{{"@context": "http://schema.org", "@type": "EmailMessage"}}</script>
+</body></html>'''
+
+
+def receipt_email(rng: random.Random, index: int) -> str:
+    """Transactional receipt with an itemized table"""
+    rows = ''.join(
+        f'<tr><td>{sentence(rng, 4)}</td><td align="right">{rng.randint(1, 5)}</td>'
+        f'<td align="right">${rng.randint(1, 300)}.{rng.randint(0, 99):02d}</td></tr>'
+        for _ in range(rng.randint(2, 12))
+    )
+    return f'''<html><head><style>td {{ padding: 4px 8px; }} .total {{ font-weight: bold; }}</style></head>
+<body><div style="font-family:Arial"><p>Hi there,</p><p>Thanks for your order #{100000 + index}. {sentence(rng)}</p>
+<table border="0" cellspacing="0"><thead><tr><th>Item</th><th>Qty</th><th>Price</th></tr></thead><tbody>{rows}</tbody>
+<tfoot><tr><td colspan="2" class="total">Total</td><td align="right">${rng.randint(20, 900)}.00</td></tr></tfoot></table>
+<p>Questions? Reply to this email or visit <a href="https://help.example.com">help.example.com</a>.</p></div></body></html>'''
+
+
+def personal_email(rng: random.Random, index: int) -> str:
+    """Short Gmail-style reply with quoted history"""
+    quoted = ''.join(f'<div>{sentence(rng)}</div>' for _ in range(rng.randint(3, 10)))
+    return f'''<div dir="ltr"><div>Hi Sam,</div><div><br></div><div>{sentence(rng, 20)}</div><div>{sentence(rng, 12)}</div>
+<div><br></div><div>Thanks,<br>Alex</div></div><br><div class="gmail_quote"><div dir="ltr" class="gmail_attr">
+On Mon, Oct 12, 2026 at 10:{index % 60:02d} AM Sam &lt;sam@example.com&gt; wrote:<br></div>
+<blockquote class="gmail_quote" style="margin:0px 0px 0px 0.8ex;border-left:1px solid rgb(204,204,204);padding-left:1ex">
+{quoted}</blockquote></div>'''
+
+
+def synthetic_corpus(count: int, seed: int = 7):
+    """Mix of 60% marketing, 25% receipts, 15% personal mail"""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            corpus.append(marketing_email(rng, index))
+        elif roll < 0.85:
+            corpus.append(receipt_email(rng, index))
+        else:
+            corpus.append(personal_email(rng, index))
+    return corpus
+
+
+def load_corpus(directory: str):
+    """Read .html files and the HTML part of .eml files from a directory"""
+    parser = BytesParser(policy=policy.default)
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(('.html', '.htm')):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                corpus.append(f.read())
+        elif name.endswith('.eml'):
+            with open(path, 'rb') as f:
+                message = parser.parse(f)
+            part = message.get_body(preferencelist=('html',))
+            if part is not None:
+                corpus.append(part.get_content())
+    return corpus
+
+
+def legacy_extract(html: str) -> str:
+    """The extraction EmailNormalizer used before the pluggable converters"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(['script', 'style']):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HTML-to-text backends')
+    parser.add_argument('--messages', type=int, default=300, help='Synthetic corpus size')
+    parser.add_argument('--corpus', help='Directory of .html/.eml files to use instead of the synthetic corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.messages)
+    if not corpus:
+        parser.error('The corpus is empty')
+
+    converters = {}
+    for name, backend in BACKENDS.items():
+        try:
+            converters[name] = backend()
+        except ImportError as e:
+            print(f"Skipping {name}: {str(e)}")
+
+    results = [run_benchmark('legacy BeautifulSoup get_text', legacy_extract, corpus, args.repeat)]
+    results += [run_benchmark(f'{name} backend', converter.convert, corpus, args.repeat)
+                for name, converter in converters.items()]
+
+    total_kb = sum(len(html) for html in corpus) / 1024
+    print_results(f"HTML to text ({len(corpus)} emails, {total_kb:.0f} KB of HTML)", results)
+
+    # Every backend must produce the same text; report any email where they disagree
+    outputs = {name: [converter.convert(html) for html in corpus] for name, converter in converters.items()}
+    reference = outputs.get('bs4') or next(iter(outputs.values()))
+    for name, texts in outputs.items():
+        mismatches = sum(1 for text, expected in zip(texts, reference) if text != expected)
+        print(f"{name}: {mismatches}/{len(corpus)} emails differ from the bs4 backend")
+
+    # Hidden preheaders must not leak into the text
+    legacy_leaks = sum(1 for html in corpus if PREHEADER in legacy_extract(html))
+    backend_leaks = sum(1 for text in reference if PREHEADER in text or LINE_BREAK in text)
+    print(f"Emails with hidden preheader text in the output: legacy {legacy_leaks}, backends {backend_leaks}")
+
+
+if __name__ == '__main__':
+    main()
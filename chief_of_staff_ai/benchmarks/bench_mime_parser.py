@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Gmail format='full' JSON payload processing vs format='raw' MIME parsing
+
+Builds synthetic multipart messages (UTF-8 text part, ISO-8859-1 HTML part and an
+optional attachment), encodes each one the way Gmail returns it in both formats,
+and times decoding the API response into our standard email dictionary.
+
+Usage:
+    python benchmarks/bench_mime_parser.py
+    python benchmarks/bench_mime_parser.py --messages 2000 --attachment-kb 64
+"""
+
+import argparse
+import base64
+import json
+from email.message import EmailMessage
+from email.utils import formatdate
+
+from harness import run_benchmark, print_results
+
+from ingest.gmail_fetcher import GmailFetcher
+from ingest.mime_parser import mime_parser
+
+HTML_MARKER = 'Résumé attached'
+
+
+def build_message(index: int, paragraphs: int, attachment_kb: int) -> EmailMessage:
+    """Build one synthetic message"""
+    text = '\n\n'.join(
+        f"Paragraph {p} of message {index}: please review the numbers before Friday's call."
+        for p in range(paragraphs)
+    )
+    html = '<html><body>' + ''.join(
+        f'<p>Paragraph {p} of message {index}: <b>{HTML_MARKER}</b> for the café meeting.</p>'
+        for p in range(paragraphs)
+    ) + '</body></html>'
+
+    message = EmailMessage()
+    message['From'] = f'Sender {index} <sender{index}@example.com>'
+    message['To'] = 'Alice Example <alice@example.com>, bob@example.com'
+    message['Cc'] = 'Carol <carol@example.com>'
+    message['Subject'] = f'Quarterly report {index}'
+    message['Date'] = formatdate(1791800000 + index * 60)
+    message.set_content(text, charset='utf-8')
+    message.add_alternative(html, subtype='html', charset='iso-8859-1')
+
+    if attachment_kb:
+        message.add_attachment(
+            bytes(range(256)) * (attachment_kb * 4),
+            maintype='application',
+            subtype='pdf',
+            filename=f'report-{index}.pdf'
+        )
+
+    return message
+
+
+def to_gmail_payload(part: EmailMessage, part_id: str = '') -> dict:
+    """Encode a MIME part the way Gmail's format='full' response does"""
+    payload = {
+        'partId': part_id,
+        'mimeType': part.get_content_type(),
+        'filename': part.get_filename() or '',
+        'headers': [{'name': name, 'value': str(value)} for name, value in part.items()]
+    }
+
+    if part.is_multipart():
+        payload['body'] = {'size': 0}
+        payload['parts'] = [
+            to_gmail_payload(child, f'{part_id}.{n}' if part_id else str(n))
+            for n, child in enumerate(part.iter_parts())
+        ]
+    else:
+        data = part.get_payload(decode=True) or b''
+        if part.get_filename():
+            # Attachment bodies are not inlined in format='full'
+            payload['body'] = {'attachmentId': f'ANGjdJ{part_id}', 'size': len(data)}
+        else:
+            payload['body'] = {'size': len(data), 'data': base64.urlsafe_b64encode(data).decode()}
+
+    return payload
+
+
+def build_responses(count: int, paragraphs: int, attachment_kb: int):
+    """Return the JSON response bodies for every message in both formats"""
+    full_responses = []
+    raw_responses = []
+
+    for index in range(count):
+        message = build_message(index, paragraphs, attachment_kb)
+        common = {
+            'id': f'm{index}',
+            'threadId': f't{index}',
+            'labelIds': ['INBOX', 'UNREAD'],
+            'snippet': 'Paragraph 0',
+            'historyId': '1000',
+            'internalDate': str((1791800000 + index * 60) * 1000)
+        }
+        raw_bytes = message.as_bytes()
+
+        full_responses.append(json.dumps(dict(common, sizeEstimate=len(raw_bytes), payload=to_gmail_payload(message))))
+        raw_responses.append(json.dumps(dict(
+            common,
+            sizeEstimate=len(raw_bytes),
+            raw=base64.urlsafe_b64encode(raw_bytes).decode()
+        )))
+
+    return full_responses, raw_responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Gmail full vs raw message processing')
+    parser.add_argument('--messages', type=int, default=1000, help='Number of synthetic messages')
+    parser.add_argument('--paragraphs', type=int, default=20, help='Paragraphs per body part')
+    parser.add_argument('--attachment-kb', type=int, default=0, help='Attachment size per message (0 for none)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    args = parser.parse_args()
+
+    full_responses, raw_responses = build_responses(args.messages, args.paragraphs, args.attachment_kb)
+    fetcher = GmailFetcher()
+
+    def process_full(response: str):
+        return fetcher._process_gmail_message(json.loads(response))
+
+    def process_raw(response: str):
+        return mime_parser.parse_gmail_message(json.loads(response))
+
+    print_results(
+        f"Message decoding ({args.messages} messages, {args.paragraphs} paragraphs, {args.attachment_kb} KB attachment)",
+        [
+            run_benchmark("format='full' JSON payload", process_full, full_responses, args.repeat),
+            run_benchmark("format='raw' BytesParser", process_raw, raw_responses, args.repeat)
+        ]
+    )
+
+    full_bytes = sum(len(response) for response in full_responses) / len(full_responses)
+    raw_bytes = sum(len(response) for response in raw_responses) / len(raw_responses)
+    print(f"\nMean response size: full {full_bytes / 1024:.1f} KB, raw {raw_bytes / 1024:.1f} KB")
+
+    # Charset handling: the HTML part is declared ISO-8859-1
+    full_correct = sum(HTML_MARKER in process_full(response)['body_html'] for response in full_responses)
+    raw_correct = sum(HTML_MARKER in process_raw(response)['body_html'] for response in raw_responses)
+    print(f"HTML bodies decoded correctly: full {full_correct}/{args.messages}, raw {raw_correct}/{args.messages}")
+
+
+if __name__ == '__main__':
+    main()
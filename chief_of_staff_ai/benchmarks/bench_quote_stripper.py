@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Benchmark: line-oriented QuoteStripper vs the previous DOTALL regex quote removal
+
+Correctness, including the sign-off cases, is covered by tests/test_quote_stripper.py.
+
+Two parts:
+
+1. Throughput over a corpus of ordinary replies, forwards and mobile replies.
+2. Scaling on pathological bodies, doubling the size each step: many lines
+   starting with "On" that never say "wrote:", many "From: <address>" lines,
+   a single huge paragraph, and long ">" quote runs. A linear algorithm takes
+   about 2x as long per doubling; the regex approach backtracks from every
+   candidate to the end of the body and takes about 4x.
+
+Usage:
+    python benchmarks/bench_quote_stripper.py
+    python benchmarks/bench_quote_stripper.py --max-lines 32000 --legacy-max-lines 4000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from harness import run_benchmark, print_results
+
+from processors.quote_stripper import quote_stripper
+
+LEGACY_PATTERNS = [
+    r'On .* wrote:.*',
+    r'From:.*\nSent:.*\nTo:.*\nSubject:.*',
+    r'-----Original Message-----.*',
+    r'> .*',
+    r'________________________________.*',
+    r'From: .*<.*>.*',
+    r'Sent from my .*',
+    r'\n\n.*On.*\d{4}.*at.*\d{1,2}:\d{2}.*wrote:'
+]
+
+
+def legacy_remove_quoted_text(text: str) -> str:
+    """The quote removal EmailNormalizer used before QuoteStripper"""
+    for pattern in LEGACY_PATTERNS:
+        text = re.sub(pattern, '', text, flags=re.DOTALL | re.IGNORECASE)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def ordinary_corpus(count: int, seed: int = 11):
+    """Replies with quoted history, Outlook replies, forwards and mobile replies"""
+    rng = random.Random(seed)
+    words = 'please review the budget before our meeting on friday and send notes to the team'.split()
+
+    def paragraph(length: int) -> str:
+        return ' '.join(rng.choice(words) for _ in range(length)).capitalize() + '.'
+
+    corpus = []
+    for index in range(count):
+        own = '\n\n'.join(paragraph(rng.randint(8, 30)) for _ in range(rng.randint(1, 4)))
+        history = '\n'.join('> ' + paragraph(12) for _ in range(rng.randint(5, 40)))
+        kind = index % 4
+        if kind == 0:
+            corpus.append(f"Hi Sam,\n\n{own}\n\nThanks,\nAlex\nDirector, Example Inc.\n+1 555 0100\n\n"
+                          f"On Mon, Oct 12, 2026 at 10:{index % 60:02d} AM Sam <sam@example.com> wrote:\n{history}")
+        elif kind == 1:
+            corpus.append(f"{own}\n\n________________________________\nFrom: Sam <sam@example.com>\n"
+                          f"Sent: Monday, October 12, 2026 10:00 AM\nTo: Alex\nSubject: Budget\n\n{history}")
+        elif kind == 2:
+            corpus.append(f"FYI\n\n---------- Forwarded message ---------\nFrom: Sam <sam@example.com>\n"
+                          f"Date: Mon, Oct 12, 2026\nSubject: Budget\nTo: Alex\n\n{own}")
+        else:
+            corpus.append(f"{own}\n\nSent from my iPhone\n\n> On Oct 12, 2026, at 10:00, Sam wrote:\n{history}")
+    return corpus
+
+
+def pathological_bodies(lines: int):
+    """One body per pathological shape, each about `lines` lines long"""
+    return {
+        'many "On" lines': '\n'.join(f'On Monday {n} the team met at 10:30 in 2026 and agreed' for n in range(lines)),
+        'many "From:" lines': '\n\n'.join(f'From: person{n} <p{n}@example.com> asked again' for n in range(lines)),
+        'one huge paragraph': ' '.join(f'On day {n} at 10:30 in 2026 someone said' for n in range(lines)),
+        'long ">" quote runs': '\n'.join(f'> On {n} quoted line' if n % 50 else 'reply line' for n in range(lines))
+    }
+
+
+def time_once(func, text: str) -> float:
+    started = time.perf_counter()
+    func(text)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark quote stripping')
+    parser.add_argument('--messages', type=int, default=2000, help='Ordinary corpus size')
+    parser.add_argument('--min-lines', type=int, default=1000, help='Smallest pathological body, in lines')
+    parser.add_argument('--max-lines', type=int, default=64000, help='Largest pathological body, in lines')
+    parser.add_argument('--legacy-max-lines', type=int, default=8000,
+                        help='Largest body given to the regex approach (it grows quadratically)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per corpus case')
+    args = parser.parse_args()
+
+    corpus = ordinary_corpus(args.messages)
+    print_results(
+        f"Ordinary replies ({len(corpus)} bodies)",
+        [
+            run_benchmark('legacy DOTALL regexes', legacy_remove_quoted_text, corpus, args.repeat),
+            run_benchmark('QuoteStripper', quote_stripper.strip, corpus, args.repeat)
+        ]
+    )
+
+    print("\nPathological bodies: seconds per body and growth per doubling (linear ~2x, quadratic ~4x)")
+    print(f"{'shape':<22} {'lines':>7} {'KB':>8} {'legacy s':>10} {'growth':>7} {'stripper s':>11} {'growth':>7}")
+
+    sizes = []
+    size = args.min_lines
+    while size <= args.max_lines:
+        sizes.append(size)
+        size *= 2
+
+    for shape in pathological_bodies(1):
+        previous_legacy = previous_new = None
+        for lines in sizes:
+            text = pathological_bodies(lines)[shape]
+
+            legacy_seconds = time_once(legacy_remove_quoted_text, text) if lines <= args.legacy_max_lines else None
+            new_seconds = min(time_once(quote_stripper.strip, text) for _ in range(3))
+
+            legacy_growth = f"{legacy_seconds / previous_legacy:.1f}x" if legacy_seconds and previous_legacy else ''
+            new_growth = f"{new_seconds / previous_new:.1f}x" if previous_new else ''
+            legacy_cell = f"{legacy_seconds:.4f}" if legacy_seconds is not None else 'skipped'
+
+            print(f"{shape:<22} {lines:>7} {len(text) / 1024:>8.0f} {legacy_cell:>10} {legacy_growth:>7} "
+                  f"{new_seconds:>11.5f} {new_growth:>7}")
+
+            previous_legacy, previous_new = legacy_seconds, new_seconds
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# Shared timing and memory measurement for the benchmark scripts
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List
+
+# Benchmarks are run as scripts; make the application packages importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_benchmark(name: str, func: Callable, inputs: List, repeat: int = 3) -> Dict:
+    """
+    Time func over every input and measure its peak traced memory
+
+    Args:
+        name: Label for the result row
+        func: Callable applied to each input
+        inputs: Inputs processed per run
+        repeat: Number of timed runs; the fastest is reported
+
+    Returns:
+        Dictionary with the best run time, throughput and peak memory
+    """
+    # Warm up caches and lazy imports outside the measured runs
+    for item in inputs[:10]:
+        func(item)
+
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        for item in inputs:
+            func(item)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Memory is measured in a separate run so tracing does not skew the timings
+    gc.collect()
+    tracemalloc.start()
+    for item in inputs:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'items': len(inputs),
+        'seconds': best,
+        'items_per_second': len(inputs) / best if best else float('inf'),
+        'peak_kb': peak / 1024
+    }
+
+
+def print_results(title: str, results: Iterable[Dict]):
+    """Print benchmark results as a table, with speedups relative to the first row"""
+    results = list(results)
+    baseline = results[0]['seconds'] if results else None
+
+    print(f"\n{title}")
+    print(f"{'case':<36} {'items':>7} {'seconds':>9} {'items/s':>11} {'peak KB':>10} {'speedup':>8}")
+    for result in results:
+        speedup = baseline / result['seconds'] if result['seconds'] else float('inf')
+        print(f"{result['name']:<36} {result['items']:>7} {result['seconds']:>9.4f} "
+              f"{result['items_per_second']:>11.1f} {result['peak_kb']:>10.1f} {speedup:>7.2f}x")
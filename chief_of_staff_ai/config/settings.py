@@ -40,6 +40,10 @@ class Settings:
     # Claude/Anthropic Configuration
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
     CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+    CLAUDE_ANALYSIS_CONCURRENCY: int = int(os.getenv('CLAUDE_ANALYSIS_CONCURRENCY', '16'))  # in-flight analysis calls
+    CLAUDE_BATCH_BACKEND: str = os.getenv('CLAUDE_BATCH_BACKEND', 'anthropic')  # anthropic or local
+    CLAUDE_BATCH_MAX_REQUESTS: int = int(os.getenv('CLAUDE_BATCH_MAX_REQUESTS', '5000'))  # requests per Message Batch
+    CLAUDE_BATCH_POLL_SECONDS: int = int(os.getenv('CLAUDE_BATCH_POLL_SECONDS', '60'))
     
     # Email Processing Configuration
     EMAIL_FETCH_LIMIT = int(os.getenv('EMAIL_FETCH_LIMIT', 50))
@@ -78,6 +82,48 @@ class Settings:
     EMAIL_DAYS_BACK: int = int(os.getenv('EMAIL_DAYS_BACK', '30'))
     EMAIL_BATCH_SIZE: int = int(os.getenv('EMAIL_BATCH_SIZE', '10'))
     
+    # Gmail Download Concurrency & Quota Settings
+    GMAIL_QUOTA_UNITS_PER_SECOND: int = int(os.getenv('GMAIL_QUOTA_UNITS_PER_SECOND', '250'))
+    GMAIL_FETCH_MAX_CONCURRENCY: int = int(os.getenv('GMAIL_FETCH_MAX_CONCURRENCY', '8'))
+    GMAIL_FETCH_MAX_RETRIES: int = int(os.getenv('GMAIL_FETCH_MAX_RETRIES', '5'))
+    GOOGLE_HTTP_POOL_SIZE: int = int(os.getenv('GOOGLE_HTTP_POOL_SIZE', '16'))
+    GMAIL_SERVICE_CACHE_TTL_MINUTES: int = int(os.getenv('GMAIL_SERVICE_CACHE_TTL_MINUTES', '45'))
+    GMAIL_TRIAGE_FIRST: bool = os.getenv('GMAIL_TRIAGE_FIRST', 'True').lower() == 'true'
+    GMAIL_MESSAGE_FORMAT: str = os.getenv('GMAIL_MESSAGE_FORMAT', 'full')  # full (JSON payload) or raw (RFC 822)
+    GMAIL_LIST_WINDOW_DAYS: int = int(os.getenv('GMAIL_LIST_WINDOW_DAYS', '30'))
+    GMAIL_PUSH_SOURCE: str = os.getenv('GMAIL_PUSH_SOURCE', 'pubsub')  # pubsub or local
+    GMAIL_PUBSUB_TOPIC: str = os.getenv('GMAIL_PUBSUB_TOPIC', '')  # projects/<project>/topics/<topic>
+    GMAIL_PUSH_VERIFICATION_TOKEN: str = os.getenv('GMAIL_PUSH_VERIFICATION_TOKEN', '')  # required by /webhooks/gmail
+    PUSH_SYNC_WORKERS: int = int(os.getenv('PUSH_SYNC_WORKERS', '4'))
+    GMAIL_WATCH_RENEWAL_MINUTES: int = int(os.getenv('GMAIL_WATCH_RENEWAL_MINUTES', '60'))  # How often expiring watches are renewed
+    BACKFILL_PAGE_SIZE: int = int(os.getenv('BACKFILL_PAGE_SIZE', '500'))
+    BACKFILL_STALE_MINUTES: int = int(os.getenv('BACKFILL_STALE_MINUTES', '10'))
+    BACKFILL_RETRY_PASSES: int = int(os.getenv('BACKFILL_RETRY_PASSES', '3'))  # Passes over failed messages before a job completes
+    
+    # Server-side Pre-filter Settings (opt-in; the defaults are seeded as each user's initial exclusion rules)
+    GMAIL_PREFILTER_ENABLED: bool = os.getenv('GMAIL_PREFILTER_ENABLED', 'False').lower() == 'true'
+    GMAIL_DEFAULT_EXCLUDED_CATEGORIES: str = os.getenv('GMAIL_DEFAULT_EXCLUDED_CATEGORIES', 'promotions,social,forums')
+    GMAIL_DEFAULT_EXCLUDED_SENDERS: str = os.getenv('GMAIL_DEFAULT_EXCLUDED_SENDERS', 'noreply,no-reply,donotreply')
+    FILTER_LEARN_THRESHOLD: int = int(os.getenv('FILTER_LEARN_THRESHOLD', '5'))
+    
+    # Email Normalization Settings
+    HTML_TO_TEXT_BACKEND: str = os.getenv('HTML_TO_TEXT_BACKEND', 'auto')  # auto, lxml, stream or bs4
+    NORMALIZE_WORKERS: int = int(os.getenv('NORMALIZE_WORKERS', '0'))  # worker processes; 0 = one per CPU core, 1 = serial
+    NORMALIZE_CHUNK_SIZE: int = int(os.getenv('NORMALIZE_CHUNK_SIZE', '20'))
+    NORMALIZE_PARALLEL_MIN_BATCH: int = int(os.getenv('NORMALIZE_PARALLEL_MIN_BATCH', '40'))
+    NORMALIZE_WRITE_CHUNK_SIZE: int = int(os.getenv('NORMALIZE_WRITE_CHUNK_SIZE', '200'))  # rows per UPDATE and commit
+    NORMALIZATION_CACHE_ENABLED: bool = os.getenv('NORMALIZATION_CACHE_ENABLED', 'True').lower() == 'true'
+    NORMALIZATION_CACHE_SIZE: int = int(os.getenv('NORMALIZATION_CACHE_SIZE', '2000'))  # in-process LRU entries
+    
+    # Message Size Budgets (excess content is dropped and marked as truncated)
+    MAX_BODY_PART_BYTES: int = int(os.getenv('MAX_BODY_PART_BYTES', '1048576'))  # decoded bytes kept per text/html part
+    HTML_TREE_MAX_CHARS: int = int(os.getenv('HTML_TREE_MAX_CHARS', '262144'))  # larger HTML is converted by streaming
+    MAX_BODY_CLEAN_CHARS: int = int(os.getenv('MAX_BODY_CLEAN_CHARS', '100000'))
+    MAX_ANALYSIS_BODY_CHARS: int = int(os.getenv('MAX_ANALYSIS_BODY_CHARS', '20000'))  # body text sent to Claude
+    
+    # Body Storage Settings
+    BODY_COMPRESSION_LEVEL: int = int(os.getenv('BODY_COMPRESSION_LEVEL', '6'))  # zlib level for email_bodies, 1-9
+    
     # Task Extraction Settings
     TASK_EXTRACTION_PROMPT_VERSION: str = os.getenv('TASK_EXTRACTION_PROMPT_VERSION', 'v1')
     ENABLE_AUTO_TASK_EXTRACTION: bool = os.getenv('ENABLE_AUTO_TASK_EXTRACTION', 'True').lower() == 'true'
@@ -98,6 +144,9 @@ class Settings:
     UPLOAD_FOLDER: str = os.getenv('UPLOAD_FOLDER', 'data/uploads')
     MAX_UPLOAD_SIZE: int = int(os.getenv('MAX_UPLOAD_SIZE', '16777216'))  # 16MB
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx', 'doc', 'md'}
+    ATTACHMENT_STORE_MAX_BYTES: int = int(os.getenv('ATTACHMENT_STORE_MAX_BYTES', '1073741824'))  # 1GB
+    ATTACHMENT_MAX_SIZE: int = int(os.getenv('ATTACHMENT_MAX_SIZE', '26214400'))  # 25MB, Gmail's own limit
+    ATTACHMENT_DENIED_EXTENSIONS: str = os.getenv('ATTACHMENT_DENIED_EXTENSIONS', 'exe,msi,bat,cmd,com,scr,ps1,vbs,js,jar')
     
     @classmethod
     def validate_config(cls) -> List[str]:
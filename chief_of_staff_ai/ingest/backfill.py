@@ -0,0 +1,278 @@
+# Resumable, checkpointed full-mailbox backfill
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from auth.gmail_auth import gmail_auth
+from ingest.gmail_batch import FetchStats, CountingHttp
+from ingest.gmail_concurrency import get_quota_bucket
+from ingest.gmail_fetcher import gmail_fetcher
+from ingest.filter_rules import gmail_filter_rules
+from models.database import get_db_manager
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MailboxBackfill:
+    """
+    Imports a user's whole mailbox one messages.list page at a time
+
+    The next page token and progress counters are committed after every page,
+    so a crashed or redeployed backfill resumes from its last completed page
+    instead of starting over. Gmail lists messages newest-first, so recent mail
+    reaches the dashboard first. Pages already partly stored are simply skipped
+    by the existing-ID check when they are replayed.
+
+    Messages that still fail after the downloader's own retries are kept on the
+    job and fetched again once listing finishes. A job only completes when none
+    are left; otherwise it ends 'incomplete' and the next run retries just those.
+    """
+
+    def __init__(self, page_size: int = settings.BACKFILL_PAGE_SIZE, stale_after_minutes: int = settings.BACKFILL_STALE_MINUTES,
+                 retry_passes: int = settings.BACKFILL_RETRY_PASSES):
+        self.page_size = min(page_size, 500)  # messages.list maximum
+        self.stale_after = timedelta(minutes=stale_after_minutes)
+        self.retry_passes = max(retry_passes, 1)
+        self.default_query = '-in:drafts'
+        self._threads: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def run(self, user_email: str, max_pages: int = None, restart: bool = False, query: str = None) -> Dict:
+        """
+        Run (or resume) the backfill for a user until it completes, is paused or hits max_pages
+
+        Args:
+            user_email: Gmail address of the user
+            max_pages: Stop after this many pages (the job stays resumable)
+            restart: Discard saved progress and start from the newest message
+            query: Gmail search query for a new job (defaults to all mail except drafts,
+                   minus the user's filter rules)
+
+        Returns:
+            Dictionary with the job progress
+        """
+        db = get_db_manager()
+        user = db.get_user_by_email(user_email)
+        if not user:
+            return {'success': False, 'error': f'User {user_email} not found'}
+
+        try:
+            service = gmail_auth.get_gmail_service(user_email)
+            if not service:
+                return {'success': False, 'error': f'No valid credentials for {user_email}'}
+
+            job = db.get_backfill_job(user.id)
+
+            if job and job.status == 'running' and not restart and datetime.utcnow() - job.updated_at < self.stale_after:
+                return {
+                    'success': False,
+                    'error': 'Backfill is already running',
+                    'backfill': job.to_dict()
+                }
+
+            if not job or restart:
+                job = self._create_job(service, user, query)
+            elif job.status == 'completed':
+                return {'success': True, 'user_email': user_email, 'backfill': job.to_dict()}
+            elif job.status == 'incomplete':
+                # Every page was listed; only the messages that failed are left to fetch
+                job = db.save_backfill_job(user.id, {'status': 'running', 'last_error': None})
+                logger.info(f"Retrying {len(job.failed_ids or [])} failed messages of the backfill for {user_email}")
+                job = self._retry_failed(service, user, job, get_quota_bucket(user.id))
+                return {'success': job.status == 'completed', 'user_email': user_email, 'backfill': job.to_dict()}
+            else:
+                job = db.save_backfill_job(user.id, {'status': 'running', 'last_error': None})
+                logger.info(f"Resuming backfill for {user_email} after {job.pages_completed} pages")
+
+            quota = get_quota_bucket(user.id)
+            pages = 0
+
+            while True:
+                if max_pages and pages >= max_pages:
+                    job = db.save_backfill_job(user.id, {'status': 'paused'})
+                    break
+
+                # A pause requested from another request or process is seen between pages
+                current = db.get_backfill_job(user.id)
+                if current.status == 'paused':
+                    job = current
+                    logger.info(f"Backfill for {user_email} paused after {job.pages_completed} pages")
+                    break
+
+                job = self._process_page(service, user, job, quota)
+                pages += 1
+
+                if job.status in ('completed', 'incomplete'):
+                    logger.info(f"Backfill for {user_email} {job.status}: {job.messages_stored} emails stored")
+                    break
+
+            return {'success': True, 'user_email': user_email, 'backfill': job.to_dict()}
+
+        except Exception as e:
+            logger.error(f"Backfill failed for {user_email}: {str(e)}")
+            job = db.save_backfill_job(user.id, {'status': 'failed', 'last_error': str(e)})
+            return {'success': False, 'error': str(e), 'backfill': job.to_dict()}
+
+    def start_background(self, user_email: str, restart: bool = False, query: str = None) -> Dict:
+        """
+        Run the backfill in a background thread of this process
+
+        Returns:
+            Dictionary with the job progress at the time of the call
+        """
+        with self._lock:
+            thread = self._threads.get(user_email)
+            if thread and thread.is_alive():
+                progress = self.get_progress(user_email)
+                progress['started'] = False
+                return progress
+
+            thread = threading.Thread(
+                target=self.run,
+                kwargs={'user_email': user_email, 'restart': restart, 'query': query},
+                name=f"backfill-{user_email}",
+                daemon=True
+            )
+            self._threads[user_email] = thread
+            thread.start()
+
+        progress = self.get_progress(user_email)
+        progress['started'] = True
+        return progress
+
+    def pause(self, user_email: str) -> Dict:
+        """Ask a running backfill to stop after its current page"""
+        db = get_db_manager()
+        user = db.get_user_by_email(user_email)
+        if not user:
+            return {'success': False, 'error': f'User {user_email} not found'}
+
+        job = db.get_backfill_job(user.id)
+        if not job or job.status not in ('pending', 'running'):
+            return {'success': False, 'error': 'No backfill is running'}
+
+        job = db.save_backfill_job(user.id, {'status': 'paused'})
+        return {'success': True, 'user_email': user_email, 'backfill': job.to_dict()}
+
+    def get_progress(self, user_email: str) -> Dict:
+        """Get backfill progress, rate and ETA for a user"""
+        db = get_db_manager()
+        user = db.get_user_by_email(user_email)
+        if not user:
+            return {'success': False, 'error': f'User {user_email} not found'}
+
+        job = db.get_backfill_job(user.id)
+        return {
+            'success': True,
+            'user_email': user_email,
+            'backfill': job.to_dict() if job else None
+        }
+
+    def _create_job(self, service, user, query: Optional[str]):
+        """Start a new job, sized from the mailbox profile"""
+        quota = get_quota_bucket(user.id)
+        quota.acquire_call('users.getProfile')
+        profile = service.users().getProfile(userId='me').execute()
+
+        # Mail arriving while the backfill runs is picked up by incremental sync from here
+        if not user.gmail_history_id and profile.get('historyId'):
+            get_db_manager().update_user_history_id(user.id, profile['historyId'])
+
+        logger.info(f"Starting backfill for {user.email}: about {profile.get('messagesTotal')} messages")
+
+        if query is None:
+            query, _ = gmail_filter_rules.build_query(user.id, self.default_query)
+
+        return get_db_manager().save_backfill_job(user.id, {
+            'status': 'running',
+            'query': query,
+            'page_token': None,
+            'pages_completed': 0,
+            'messages_listed': 0,
+            'messages_stored': 0,
+            'messages_failed': 0,
+            'estimated_total': profile.get('messagesTotal'),
+            'active_seconds': 0.0,
+            'failed_ids': [],
+            'last_error': None,
+            'started_at': datetime.utcnow(),
+            'completed_at': None
+        })
+
+    def _process_page(self, service, user, job, quota):
+        """List one page, ingest its messages and checkpoint the next page token"""
+        started = time.monotonic()
+        stats = FetchStats()
+
+        quota.acquire_call('messages.list')
+        result = service.users().messages().list(
+            userId='me',
+            q=job.query or None,
+            maxResults=self.page_size,
+            pageToken=job.page_token or None
+        ).execute(http=CountingHttp(service._http, stats))
+
+        message_ids = [message['id'] for message in result.get('messages', [])]
+        stored = sum(1 for _ in gmail_fetcher.stream_message_ids(service, user, message_ids, stats, quota))
+        next_page_token = result.get('nextPageToken')
+
+        # The checkpoint moves past this page, so keep what it could not download
+        failed_ids = list(dict.fromkeys((job.failed_ids or []) + stats.failed_ids))
+
+        updates = {
+            'page_token': next_page_token,
+            'pages_completed': (job.pages_completed or 0) + 1,
+            'messages_listed': (job.messages_listed or 0) + len(message_ids),
+            'messages_stored': (job.messages_stored or 0) + stored,
+            'messages_failed': (job.messages_failed or 0) + stats.messages_failed,
+            'failed_ids': failed_ids,
+            'active_seconds': (job.active_seconds or 0.0) + time.monotonic() - started
+        }
+        # Leave the status alone mid-run so a pause requested during this page is kept
+        job = get_db_manager().save_backfill_job(user.id, updates)
+
+        if not next_page_token:
+            job = self._retry_failed(service, user, job, quota)
+
+        progress = job.to_dict()
+        logger.info(f"Backfill {user.email}: page {job.pages_completed}, {job.messages_listed}/{job.estimated_total} listed, "
+                    f"{progress['rate_per_second']} msg/s, ETA {progress['eta_seconds']}s")
+        return job
+
+    def _retry_failed(self, service, user, job, quota):
+        """Fetch the job's failed messages again, then mark it completed or incomplete"""
+        started = time.monotonic()
+        remaining = list(job.failed_ids or [])
+        stored = 0
+
+        for attempt in range(self.retry_passes):
+            if not remaining:
+                break
+            stats = FetchStats()
+            stored += sum(1 for _ in gmail_fetcher.stream_message_ids(service, user, remaining, stats, quota))
+            still_failed = set(stats.failed_ids)
+            remaining = [message_id for message_id in remaining if message_id in still_failed]
+
+        updates = {
+            'messages_stored': (job.messages_stored or 0) + stored,
+            'failed_ids': remaining,
+            'active_seconds': (job.active_seconds or 0.0) + time.monotonic() - started
+        }
+        if remaining:
+            logger.warning(f"Backfill {user.email}: {len(remaining)} messages still failing after {self.retry_passes} retry passes")
+            updates.update({
+                'status': 'incomplete',
+                'last_error': f'{len(remaining)} messages could not be downloaded'
+            })
+        else:
+            updates.update({'status': 'completed', 'completed_at': datetime.utcnow()})
+
+        return get_db_manager().save_backfill_job(user.id, updates)
+
+
+# Create global instance
+mailbox_backfill = MailboxBackfill()
@@ -0,0 +1,308 @@
+# Per-user filter rules compiled into Gmail search parameters
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models.database import get_db_manager
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GmailFilterRules:
+    """
+    Turns a user's exclusion rules into the q and labelIds of list requests
+
+    Excluded categories, labels and full sender addresses become negative
+    search terms, and required labels become labelIds, so Gmail never lists
+    the messages in the first place. Domain and bare-word sender rules are
+    applied locally only: Gmail's from: matches by token, so it would also
+    drop addresses that is_excluded() keeps (-from:noreply hides
+    noreply.team@x.com). Paths that cannot take a search query (history sync)
+    or see the sender only after listing (the metadata triage pass) apply all
+    rules locally through is_excluded().
+
+    When pre-filtering is disabled nothing is compiled, seeded or saved.
+
+    Senders whose mail is repeatedly downloaded and then skipped as bulk are
+    learned: they are tracked as candidate rules and become active exclusions
+    after learn_threshold skips, unless the same sender also sent mail worth
+    keeping. Rules a user disables are never re-learned.
+    """
+
+    RULE_TYPES = ('category', 'sender', 'domain', 'label', 'require_label')
+
+    # Gmail category name -> system label ID on each message
+    CATEGORY_LABELS = {
+        'personal': 'CATEGORY_PERSONAL',
+        'social': 'CATEGORY_SOCIAL',
+        'promotions': 'CATEGORY_PROMOTIONS',
+        'updates': 'CATEGORY_UPDATES',
+        'forums': 'CATEGORY_FORUMS'
+    }
+
+    # Message types the normalizer assigns to mail that is never analyzed
+    SKIPPED_MESSAGE_TYPES = {'newsletter', 'automated'}
+
+    def __init__(
+        self,
+        enabled: bool = settings.GMAIL_PREFILTER_ENABLED,
+        learn_threshold: int = settings.FILTER_LEARN_THRESHOLD,
+        max_query_length: int = 1500,
+        cache_seconds: int = 60
+    ):
+        self.enabled = enabled
+        self.learn_threshold = learn_threshold
+        self.max_query_length = max_query_length
+        self.cache_seconds = cache_seconds
+        self._cache: Dict[int, Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def compile(self, user_id: int) -> Dict:
+        """
+        Compile a user's active rules into search parameters
+
+        Args:
+            user_id: Database user ID
+
+        Returns:
+            Dictionary with 'query' (negative search terms), 'label_ids'
+            (labels every listed message must carry), and the sets used by
+            is_excluded(): 'excluded_label_ids', 'senders', 'domains'
+        """
+        if not self.enabled:
+            return self._empty()
+
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached and time.monotonic() - cached[0] < self.cache_seconds:
+                return cached[1]
+
+        self.ensure_defaults(user_id)
+        rules = get_db_manager().get_filter_rules(user_id, status='active')
+
+        compiled = self._empty()
+        categories, labels, senders = [], [], []
+
+        # Learned senders with the most skips are the most valuable to exclude at the source
+        rules = sorted(rules, key=lambda rule: rule.skip_count or 0, reverse=True)
+
+        for rule in rules:
+            value = rule.value.strip().lower()
+            if rule.rule_type == 'category' and value in self.CATEGORY_LABELS:
+                categories.append(value)
+                compiled['excluded_label_ids'].add(self.CATEGORY_LABELS[value])
+            elif rule.rule_type == 'label':
+                labels.append(value)
+                compiled['excluded_label_ids'].add(rule.value.upper())
+            elif rule.rule_type == 'require_label':
+                compiled['label_ids'].append(rule.value.upper())
+            elif rule.rule_type == 'domain':
+                compiled['domains'].add(value)
+            elif rule.rule_type == 'sender':
+                compiled['senders'].add(value)
+                if '@' in value:
+                    senders.append(value)
+
+        terms = [f'-category:{category}' for category in categories]
+        terms += [f'-label:{self._quote_label(label)}' for label in labels]
+        compiled['query'] = self._fit_terms(terms, senders)
+
+        with self._lock:
+            self._cache[user_id] = (time.monotonic(), compiled)
+        return compiled
+
+    def build_query(self, user_id: int, base_query: str = '') -> Tuple[str, List[str]]:
+        """
+        Combine a base search query with a user's compiled exclusions
+
+        Returns:
+            Tuple of (q, labelIds) for a messages.list or threads.list request
+        """
+        compiled = self.compile(user_id)
+        query = f"{base_query} {compiled['query']}".strip()
+        return query, list(compiled['label_ids'])
+
+    def is_excluded(self, compiled: Dict, sender: Optional[str] = None, label_ids: Iterable[str] = None) -> bool:
+        """
+        Apply compiled rules to a message that was listed without them
+
+        Label rules match label IDs, so user labels only match when the rule
+        value is the label ID; system labels and categories always match.
+
+        Args:
+            compiled: Result of compile()
+            sender: Sender address, if known
+            label_ids: The message's label IDs, if known
+
+        Returns:
+            True if the message should not be downloaded or stored
+        """
+        if label_ids is not None:
+            label_set = set(label_ids)
+            if label_set & compiled['excluded_label_ids']:
+                return True
+            if compiled['label_ids'] and not set(compiled['label_ids']) <= label_set:
+                return True
+
+        if sender:
+            sender = sender.lower()
+            local_part, _, domain = sender.rpartition('@')
+            if any(domain == rule or domain.endswith('.' + rule) for rule in compiled['domains']):
+                return True
+            for rule in compiled['senders']:
+                # Full addresses match the whole address, bare words the whole local part
+                if sender == rule or local_part == rule:
+                    return True
+
+        return False
+
+    def ensure_defaults(self, user_id: int):
+        """Seed the configured default exclusions the first time a user's rules are used"""
+        db = get_db_manager()
+        if db.get_filter_rules(user_id):
+            return
+
+        for category in self._split_setting(settings.GMAIL_DEFAULT_EXCLUDED_CATEGORIES):
+            db.save_filter_rule(user_id, 'category', category, {'status': 'active', 'source': 'default'})
+        for sender in self._split_setting(settings.GMAIL_DEFAULT_EXCLUDED_SENDERS):
+            db.save_filter_rule(user_id, 'sender', sender, {'status': 'active', 'source': 'default'})
+
+    def list_rules(self, user_id: int) -> List[Dict]:
+        """Get every rule of a user, including learning candidates and disabled rules"""
+        if self.enabled:
+            self.ensure_defaults(user_id)
+        return [rule.to_dict() for rule in get_db_manager().get_filter_rules(user_id)]
+
+    def add_rule(self, user_id: int, rule_type: str, value: str) -> Dict:
+        """
+        Add (or re-enable) an exclusion rule
+
+        Args:
+            user_id: Database user ID
+            rule_type: One of RULE_TYPES
+            value: Category name, sender address or word, domain, or label
+
+        Returns:
+            Dictionary with the saved rule
+        """
+        if not self.enabled:
+            return self._disabled_result()
+
+        value = (value or '').strip()
+        if rule_type not in self.RULE_TYPES:
+            return {'success': False, 'error': f'Unknown rule type: {rule_type}'}
+        if not value:
+            return {'success': False, 'error': 'Rule value is required'}
+        if rule_type == 'category' and value.lower() not in self.CATEGORY_LABELS:
+            return {'success': False, 'error': f'Unknown Gmail category: {value}'}
+        if rule_type in ('sender', 'domain', 'category'):
+            value = value.lower()
+
+        self.ensure_defaults(user_id)
+        rule = get_db_manager().save_filter_rule(user_id, rule_type, value, {'status': 'active', 'source': 'manual'})
+        self.invalidate(user_id)
+        return {'success': True, 'rule': rule.to_dict()}
+
+    def disable_rule(self, user_id: int, rule_type: str, value: str) -> Dict:
+        """Disable a rule; disabled rules are kept so they are neither re-seeded nor re-learned"""
+        if not self.enabled:
+            return self._disabled_result()
+
+        value = (value or '').strip()
+        if rule_type in ('sender', 'domain', 'category'):
+            value = value.lower()
+
+        existing = {(rule.rule_type, rule.value) for rule in get_db_manager().get_filter_rules(user_id)}
+        if (rule_type, value) not in existing:
+            return {'success': False, 'error': f'No {rule_type} rule for {value}'}
+
+        rule = get_db_manager().save_filter_rule(user_id, rule_type, value, {'status': 'disabled'})
+        self.invalidate(user_id)
+        return {'success': True, 'rule': rule.to_dict()}
+
+    def record_outcomes(self, user_id: int, emails: Iterable[Tuple[str, str]]) -> List[Dict]:
+        """
+        Learn sender exclusions from the classification of downloaded emails
+
+        Args:
+            user_id: Database user ID
+            emails: (sender address, message type) of each processed email
+
+        Returns:
+            Rules that became active exclusions
+        """
+        if not self.enabled:
+            return []
+
+        skipped = Counter()
+        kept = set()
+        for sender, message_type in emails:
+            if not sender or '@' not in sender:
+                continue
+            sender = sender.strip().lower()
+            if message_type in self.SKIPPED_MESSAGE_TYPES:
+                skipped[sender] += 1
+            else:
+                kept.add(sender)
+
+        activated = get_db_manager().record_filter_skips(user_id, dict(skipped), kept, self.learn_threshold)
+        if activated:
+            self.invalidate(user_id)
+            logger.info(f"Learned {len(activated)} sender exclusions for user {user_id}: "
+                        f"{', '.join(rule.value for rule in activated)}")
+        return [rule.to_dict() for rule in activated]
+
+    def invalidate(self, user_id: int):
+        """Drop a user's compiled rules so the next list request recompiles them"""
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def _fit_terms(self, terms: List[str], from_values: List[str]) -> str:
+        """
+        Join search terms, grouping full sender addresses into -from:{a b c}
+
+        Senders that do not fit within max_query_length are left out of the
+        query; is_excluded() still drops their mail before it is downloaded
+        in full.
+        """
+        query = ' '.join(terms)
+        included = []
+        for value in from_values:
+            candidate = f"{query} -from:{{{' '.join(included + [value])}}}".strip()
+            if len(candidate) > self.max_query_length:
+                logger.debug(f"Filter query full, {len(from_values) - len(included)} senders applied locally only")
+                break
+            included.append(value)
+
+        if included:
+            query = f"{query} -from:{{{' '.join(included)}}}".strip()
+        return query
+
+    @staticmethod
+    def _disabled_result() -> Dict:
+        return {
+            'success': False,
+            'error': 'Server-side pre-filtering is disabled (GMAIL_PREFILTER_ENABLED)',
+            'prefilter_enabled': False
+        }
+
+    @staticmethod
+    def _quote_label(label: str) -> str:
+        # Gmail search writes spaces and slashes in label names as hyphens
+        return label.replace(' ', '-').replace('/', '-')
+
+    @staticmethod
+    def _split_setting(value: str) -> List[str]:
+        return [item.strip().lower() for item in (value or '').split(',') if item.strip()]
+
+    @staticmethod
+    def _empty() -> Dict:
+        return {'query': '', 'label_ids': [], 'excluded_label_ids': set(), 'senders': set(), 'domains': set()}
+
+
+# Create global instance
+gmail_filter_rules = GmailFilterRules()
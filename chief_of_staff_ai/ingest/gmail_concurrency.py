@@ -0,0 +1,286 @@
+# Concurrent Gmail downloads with per-user quota accounting and adaptive backoff
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, Iterator, List, Optional
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
+
+from auth.gmail_service import is_thread_safe_http
+from config.settings import settings
+from ingest.gmail_batch import GmailBatchDownloader, FetchStats, CountingHttp, is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+# Gmail quota units charged per API method
+GMAIL_QUOTA_UNITS = {
+    'messages.list': 5,
+    'messages.get': 5,
+    'messages.attachments.get': 5,
+    'threads.list': 10,
+    'threads.get': 10,
+    'history.list': 2,
+    'users.getProfile': 1,
+    'users.watch': 100
+}
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether a failed download should be retried (rate limits, 5xx, transport errors)"""
+    if is_rate_limit_error(error):
+        return True
+
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500
+
+    return isinstance(error, (httplib2.HttpLib2Error, OSError))
+
+
+class QuotaTokenBucket:
+    """Thread-safe token bucket measured in Gmail quota units"""
+
+    def __init__(self, units_per_second: int, capacity: int = None):
+        self.rate = float(units_per_second)
+        self.capacity = float(capacity or units_per_second)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, units: float):
+        """Block until the requested quota units are available"""
+        units = min(units, self.capacity)
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= units:
+                    self.tokens -= units
+                    return
+                wait_seconds = (units - self.tokens) / self.rate
+
+            time.sleep(wait_seconds)
+
+    def acquire_call(self, method: str, count: int = 1):
+        """Block until `count` calls of a Gmail method fit in the quota"""
+        self.acquire(GMAIL_QUOTA_UNITS.get(method, 5) * count)
+
+    def penalize(self, seconds: float):
+        """Drain the bucket so every caller for this user pauses after a rate-limit response"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: grows by one after a window of successes, halves on throttling"""
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 8):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self._successes = 0
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit:
+            self.limit = min(self.maximum, self.limit + 1)
+            self._successes = 0
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self._successes = 0
+
+
+# Per-user quota buckets shared by every fetch running in this process
+_quota_buckets: Dict[str, QuotaTokenBucket] = {}
+_quota_buckets_lock = threading.Lock()
+
+
+def get_quota_bucket(user_key) -> QuotaTokenBucket:
+    """Get the quota token bucket for a user, creating it on first use"""
+    with _quota_buckets_lock:
+        bucket = _quota_buckets.get(str(user_key))
+        if bucket is None:
+            bucket = QuotaTokenBucket(settings.GMAIL_QUOTA_UNITS_PER_SECOND)
+            _quota_buckets[str(user_key)] = bucket
+        return bucket
+
+
+def authorized_http_for_thread(service):
+    """Get a transport a worker thread may use, creating one if the service's is not shareable"""
+    if is_thread_safe_http(service._http):
+        return service._http
+
+    credentials = getattr(service._http, 'credentials', None)
+    if credentials is None:
+        return service._http
+    return AuthorizedHttp(credentials, http=httplib2.Http(timeout=60))
+
+
+class ConcurrentGmailDownloader(GmailBatchDownloader):
+    """Downloads Gmail messages with a bounded thread pool of batch requests"""
+
+    def __init__(
+        self,
+        batch_size: int = 25,
+        max_concurrency: int = None,
+        max_retries: int = None,
+        http_factory: Callable = None
+    ):
+        super().__init__(batch_size=batch_size)
+        self.max_concurrency = max_concurrency or settings.GMAIL_FETCH_MAX_CONCURRENCY
+        self.max_retries = max_retries if max_retries is not None else settings.GMAIL_FETCH_MAX_RETRIES
+        self.http_factory = http_factory or self._authorized_http
+        self.max_backoff_seconds = 32.0
+        self._local = threading.local()
+
+    def iter_messages(
+        self,
+        service,
+        message_ids: List[str],
+        format: str = 'full',
+        on_error: Optional[Callable[[str, Exception], None]] = None,
+        stats: Optional[FetchStats] = None,
+        quota: Optional[QuotaTokenBucket] = None,
+        request_params: Optional[Dict] = None,
+        method: str = 'messages.get'
+    ) -> Iterator[Dict]:
+        """
+        Download messages concurrently, yielding each message in arrival order
+
+        Retryable failures (rate limits, 5xx, transport errors) are re-queued
+        with jittered exponential backoff; only IDs that exhaust their retries
+        are reported to on_error and listed in stats.failed_ids.
+
+        Args:
+            service: Gmail service object
+            message_ids: Gmail message IDs to download
+            format: Gmail message format ('full', 'metadata', 'raw', 'minimal')
+            on_error: Callback invoked as on_error(message_id, exception) for failed messages
+            stats: FetchStats to record round trips and bytes into
+            quota: Per-user quota bucket (see get_quota_bucket)
+            request_params: Extra messages.get parameters, e.g. metadataHeaders or a fields mask
+            method: 'messages.get', or 'threads.get' to download whole threads by thread ID
+
+        Yields:
+            Raw Gmail message (or thread) dictionaries
+        """
+        stats = stats or FetchStats()
+        stats.record(messages_requested=len(message_ids))
+        quota = quota or QuotaTokenBucket(settings.GMAIL_QUOTA_UNITS_PER_SECOND)
+        concurrency = AdaptiveConcurrency(
+            initial=max(1, self.max_concurrency // 2),
+            maximum=self.max_concurrency
+        )
+
+        # Work items are (not_before, message_ids); retries are scheduled in the future
+        queue = deque(
+            (0.0, message_ids[i:i + self.batch_size])
+            for i in range(0, len(message_ids), self.batch_size)
+        )
+        attempts = {}
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='gmail-fetch') as executor:
+            while queue or in_flight:
+                now = time.monotonic()
+                waiting = deque()
+
+                while queue and len(in_flight) < concurrency.limit:
+                    not_before, chunk = queue.popleft()
+                    if not_before > now:
+                        waiting.append((not_before, chunk))
+                        continue
+                    future = executor.submit(self._download_chunk, service, chunk, format, stats, quota, request_params, method)
+                    in_flight[future] = chunk
+
+                queue.extendleft(reversed(waiting))
+
+                next_ready = min((not_before for not_before, _ in queue), default=None)
+                timeout = max(0.0, next_ready - time.monotonic()) if next_ready is not None else None
+
+                if not in_flight:
+                    time.sleep(timeout or 0)
+                    continue
+
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    in_flight.pop(future)
+                    messages, errors = future.result()
+
+                    retry_ids = []
+                    throttled = 0
+                    for message_id, error in errors.items():
+                        attempts[message_id] = attempts.get(message_id, 0) + 1
+                        if is_retryable_error(error) and attempts[message_id] <= self.max_retries:
+                            retry_ids.append(message_id)
+                            throttled += is_rate_limit_error(error)
+                            continue
+
+                        stats.record_failure(message_id)
+                        if on_error:
+                            on_error(message_id, error)
+                        else:
+                            logger.error(f"Failed to download message {message_id}: {str(error)}")
+
+                    stats.record(messages_downloaded=len(messages))
+                    for message in messages:
+                        yield message
+
+                    if throttled:
+                        stats.record(rate_limited=throttled)
+                        concurrency.on_throttle()
+                        quota.penalize(1.0)
+                        logger.warning(f"Gmail rate limited {throttled} messages, concurrency now {concurrency.limit}")
+                    elif messages:
+                        concurrency.on_success()
+
+                    if retry_ids:
+                        # Full jitter keeps retries from all workers from arriving together
+                        attempt = max(attempts[message_id] for message_id in retry_ids)
+                        delay = random.uniform(0, min(self.max_backoff_seconds, 2 ** attempt))
+                        queue.append((time.monotonic() + delay, retry_ids))
+
+    def _download_chunk(
+        self,
+        service,
+        message_ids: List[str],
+        format: str,
+        stats: FetchStats,
+        quota: QuotaTokenBucket,
+        request_params: Optional[Dict] = None,
+        method: str = 'messages.get'
+    ):
+        """Worker: wait for quota, then download one chunk as a batch request"""
+        quota.acquire_call(method, len(message_ids))
+
+        try:
+            http = CountingHttp(self._thread_http(service), stats)
+            return self._execute_batch(service, http, message_ids, format, request_params, method)
+        except Exception as e:
+            # Transport failures affect the whole chunk
+            return [], {message_id: e for message_id in message_ids}
+
+    def _thread_http(self, service):
+        """Get this worker thread's own http transport (httplib2 is not thread-safe)"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self.http_factory(service)
+            self._local.http = http
+        return http
+
+    @staticmethod
+    def _authorized_http(service):
+        return authorized_http_for_thread(service)
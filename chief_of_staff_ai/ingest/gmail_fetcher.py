@@ -2,16 +2,22 @@
 
 import json
 import logging
-import base64
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from email.utils import getaddresses, parsedate_to_datetime
 
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from auth.gmail_auth import gmail_auth
+from ingest.gmail_batch import FetchStats, CountingHttp
+from ingest.gmail_concurrency import ConcurrentGmailDownloader, QuotaTokenBucket, get_quota_bucket
+from ingest.mime_parser import mime_parser
+from ingest.gmail_listing import date_sharded_lister
+from ingest.filter_rules import gmail_filter_rules
 from models.database import get_db_manager, Email
+from processors.email_normalizer import email_normalizer
+from processors.parallel_normalizer import parallel_normalizer
+from processors.size_budget import size_budget
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -19,9 +25,28 @@ logger = logging.getLogger(__name__)
 class GmailFetcher:
     """Fetches emails from Gmail API with intelligent batching and caching"""
     
+    # Labels whose messages are not part of the synced mailbox
+    EXCLUDED_LABELS = {'TRASH', 'SPAM', 'DRAFT'}
+    
+    # Fields requested when downloading whole threads
+    THREAD_REQUEST_PARAMS = {
+        'fields': 'id,historyId,messages(id,threadId,labelIds,snippet,sizeEstimate,internalDate,historyId,payload)'
+    }
+    
+    # Headers and fields requested for the metadata-only triage pass
+    TRIAGE_REQUEST_PARAMS = {
+        'metadataHeaders': ['From', 'To', 'Cc', 'Subject', 'Date',
+                            'List-Unsubscribe', 'Precedence', 'Auto-Submitted'],
+        'fields': 'id,threadId,labelIds,snippet,sizeEstimate,internalDate,historyId,payload(mimeType,headers)'
+    }
+    
     def __init__(self):
         self.batch_size = 50
         self.max_results = 500
+        self.stream_flush_size = 10
+        self.triage_first = settings.GMAIL_TRIAGE_FIRST
+        self.message_format = settings.GMAIL_MESSAGE_FORMAT
+        self.downloader = ConcurrentGmailDownloader()
         # Remove file-based caching as we now use database
         
     def fetch_recent_emails(
@@ -29,7 +54,8 @@ class GmailFetcher:
         user_email: str, 
         days_back: int = 7, 
         limit: int = None,
-        force_refresh: bool = False
+        force_refresh: bool = False,
+        incremental: bool = False
     ) -> Dict:
         """
         Fetch recent emails for a user from their Gmail account
@@ -39,6 +65,7 @@ class GmailFetcher:
             days_back: Number of days back to fetch emails
             limit: Maximum number of emails to fetch
             force_refresh: Whether to bypass database cache and fetch fresh data
+            incremental: Whether to sync only the changes since the stored historyId watermark
             
         Returns:
             Dictionary containing fetched emails and metadata
@@ -50,7 +77,7 @@ class GmailFetcher:
                 return self._error_response(f"User {user_email} not found in database")
             
             # Check if we should use cached data
-            if not force_refresh:
+            if not force_refresh and not incremental:
                 cached_emails = get_db_manager().get_user_emails(user.id, limit or 50)
                 if cached_emails:
                     logger.info(f"Using cached emails for {user_email}: {len(cached_emails)} emails")
@@ -63,22 +90,22 @@ class GmailFetcher:
                         'fetched_at': datetime.utcnow().isoformat()
                     }
             
-            # Get valid credentials
-            credentials = gmail_auth.get_valid_credentials(user_email)
-            if not credentials:
+            # Get the cached Gmail service (valid credentials, pooled connections)
+            service = gmail_auth.get_gmail_service(user_email)
+            if not service:
                 return self._error_response(f"No valid credentials for {user_email}")
             
-            # Build Gmail service
-            service = build('gmail', 'v1', credentials=credentials)
+            if incremental:
+                return self._sync_incremental(service, user, days_back, limit)
             
-            # Calculate date range
-            since_date = datetime.utcnow() - timedelta(days=days_back)
-            query = f"after:{since_date.strftime('%Y/%m/%d')}"
+            logger.info(f"Fetching emails for {user_email} from the last {days_back} days")
             
-            logger.info(f"Fetching emails for {user_email} with query: {query}")
+            stats = FetchStats()
+            prefilter = gmail_filter_rules.compile(user.id)
+            query = self._recent_query(days_back, prefilter)
             
             # Fetch email list
-            email_list = self._fetch_email_list(service, query, limit)
+            email_list = self._list_recent_emails(service, days_back, limit, stats, get_quota_bucket(user.id), prefilter)
             if not email_list:
                 return {
                     'success': True,
@@ -87,13 +114,15 @@ class GmailFetcher:
                     'count': 0,
                     'source': 'gmail_api',
                     'fetched_at': datetime.utcnow().isoformat(),
-                    'message': 'No emails found in the specified time range'
+                    'message': 'No emails found in the specified time range',
+                    'fetch_stats': stats.to_dict()
                 }
             
             # Fetch full email content in batches
-            emails = self._fetch_emails_batch(service, email_list, user.id)
+            emails = self._fetch_emails_batch(service, email_list, user.id, stats)
             
-            logger.info(f"Successfully fetched {len(emails)} emails for {user_email}")
+            logger.info(f"Successfully fetched {len(emails)} emails for {user_email} "
+                        f"({stats.round_trips} round trips, {stats.bytes_received} bytes)")
             
             return {
                 'success': True,
@@ -103,14 +132,562 @@ class GmailFetcher:
                 'source': 'gmail_api',
                 'fetched_at': datetime.utcnow().isoformat(),
                 'query_used': query,
-                'days_back': days_back
+                'days_back': days_back,
+                'fetch_stats': stats.to_dict()
             }
             
         except Exception as e:
             logger.error(f"Failed to fetch emails for {user_email}: {str(e)}")
             return self._error_response(str(e))
     
-    def _fetch_email_list(self, service, query: str, limit: int = None) -> List[Dict]:
+    def stream_emails(
+        self,
+        user_email: str,
+        days_back: int = 7,
+        limit: int = None,
+        stats: FetchStats = None,
+        force_refresh: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Stream new emails through fetch, normalization and storage in one pass
+        
+        Each message is normalized as soon as it is downloaded and stored in small
+        groups of stream_flush_size, so memory stays flat regardless of mailbox size
+        and consumers can start on the first message before the last one arrives.
+        Messages that are already stored are skipped unless force_refresh is set.
+        
+        Args:
+            user_email: Gmail address of the user
+            days_back: Number of days back to fetch emails
+            limit: Maximum number of emails to list
+            stats: Optional FetchStats to record round trips and bytes into
+            force_refresh: Whether to download stored messages again and refresh their content
+            
+        Yields:
+            Stored email dictionaries (Email.to_dict(), no bodies)
+            
+        Raises:
+            ValueError: If the user is unknown or has no valid credentials
+        """
+        stats = stats or FetchStats()
+        
+        user = get_db_manager().get_user_by_email(user_email)
+        if not user:
+            raise ValueError(f"User {user_email} not found in database")
+        
+        service = gmail_auth.get_gmail_service(user_email)
+        if not service:
+            raise ValueError(f"No valid credentials for {user_email}")
+        
+        quota = get_quota_bucket(user.id)
+        email_list = self._list_recent_emails(service, days_back, limit, stats, quota, gmail_filter_rules.compile(user.id))
+        yield from self.stream_message_ids(
+            service, user, [email_meta['id'] for email_meta in email_list], stats, quota, force_refresh=force_refresh
+        )
+    
+    def stream_message_ids(
+        self,
+        service,
+        user,
+        message_ids: List[str],
+        stats: FetchStats,
+        quota: QuotaTokenBucket,
+        force_refresh: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Download, normalize and store the given messages, skipping those already stored
+        
+        Args:
+            service: Gmail service object
+            user: User database record
+            message_ids: Gmail message IDs, in the order they should be processed
+            stats: FetchStats to record round trips and bytes into
+            quota: Per-user quota bucket
+            force_refresh: Whether to download stored messages too and refresh their
+                           body, attachments and normalization
+            
+        Yields:
+            Stored email dictionaries (Email.to_dict(), no bodies)
+        """
+        candidate_ids = list(dict.fromkeys(message_ids))
+        known_ids = get_db_manager().get_existing_gmail_ids(user.id, candidate_ids)
+        to_download = candidate_ids if force_refresh else [email_id for email_id in candidate_ids if email_id not in known_ids]
+        
+        logger.info(f"Streaming {len(to_download)} emails for {user.email} ({len(known_ids)} already stored"
+                    f"{', refreshing them' if force_refresh else ''})")
+        
+        prefilter = gmail_filter_rules.compile(user.id)
+        outcomes = []
+        pending = []
+        downloads = self._download_emails(service, to_download, stats, quota, prefilter)
+        
+        # Downloads are normalized across worker processes as they arrive
+        for email_data in parallel_normalizer.normalize(downloads, user.id):
+            if email_data.get('id') in known_ids:
+                # Forced refresh of a stored message: replace its content, queue it for re-normalization.
+                # Bulk mail triaged from its headers has no body; the stored one is kept.
+                if not email_data.get('error') and email_data.get('body_status') != 'metadata':
+                    refreshed = get_db_manager().update_email_body(user.id, email_data['id'], email_data)
+                    if refreshed:
+                        yield refreshed.to_dict()
+                continue
+            
+            if not email_data.get('error'):
+                outcomes.append((email_data.get('sender'), email_data.get('message_type')))
+            pending.append(email_data)
+            
+            if len(pending) >= self.stream_flush_size:
+                yield from self._store_stream_chunk(user.id, pending)
+                pending = []
+        
+        if pending:
+            yield from self._store_stream_chunk(user.id, pending)
+        
+        # Senders whose mail keeps being skipped are excluded from the next listing
+        gmail_filter_rules.record_outcomes(user.id, outcomes)
+    
+    def ingest_emails(
+        self,
+        user_email: str,
+        days_back: int = 7,
+        limit: int = None,
+        incremental: bool = False,
+        force_refresh: bool = False
+    ) -> Dict:
+        """
+        Fetch, normalize and store new emails, returning only a summary
+        
+        Args:
+            user_email: Gmail address of the user
+            days_back: Number of days back to fetch emails
+            limit: Maximum number of emails to list
+            incremental: Whether to sync only the changes since the stored historyId watermark
+            force_refresh: Whether to download already stored emails again and refresh them
+            
+        Returns:
+            Dictionary with ingest counts and fetch statistics
+        """
+        if incremental:
+            return self.fetch_recent_emails(
+                user_email, days_back=days_back, limit=limit, force_refresh=force_refresh, incremental=True
+            )
+        
+        try:
+            stats = FetchStats()
+            count = 0
+            
+            for _ in self.stream_emails(user_email, days_back, limit, stats, force_refresh=force_refresh):
+                count += 1
+            
+            logger.info(f"Ingested {count} new emails for {user_email} "
+                        f"({stats.round_trips} round trips, {stats.bytes_received} bytes)")
+            
+            return {
+                'success': True,
+                'user_email': user_email,
+                'count': count,
+                'source': 'gmail_stream',
+                'fetched_at': datetime.utcnow().isoformat(),
+                'days_back': days_back,
+                'fetch_stats': stats.to_dict()
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to ingest emails for {user_email}: {str(e)}")
+            return self._error_response(str(e))
+    
+    def ingest_threads(self, user_email: str, days_back: int = 7, limit: int = None) -> Dict:
+        """
+        Fetch whole conversations with one threads.get call per thread and store them in order
+        
+        Args:
+            user_email: Gmail address of the user
+            days_back: Number of days back to list threads
+            limit: Maximum number of threads to fetch
+            
+        Returns:
+            Dictionary with thread and email counts and fetch statistics
+        """
+        try:
+            user = get_db_manager().get_user_by_email(user_email)
+            if not user:
+                return self._error_response(f"User {user_email} not found in database")
+            
+            service = gmail_auth.get_gmail_service(user_email)
+            if not service:
+                return self._error_response(f"No valid credentials for {user_email}")
+            
+            stats = FetchStats()
+            quota = get_quota_bucket(user.id)
+            prefilter = gmail_filter_rules.compile(user.id)
+            query = self._recent_query(days_back, prefilter)
+            
+            thread_list = self._fetch_email_list(
+                service, query, limit, stats, quota, resource='threads', label_ids=prefilter['label_ids']
+            )
+            thread_ids = list(dict.fromkeys(thread_meta['id'] for thread_meta in thread_list))
+            
+            def on_error(thread_id: str, error: Exception):
+                logger.error(f"Failed to fetch thread {thread_id}: {str(error)}")
+            
+            thread_count = 0
+            stored_count = 0
+            for thread in self.downloader.iter_messages(
+                service, thread_ids, 'full', on_error, stats, quota, self.THREAD_REQUEST_PARAMS, method='threads.get'
+            ):
+                stored_count += self._store_thread(user, thread)
+                thread_count += 1
+            
+            logger.info(f"Ingested {thread_count} threads ({stored_count} new emails) for {user_email} "
+                        f"in {stats.round_trips} round trips")
+            
+            return {
+                'success': True,
+                'user_email': user_email,
+                'threads': thread_count,
+                'count': stored_count,
+                'source': 'gmail_threads',
+                'fetched_at': datetime.utcnow().isoformat(),
+                'days_back': days_back,
+                'fetch_stats': stats.to_dict()
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to ingest threads for {user_email}: {str(e)}")
+            return self._error_response(str(e))
+    
+    def _store_thread(self, user, thread: Dict) -> int:
+        """
+        Store the new messages of a downloaded thread and refresh its Thread summary
+        
+        Args:
+            user: User database record
+            thread: Thread from threads.get
+            
+        Returns:
+            Number of newly stored emails
+        """
+        messages = [
+            message for message in thread.get('messages', [])
+            if not self.EXCLUDED_LABELS.intersection(message.get('labelIds', []))
+        ]
+        if not messages:
+            return 0
+        
+        messages.sort(key=lambda message: int(message.get('internalDate', 0)))
+        positions = {message['id']: position for position, message in enumerate(messages)}
+        known_ids = get_db_manager().get_existing_gmail_ids(user.id, list(positions))
+        
+        processed = []
+        new_emails = []
+        for message in messages:
+            email_data = self._process_gmail_message(message)
+            if email_data.get('error'):
+                continue
+            
+            email_data['thread_position'] = positions[message['id']]
+            email_data['internal_date'] = int(message.get('internalDate', 0))
+            processed.append(email_data)
+            
+            if message['id'] not in known_ids:
+                new_emails.append(email_normalizer.normalize_email(email_data, user.id))
+        
+        if new_emails:
+            get_db_manager().save_emails(user.id, new_emails)
+        
+        if processed:
+            thread_data = self._summarize_thread(user.email, thread, processed)
+            get_db_manager().save_thread(user.id, thread_data, positions)
+        
+        return len(new_emails)
+    
+    def _summarize_thread(self, user_email: str, thread: Dict, processed: List[Dict]) -> Dict:
+        """Build Thread fields from a thread's processed messages (oldest first)"""
+        addresses = []
+        for email_data in processed:
+            addresses.append(email_data.get('sender', ''))
+            addresses.extend(email_data.get('recipients', []))
+            addresses.extend(email_data.get('cc', []))
+        
+        # To/Cc are kept as raw header strings; split them into individual addresses
+        participants = list(dict.fromkeys(
+            address.lower() for _, address in getaddresses([a for a in addresses if a]) if address
+        ))
+        
+        first, last = processed[0], processed[-1]
+        labels = list(dict.fromkeys(label for email_data in processed for label in email_data.get('label_ids', [])))
+        
+        return {
+            'gmail_thread_id': thread['id'],
+            'subject': first.get('subject'),
+            'snippet': last.get('snippet'),
+            'participants': participants,
+            'message_count': len(processed),
+            'labels': labels,
+            'first_message_at': datetime.utcfromtimestamp(first['internal_date'] / 1000),
+            'last_message_at': datetime.utcfromtimestamp(last['internal_date'] / 1000),
+            'last_sender': last.get('sender'),
+            'user_sent_last': (last.get('sender', '').lower() == user_email.lower()
+                               or 'SENT' in last.get('label_ids', [])),
+            'history_id': thread.get('historyId')
+        }
+    
+    def _store_stream_chunk(self, user_id: int, emails_data: List[Dict]) -> Iterator[Dict]:
+        """Store a group of streamed emails in one transaction and yield their summaries"""
+        for email_record in get_db_manager().save_emails(user_id, emails_data):
+            yield email_record.to_dict()
+    
+    def _sync_incremental(self, service, user, days_back: int, limit: int = None) -> Dict:
+        """
+        Sync only the mailbox changes since the user's stored historyId
+        
+        Falls back to a bounded full resync when there is no watermark yet
+        or Gmail reports that the watermark has expired.
+        
+        Args:
+            service: Gmail service object
+            user: User database record
+            days_back: Number of days back for a fallback full resync
+            limit: Maximum number of emails for a fallback full resync
+            
+        Returns:
+            Dictionary containing synced emails and change counts
+        """
+        stats = FetchStats()
+        
+        if not user.gmail_history_id:
+            return self._full_resync(service, user, days_back, limit, stats, 'no_watermark')
+        
+        try:
+            changes = self._fetch_history_changes(service, user.gmail_history_id, stats, get_quota_bucket(user.id))
+        except HttpError as e:
+            if e.resp.status == 404:
+                logger.warning(f"History watermark {user.gmail_history_id} expired for {user.email}, running full resync")
+                return self._full_resync(service, user, days_back, limit, stats, 'history_expired')
+            raise
+        
+        # History cannot be searched, so apply the label and category rules to what it reports
+        prefilter = gmail_filter_rules.compile(user.id)
+        added_ids = [
+            message_id for message_id in changes['added']
+            if not gmail_filter_rules.is_excluded(prefilter, label_ids=changes['added_labels'].get(message_id, []))
+        ]
+        stats.record(messages_filtered=len(changes['added']) - len(added_ids))
+        
+        # Download added messages, drop deleted ones and refresh labels on the rest
+        emails = self._fetch_emails_batch(service, [{'id': message_id} for message_id in added_ids], user.id, stats)
+        deleted_count = get_db_manager().delete_emails(user.id, list(changes['deleted']))
+        relabeled = {message_id: labels for message_id, labels in changes['labels'].items() if message_id not in added_ids}
+        relabeled_count = get_db_manager().update_email_labels(user.id, relabeled)
+        
+        get_db_manager().update_user_history_id(user.id, changes['history_id'])
+        
+        logger.info(f"Incremental sync for {user.email}: {len(emails)} added, {deleted_count} deleted, "
+                    f"{relabeled_count} relabeled ({stats.round_trips} round trips)")
+        
+        return {
+            'success': True,
+            'user_email': user.email,
+            'emails': emails,
+            'count': len(emails),
+            'source': 'gmail_history',
+            'fetched_at': datetime.utcnow().isoformat(),
+            'history_id': changes['history_id'],
+            'changes': {
+                'added': len(emails),
+                'deleted': deleted_count,
+                'relabeled': relabeled_count
+            },
+            'fetch_stats': stats.to_dict()
+        }
+    
+    def _full_resync(self, service, user, days_back: int, limit: int, stats: FetchStats, reason: str) -> Dict:
+        """
+        Bounded full resync that re-establishes the historyId watermark
+        
+        Args:
+            service: Gmail service object
+            user: User database record
+            days_back: Number of days back to list
+            limit: Maximum number of emails to fetch
+            stats: FetchStats to record round trips into
+            reason: Why the resync was needed
+            
+        Returns:
+            Dictionary containing fetched emails
+        """
+        quota = get_quota_bucket(user.id)
+        
+        # Read the watermark before listing so nothing that arrives during the resync is missed
+        quota.acquire_call('users.getProfile')
+        profile = service.users().getProfile(userId='me').execute(http=CountingHttp(service._http, stats))
+        history_id = profile.get('historyId')
+        
+        prefilter = gmail_filter_rules.compile(user.id)
+        query = self._recent_query(days_back, prefilter)
+        email_list = self._list_recent_emails(service, days_back, limit or self.max_results, stats, quota, prefilter)
+        emails = self._fetch_emails_batch(service, email_list, user.id, stats) if email_list else []
+        
+        if history_id:
+            get_db_manager().update_user_history_id(user.id, history_id)
+        
+        logger.info(f"Full resync ({reason}) for {user.email}: {len(emails)} emails, watermark {history_id}")
+        
+        return {
+            'success': True,
+            'user_email': user.email,
+            'emails': emails,
+            'count': len(emails),
+            'source': 'gmail_full_resync',
+            'resync_reason': reason,
+            'fetched_at': datetime.utcnow().isoformat(),
+            'query_used': query,
+            'days_back': days_back,
+            'history_id': history_id,
+            'fetch_stats': stats.to_dict()
+        }
+    
+    def _fetch_history_changes(self, service, start_history_id: str, stats: FetchStats, quota: QuotaTokenBucket = None) -> Dict:
+        """
+        Collect added, deleted and relabeled messages from users.history.list
+        
+        Args:
+            service: Gmail service object
+            start_history_id: historyId watermark of the last sync
+            stats: FetchStats to record round trips into
+            quota: Optional per-user quota bucket to charge
+            
+        Returns:
+            Dictionary with added IDs (ordered) and their labels, deleted IDs, current
+            labels per relabeled ID, and the mailbox historyId to store as the new watermark
+            
+        Raises:
+            HttpError: 404 when the watermark is too old for Gmail to answer
+        """
+        http = CountingHttp(service._http, stats)
+        added = {}
+        deleted = set()
+        labels = {}
+        history_id = start_history_id
+        page_token = None
+        
+        while True:
+            if quota:
+                quota.acquire_call('history.list')
+            
+            result = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+                maxResults=500,
+                pageToken=page_token
+            ).execute(http=http)
+            
+            history_id = result.get('historyId', history_id)
+            
+            for record in result.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    message = item['message']
+                    if set(message.get('labelIds', [])) & self.EXCLUDED_LABELS:
+                        continue
+                    added[message['id']] = message.get('labelIds', [])
+                    deleted.discard(message['id'])
+                
+                for item in record.get('messagesDeleted', []):
+                    message_id = item['message']['id']
+                    added.pop(message_id, None)
+                    labels.pop(message_id, None)
+                    deleted.add(message_id)
+                
+                for change_type in ('labelsAdded', 'labelsRemoved'):
+                    for item in record.get(change_type, []):
+                        message = item['message']
+                        message_id = message['id']
+                        label_ids = message.get('labelIds', [])
+                        
+                        if set(label_ids) & self.EXCLUDED_LABELS:
+                            # Moved to trash or spam: treat like a deletion
+                            added.pop(message_id, None)
+                            labels.pop(message_id, None)
+                            deleted.add(message_id)
+                            continue
+                        
+                        if change_type == 'labelsRemoved' and set(item.get('labelIds', [])) & self.EXCLUDED_LABELS:
+                            # Restored from trash or spam: download it again if we dropped it
+                            deleted.discard(message_id)
+                            added[message_id] = label_ids
+                        
+                        labels[message_id] = label_ids
+            
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return {
+            'added': list(added.keys()),
+            'added_labels': added,
+            'deleted': deleted,
+            'labels': labels,
+            'history_id': history_id
+        }
+    
+    def _list_recent_emails(
+        self,
+        service,
+        days_back: int,
+        limit: int = None,
+        stats: FetchStats = None,
+        quota: QuotaTokenBucket = None,
+        prefilter: Dict = None
+    ) -> List[Dict]:
+        """
+        List the emails of the last days_back days, newest first
+        
+        Long ranges are listed as concurrent date windows; short ranges and
+        small limits use a single paged query.
+        
+        Args:
+            service: Gmail service object
+            days_back: Number of days back to list
+            limit: Maximum number of emails to list
+            stats: Optional FetchStats to record round trips into
+            quota: Optional per-user quota bucket to charge
+            prefilter: Optional compiled filter rules to exclude mail at the source
+            
+        Returns:
+            List of email metadata
+        """
+        until_date = datetime.utcnow()
+        since_date = until_date - timedelta(days=days_back)
+        label_ids = prefilter['label_ids'] if prefilter else None
+        
+        if date_sharded_lister.should_shard(since_date, until_date, limit):
+            return date_sharded_lister.list_messages(
+                service, since_date, until_date, limit, stats, quota,
+                base_query=prefilter['query'] if prefilter else '',
+                label_ids=label_ids
+            )
+        
+        return self._fetch_email_list(service, self._recent_query(days_back, prefilter), limit, stats, quota, label_ids=label_ids)
+    
+    def _recent_query(self, days_back: int, prefilter: Dict = None) -> str:
+        """Build the search query for the last days_back days, with any compiled exclusions"""
+        since_date = datetime.utcnow() - timedelta(days=days_back)
+        query = f"after:{since_date.strftime('%Y/%m/%d')}"
+        if prefilter and prefilter['query']:
+            query = f"{query} {prefilter['query']}"
+        return query
+    
+    def _fetch_email_list(
+        self,
+        service,
+        query: str,
+        limit: int = None,
+        stats: FetchStats = None,
+        quota: QuotaTokenBucket = None,
+        resource: str = 'messages',
+        label_ids: List[str] = None
+    ) -> List[Dict]:
         """
         Fetch list of email IDs matching the query
         
@@ -118,31 +695,43 @@ class GmailFetcher:
             service: Gmail service object
             query: Gmail search query
             limit: Maximum number of emails to fetch
+            stats: Optional FetchStats to record round trips into
+            quota: Optional per-user quota bucket to charge
+            resource: 'messages', or 'threads' to list thread IDs instead
+            label_ids: Optional labels every listed message must carry
             
         Returns:
-            List of email metadata
+            List of email (or thread) metadata
         """
         try:
             max_results = min(limit or self.max_results, self.max_results)
+            http = CountingHttp(service._http, stats) if stats else None
+            collection = service.users().threads() if resource == 'threads' else service.users().messages()
             
-            result = service.users().messages().list(
+            if quota:
+                quota.acquire_call(f'{resource}.list')
+            result = collection.list(
                 userId='me',
                 q=query,
+                labelIds=label_ids or None,
                 maxResults=max_results
-            ).execute()
+            ).execute(http=http)
             
-            messages = result.get('messages', [])
+            messages = result.get(resource, [])
             
             # Handle pagination if needed and no limit specified
             while 'nextPageToken' in result and (not limit or len(messages) < limit):
-                result = service.users().messages().list(
+                if quota:
+                    quota.acquire_call(f'{resource}.list')
+                result = collection.list(
                     userId='me',
                     q=query,
+                    labelIds=label_ids or None,
                     maxResults=max_results,
                     pageToken=result['nextPageToken']
-                ).execute()
+                ).execute(http=http)
                 
-                messages.extend(result.get('messages', []))
+                messages.extend(result.get(resource, []))
                 
                 if len(messages) >= (limit or self.max_results):
                     break
@@ -151,7 +740,7 @@ class GmailFetcher:
             if limit:
                 messages = messages[:limit]
             
-            logger.info(f"Found {len(messages)} emails matching query: {query}")
+            logger.info(f"Found {len(messages)} {resource} matching query: {query}")
             return messages
             
         except HttpError as e:
@@ -161,75 +750,173 @@ class GmailFetcher:
             logger.error(f"Unexpected error in fetch_email_list: {str(e)}")
             raise
     
-    def _fetch_emails_batch(self, service, email_list: List[Dict], user_id: int) -> List[Dict]:
+    def _fetch_emails_batch(self, service, email_list: List[Dict], user_id: int, stats: FetchStats = None) -> List[Dict]:
         """
-        Fetch full email content in batches for efficiency
+        Fetch full email content through concurrent Gmail HTTP batch requests
         
         Args:
             service: Gmail service object
             email_list: List of email metadata from list API
             user_id: Database user ID
+            stats: Optional FetchStats to record round trips and bytes into
             
         Returns:
             List of processed email dictionaries
         """
-        emails = []
+        stats = stats or FetchStats()
         processed_count = 0
         
         try:
-            # Process emails in batches
-            for i in range(0, len(email_list), self.batch_size):
-                batch = email_list[i:i + self.batch_size]
-                batch_emails = []
-                
-                for email_meta in batch:
-                    email_id = email_meta['id']
-                    
-                    try:
-                        # Check if email already exists in database
-                        with get_db_manager().get_session() as session:
-                            existing_email = session.query(Email).filter(
-                                Email.user_id == user_id,
-                                Email.gmail_id == email_id
-                            ).first()
-                            
-                            if existing_email:
-                                batch_emails.append(existing_email.to_dict())
-                                continue
-                        
-                        # Fetch full email from Gmail API
-                        full_email = service.users().messages().get(
-                            userId='me',
-                            id=email_id,
-                            format='full'
-                        ).execute()
-                        
-                        # Process the email
-                        processed_email = self._process_gmail_message(full_email)
-                        
-                        # Save to database
-                        email_record = get_db_manager().save_email(user_id, processed_email)
-                        batch_emails.append(email_record.to_dict())
-                        
-                        processed_count += 1
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to process email {email_id}: {str(e)}")
-                        continue
-                
-                emails.extend(batch_emails)
-                
-                # Log progress for large batches
-                if len(email_list) > self.batch_size:
-                    logger.info(f"Processed batch {i//self.batch_size + 1}/{(len(email_list)-1)//self.batch_size + 1}")
+            # Resolve every candidate ID against the database in one indexed IN query
+            candidate_ids = [email_meta['id'] for email_meta in email_list]
+            existing_emails = get_db_manager().get_emails_by_gmail_ids(user_id, candidate_ids)
+            emails_by_id = {gmail_id: email.to_dict() for gmail_id, email in existing_emails.items()}
+            to_download = [email_id for email_id in dict.fromkeys(candidate_ids) if email_id not in existing_emails]
+            
+            logger.info(f"{len(existing_emails)} emails already stored, downloading {len(to_download)}")
+            
+            # Fetch emails from Gmail API over a bounded pool of batch requests,
+            # throttled by the user's quota bucket
+            quota = get_quota_bucket(user_id)
+            processed_emails = list(self._download_emails(
+                service, to_download, stats, quota, gmail_filter_rules.compile(user_id)
+            ))
+            
+            # Save all new emails in a single transaction
+            for email_record in get_db_manager().save_emails(user_id, processed_emails):
+                emails_by_id[email_record.gmail_id] = email_record.to_dict()
+                processed_count += 1
             
-            logger.info(f"Successfully processed {processed_count} emails, {len(emails)} total returned")
+            emails = [emails_by_id[email_id] for email_id in dict.fromkeys(candidate_ids) if email_id in emails_by_id]
+            
+            logger.info(f"Successfully processed {processed_count} emails, {len(emails)} total returned "
+                        f"in {stats.round_trips} round trips")
             return emails
             
         except Exception as e:
             logger.error(f"Failed to fetch emails in batch: {str(e)}")
             raise
     
+    def _download_emails(
+        self,
+        service,
+        message_ids: List[str],
+        stats: FetchStats,
+        quota: QuotaTokenBucket,
+        prefilter: Dict = None
+    ) -> Iterator[Dict]:
+        """
+        Download and process messages, skipping the bodies of bulk mail when triage is enabled
+        
+        With triage, every message is first fetched in metadata format. Messages the
+        normalizer classifies as bulk from their headers alone are yielded without a
+        body (body_status 'metadata'); only the rest are downloaded in full.
+        Messages matching the filter rules (senders the search query had no room
+        for, or history changes that were never searched) are dropped.
+        
+        Args:
+            service: Gmail service object
+            message_ids: Gmail message IDs to download
+            stats: FetchStats to record round trips and bytes into
+            quota: Per-user quota bucket
+            prefilter: Optional compiled filter rules
+            
+        Yields:
+            Processed email dictionaries, in arrival order
+        """
+        def on_error(email_id: str, error: Exception):
+            logger.error(f"Failed to fetch email {email_id}: {str(error)}")
+        
+        to_download = message_ids
+        
+        if self.triage_first and message_ids:
+            to_download = []
+            for metadata_email in self.downloader.iter_messages(
+                service, message_ids, 'metadata', on_error, stats, quota, self.TRIAGE_REQUEST_PARAMS
+            ):
+                email_data = self._process_gmail_message(metadata_email)
+                if self._is_filtered(prefilter, email_data, stats):
+                    continue
+                
+                triage_type = None if email_data.get('error') else email_normalizer.triage_message(email_data)
+                
+                if triage_type:
+                    email_data['triage_type'] = triage_type
+                    email_data['body_status'] = 'metadata'
+                    yield email_data
+                else:
+                    to_download.append(metadata_email['id'])
+            
+            logger.info(f"Triage skipped {len(message_ids) - len(to_download)} bulk or filtered message bodies, "
+                        f"downloading {len(to_download)} in full")
+        
+        for full_email in self.downloader.iter_messages(service, to_download, self.message_format, on_error, stats, quota):
+            email_data = self._process_downloaded(full_email)
+            if email_data.get('body_truncated'):
+                stats.record(messages_truncated=1)
+            if not self._is_filtered(prefilter, email_data, stats):
+                yield email_data
+    
+    def _is_filtered(self, prefilter: Optional[Dict], email_data: Dict, stats: FetchStats) -> bool:
+        """Check a processed message against the filter rules, counting it when dropped"""
+        if not prefilter or email_data.get('error'):
+            return False
+        
+        if gmail_filter_rules.is_excluded(prefilter, email_data.get('sender'), email_data.get('label_ids')):
+            stats.record(messages_filtered=1)
+            return True
+        return False
+    
+    def load_email_body(self, user_email: str, gmail_id: str) -> Dict:
+        """
+        Download the body of an email that was stored metadata-only during triage
+        
+        Args:
+            user_email: Gmail address of the user
+            gmail_id: Gmail message ID
+            
+        Returns:
+            Dictionary with the updated email
+        """
+        try:
+            db_user = get_db_manager().get_user_by_email(user_email)
+            if not db_user:
+                return self._error_response(f"User {user_email} not found")
+            
+            service = gmail_auth.get_gmail_service(user_email)
+            if not service:
+                return self._error_response(f"No valid credentials for {user_email}")
+            
+            stats = FetchStats()
+            messages = self.downloader.fetch_messages(service, [gmail_id], self.message_format, stats=stats)
+            if not messages:
+                return self._error_response(f"Failed to download email {gmail_id}")
+            
+            email_data = self._process_downloaded(messages[0])
+            if email_data.get('error'):
+                return self._error_response(email_data.get('error_message', 'Failed to process email'))
+            
+            email_record = get_db_manager().update_email_body(db_user.id, gmail_id, email_data)
+            if not email_record:
+                return self._error_response(f"Email {gmail_id} not found")
+            
+            return {
+                'success': True,
+                'user_email': user_email,
+                'email': email_record.to_dict(),
+                'fetch_stats': stats.to_dict()
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to load body of email {gmail_id} for {user_email}: {str(e)}")
+            return self._error_response(str(e))
+    
+    def _process_downloaded(self, gmail_message: Dict) -> Dict:
+        """Process a message downloaded in either 'full' (JSON payload) or 'raw' (RFC 822) format"""
+        if 'raw' in gmail_message:
+            return mime_parser.parse_gmail_message(gmail_message)
+        return self._process_gmail_message(gmail_message)
+    
     def _process_gmail_message(self, gmail_message: Dict) -> Dict:
         """
         Process a Gmail message into our standard format
@@ -258,6 +945,9 @@ class GmailFetcher:
                 'bcc': [headers.get('bcc', '')] if headers.get('bcc') else [],
                 'subject': headers.get('subject', ''),
                 'date': headers.get('date', ''),
+                'list_unsubscribe': headers.get('list-unsubscribe', ''),
+                'precedence': headers.get('precedence', ''),
+                'auto_submitted': headers.get('auto-submitted', ''),
                 
                 # Body content
                 'body_text': '',
@@ -352,12 +1042,15 @@ class GmailFetcher:
             
             # Extract body content
             body = part.get('body', {})
-            if body.get('data'):
-                content = base64.urlsafe_b64decode(body['data']).decode('utf-8', errors='ignore')
+            if body.get('data') and mime_type in ('text/plain', 'text/html'):
+                # Only the prefix within the part budget is decoded
+                content, truncated = size_budget.decode_part(body['data'], mime_type, urlsafe=True, errors='ignore')
+                if truncated:
+                    email_data['body_truncated'] = True
                 
                 if mime_type == 'text/plain':
                     email_data['body_text'] = content
-                elif mime_type == 'text/html':
+                else:
                     email_data['body_html'] = content
             
             # Handle nested parts
@@ -0,0 +1,221 @@
+# Date-sharded concurrent Gmail message listing
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+from ingest.gmail_batch import FetchStats, CountingHttp
+from ingest.gmail_concurrency import QuotaTokenBucket, authorized_http_for_thread, is_retryable_error
+
+logger = logging.getLogger(__name__)
+
+# A window is a half-open range of epoch seconds [start, end)
+Window = Tuple[int, int]
+
+
+class DateShardedLister:
+    """
+    Lists messages in a date range as disjoint after:/before: windows, concurrently
+
+    messages.list pages are strictly sequential within one query, so a long
+    range is cut into windows that are listed in parallel. A window whose first
+    page is full (has a nextPageToken) is dense: it is split into as many parts
+    as Gmail's resultSizeEstimate says are needed to fit about one page each,
+    down to min_window_seconds, below which the window is paged serially.
+    Windows are queued newest-first and results merged newest-first with ID
+    dedup, so a limit stops listing once the newest windows hold enough.
+    """
+
+    def __init__(
+        self,
+        window_days: int = settings.GMAIL_LIST_WINDOW_DAYS,
+        min_window_seconds: int = 3600,
+        page_size: int = 500,
+        max_concurrency: int = None,
+        max_retries: int = None
+    ):
+        self.window_seconds = max(window_days, 1) * 86400
+        self.min_window_seconds = min_window_seconds
+        self.page_size = min(page_size, 500)
+        self.max_split = 16
+        self.max_concurrency = max_concurrency or settings.GMAIL_FETCH_MAX_CONCURRENCY
+        self.max_retries = max_retries if max_retries is not None else settings.GMAIL_FETCH_MAX_RETRIES
+        self._local = threading.local()
+
+    def should_shard(self, since: datetime, until: datetime, limit: int = None) -> bool:
+        """Sharding only pays off for ranges longer than one window without a small limit"""
+        span = (until - since).total_seconds()
+        return span > self.window_seconds and (not limit or limit > self.page_size)
+
+    def list_messages(
+        self,
+        service,
+        since: datetime,
+        until: datetime,
+        limit: int = None,
+        stats: FetchStats = None,
+        quota: QuotaTokenBucket = None,
+        base_query: str = '',
+        label_ids: List[str] = None
+    ) -> List[Dict]:
+        """
+        List message stubs between two instants, newest first
+
+        Args:
+            service: Gmail service object
+            since: Start of the range (UTC)
+            until: End of the range (UTC)
+            limit: Maximum number of messages, taken from the newest end of the range
+            stats: Optional FetchStats to record round trips into
+            quota: Optional per-user quota bucket to charge
+            base_query: Extra Gmail search terms applied to every window
+            label_ids: Optional labels every listed message must carry
+
+        Returns:
+            List of message stubs ({'id', 'threadId'}) without duplicates
+        """
+        stats = stats or FetchStats()
+        start = int(since.timestamp())
+        end = int(until.timestamp()) + 1
+
+        # Newest windows first so a limit can be met without listing the whole range
+        windows = []
+        window_end = end
+        while window_end > start:
+            window_start = max(start, window_end - self.window_seconds)
+            windows.append((window_start, window_end))
+            window_end = window_start
+
+        results: Dict[Window, List[Dict]] = {window: [] for window in windows}
+        outstanding: Dict[Window, int] = {window: 1 for window in windows}  # queued or in-flight pages
+        queue = deque((window, None) for window in windows)
+        in_flight = {}
+        splits = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='gmail-list') as executor:
+            while queue or in_flight:
+                while queue and len(in_flight) < self.max_concurrency:
+                    window, page_token = queue.popleft()
+                    future = executor.submit(self._list_page, service, window, page_token, base_query, label_ids, stats, quota)
+                    in_flight[future] = (window, page_token)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    window, page_token = in_flight.pop(future)
+                    outstanding[window] -= 1
+                    messages, next_page_token, estimate = future.result()
+
+                    window_start, window_end = window
+                    if page_token is None and next_page_token and window_end - window_start > self.min_window_seconds:
+                        # Dense window: list sub-windows sized from Gmail's estimate instead of paging serially
+                        parts = self._split(window, estimate)
+                        del results[window]
+                        del outstanding[window]
+                        for part in parts:
+                            results[part] = []
+                            outstanding[part] = 1
+                        # Sub-windows are newer than everything still queued
+                        queue.extendleft((part, None) for part in reversed(parts))
+                        splits += 1
+                        continue
+
+                    results[window].extend(messages)
+                    if next_page_token:
+                        outstanding[window] += 1
+                        queue.appendleft((window, next_page_token))
+
+                if limit and self._has_newest(results, outstanding, limit):
+                    for future in in_flight:
+                        future.cancel()
+                    break
+
+        merged = {}
+        for window in sorted(results, key=lambda w: w[1], reverse=True):
+            for message in results[window]:
+                merged.setdefault(message['id'], message)
+
+        messages = list(merged.values())
+        if limit:
+            messages = messages[:limit]
+
+        logger.info(f"Listed {len(messages)} emails in {len(results)} windows "
+                    f"({splits} dense windows split, {stats.round_trips} round trips)")
+        return messages
+
+    def _split(self, window: Window, estimate: int) -> List[Window]:
+        """Cut a dense window into enough parts for each to fit in about one page, newest first"""
+        window_start, window_end = window
+        parts = max(2, min(self.max_split, -(-(estimate or 0) // self.page_size)))
+        step = max(self.min_window_seconds, -(-(window_end - window_start) // parts))
+
+        windows = []
+        part_end = window_end
+        while part_end > window_start:
+            part_start = max(window_start, part_end - step)
+            windows.append((part_start, part_end))
+            part_end = part_start
+        return windows
+
+    def _has_newest(self, results: Dict[Window, List[Dict]], outstanding: Dict[Window, int], limit: int) -> bool:
+        """Check whether the newest fully listed windows already hold limit messages"""
+        count = 0
+        for window in sorted(results, key=lambda w: w[1], reverse=True):
+            if outstanding.get(window):
+                return False
+            count += len(results[window])
+            if count >= limit:
+                return True
+        return False
+
+    def _list_page(
+        self,
+        service,
+        window: Window,
+        page_token: Optional[str],
+        base_query: str,
+        label_ids: Optional[List[str]],
+        stats: FetchStats,
+        quota: Optional[QuotaTokenBucket]
+    ) -> Tuple[List[Dict], Optional[str], int]:
+        """Worker: list one page of one window, retrying transient failures"""
+        query = f"{base_query} after:{window[0] - 1} before:{window[1]}".strip()
+        params = {'userId': 'me', 'q': query, 'maxResults': self.page_size}
+        if label_ids:
+            params['labelIds'] = label_ids
+        if page_token:
+            params['pageToken'] = page_token
+
+        attempt = 0
+        while True:
+            if quota:
+                quota.acquire_call('messages.list')
+            try:
+                http = CountingHttp(self._thread_http(service), stats)
+                result = service.users().messages().list(**params).execute(http=http)
+                return result.get('messages', []), result.get('nextPageToken'), result.get('resultSizeEstimate', 0)
+            except Exception as e:
+                attempt += 1
+                if not is_retryable_error(e) or attempt > self.max_retries:
+                    raise
+                delay = random.uniform(0, min(32.0, 2 ** attempt))
+                logger.warning(f"Listing {query} failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _thread_http(self, service):
+        """Get this worker thread's own http transport (httplib2 is not thread-safe)"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = authorized_http_for_thread(service)
+            self._local.http = http
+        return http
+
+
+# Create global instance
+date_sharded_lister = DateShardedLister()
@@ -0,0 +1,281 @@
+# Parses Gmail format='raw' messages with the stdlib email parser
+
+import base64
+import binascii
+import logging
+import re
+from datetime import datetime
+from email import policy
+from email.header import decode_header, make_header
+from email.message import Message
+from email.parser import BytesParser
+from email.utils import getaddresses, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+from processors.size_budget import size_budget
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY_RE = re.compile(rb'boundary\s*=\s*"?([^";\r\n]+)', re.IGNORECASE)
+TEXT_PART_RE = re.compile(rb'^content-type:\s*text/', re.IGNORECASE | re.MULTILINE)
+NAMED_PART_RE = re.compile(rb'name\s*=', re.IGNORECASE)
+HEADER_END_RE = re.compile(rb'\r?\n\r?\n')
+
+# Added to a text part whose body was cut before parsing
+TRUNCATED_HEADER = 'X-Body-Truncated'
+
+
+class MimeMessageParser:
+    """
+    Builds our standard email dictionary from the RFC 822 bytes of a message
+
+    The raw bytes are parsed once and walked once: text parts are decoded with
+    their declared charsets and address headers are split into individual
+    addresses, instead of walking the nested JSON payload of format='full'.
+
+    The compat32 policy is used on purpose. policy.default builds a structured
+    header object for every header it touches (including each part's
+    Content-Type), which made parsing roughly 80x slower in
+    benchmarks/bench_mime_parser.py; here only the few headers we store are
+    decoded.
+
+    Attachments arrive inline in raw messages, so they are recorded with their
+    decoded size but without a Gmail attachment ID, and marked inline_only:
+    their content is read back from the raw message (extract_attachment).
+
+    The parser holds every line of a part as a separate string, so a
+    multi-megabyte HTML part costs hundreds of MB to parse. Oversized text
+    parts are therefore cut in the raw bytes before parsing (see
+    _trim_text_parts) and decoded within the part size budget.
+    """
+
+    def __init__(self):
+        self.parser = BytesParser(policy=policy.compat32)
+
+    def parse_gmail_message(self, gmail_message: Dict) -> Dict:
+        """
+        Process a format='raw' Gmail message into our standard format
+
+        Args:
+            gmail_message: Raw Gmail message from API (with a base64url 'raw' field)
+
+        Returns:
+            Processed email dictionary, matching GmailFetcher._process_gmail_message
+        """
+        try:
+            raw_bytes = base64.urlsafe_b64decode(gmail_message['raw'])
+            email_data = self.parse_bytes(raw_bytes)
+
+            label_ids = gmail_message.get('labelIds', [])
+            email_data.update({
+                'id': gmail_message['id'],
+                'thread_id': gmail_message.get('threadId'),
+                'label_ids': label_ids,
+                'snippet': gmail_message.get('snippet', ''),
+                'size_estimate': gmail_message.get('sizeEstimate', len(raw_bytes)),
+                'is_read': 'UNREAD' not in label_ids,
+                'is_important': 'IMPORTANT' in label_ids,
+                'is_starred': 'STARRED' in label_ids,
+                'processing_metadata': {
+                    'fetcher_version': '1.0',
+                    'message_format': 'raw',
+                    'processed_at': datetime.utcnow().isoformat(),
+                    'gmail_labels': label_ids
+                }
+            })
+            return email_data
+
+        except Exception as e:
+            logger.error(f"Failed to parse raw Gmail message {gmail_message.get('id', 'unknown')}: {str(e)}")
+            return {
+                'id': gmail_message.get('id', 'unknown'),
+                'error': True,
+                'error_message': str(e),
+                'timestamp': datetime.utcnow()
+            }
+
+    def parse_bytes(self, raw_bytes: bytes) -> Dict:
+        """
+        Parse RFC 822 bytes into header, body and attachment fields
+
+        Args:
+            raw_bytes: Complete message as received
+
+        Returns:
+            Email dictionary without Gmail-specific fields
+        """
+        message = self.parser.parsebytes(self._trim_text_parts(raw_bytes))
+
+        body_text = None
+        body_html = None
+        truncated = False
+        attachments = []
+
+        for part in message.walk():
+            if part.is_multipart():
+                continue
+
+            # Any leaf part with a filename counts as an attachment, as in the JSON payload path
+            filename = part.get_filename()
+            if filename:
+                payload = part.get_payload(decode=True) or b''
+                attachments.append({
+                    'filename': self._decode(filename),
+                    'mime_type': part.get_content_type(),
+                    'size': len(payload),
+                    'attachment_id': None,
+                    'inline_only': True
+                })
+                continue
+
+            content_type = part.get_content_type()
+            if content_type == 'text/plain' and body_text is None:
+                body_text, text_truncated = self._decode_part(part)
+                truncated = truncated or text_truncated
+            elif content_type == 'text/html' and body_html is None:
+                body_html, html_truncated = self._decode_part(part)
+                truncated = truncated or html_truncated
+
+        date = message.get('date', '')
+        sender, sender_name = self._first_address(message, 'from')
+
+        email_data = {
+            'sender': sender,
+            'recipients': self._addresses(message, 'to'),
+            'cc': self._addresses(message, 'cc'),
+            'bcc': self._addresses(message, 'bcc'),
+            'subject': self._header(message, 'subject'),
+            'date': date,
+            'list_unsubscribe': self._header(message, 'list-unsubscribe'),
+            'precedence': self._header(message, 'precedence'),
+            'auto_submitted': self._header(message, 'auto-submitted'),
+            'body_text': body_text or '',
+            'body_html': body_html or '',
+            'attachments': attachments,
+            'has_attachments': bool(attachments),
+            'timestamp': self._timestamp(date)
+        }
+        if sender_name:
+            email_data['sender_name'] = sender_name
+        if truncated:
+            email_data['body_truncated'] = True
+
+        return email_data
+
+    def extract_attachment(self, raw_bytes: bytes, position: int) -> bytes:
+        """
+        Decode the content of one attachment of a raw message
+
+        Args:
+            raw_bytes: Complete message as received
+            position: Index of the attachment in the list parse_bytes records
+
+        Returns:
+            The decoded attachment content
+        """
+        message = self.parser.parsebytes(raw_bytes)
+        named_parts = [part for part in message.walk() if not part.is_multipart() and part.get_filename()]
+        if position < 0 or position >= len(named_parts):
+            raise ValueError(f"Message has no attachment {position}")
+        return named_parts[position].get_payload(decode=True) or b''
+
+    def _decode(self, value) -> str:
+        """Decode RFC 2047 encoded-words in a header value"""
+        try:
+            return str(make_header(decode_header(value)))
+        except Exception:
+            return str(value)
+
+    def _header(self, message: Message, name: str) -> str:
+        value = message.get(name)
+        return self._decode(value) if value is not None else ''
+
+    def _addresses(self, message: Message, name: str) -> List[str]:
+        return [address for _, address in getaddresses(message.get_all(name, [])) if address]
+
+    def _first_address(self, message: Message, name: str) -> Tuple[str, Optional[str]]:
+        value = message.get(name)
+        if value is None:
+            return '', None
+
+        addresses = getaddresses([value])
+        if not addresses or not addresses[0][1]:
+            return self._decode(value), None
+
+        display_name, address = addresses[0]
+        return address, (self._decode(display_name) if display_name else None)
+
+    def _timestamp(self, date: str) -> datetime:
+        if date:
+            try:
+                return parsedate_to_datetime(date)
+            except Exception:
+                pass
+        return datetime.utcnow()
+
+    def _trim_text_parts(self, raw_bytes: bytes) -> bytes:
+        """
+        Cut the bodies of oversized text parts before the message is parsed
+
+        Parts are located by their boundary lines; only unnamed text/* parts
+        are cut (attachments keep their full size), to three times the part
+        budget so every transfer encoding still decodes to a full budget. A
+        cut part gets a TRUNCATED_HEADER header.
+
+        Args:
+            raw_bytes: Complete message as received
+
+        Returns:
+            The message with oversized text part bodies cut
+        """
+        limit = size_budget.max_part_bytes * 3
+        if len(raw_bytes) <= limit:
+            return raw_bytes
+
+        boundaries = set(BOUNDARY_RE.findall(raw_bytes))
+        segment_starts = [0]
+        if boundaries:
+            delimiter = re.compile(
+                rb'^--(?:' + b'|'.join(re.escape(boundary) for boundary in boundaries) + rb')(?:--)?[ \t]*\r?\n',
+                re.MULTILINE
+            )
+            segment_starts.extend(match.end() for match in delimiter.finditer(raw_bytes))
+        segment_ends = segment_starts[1:] + [len(raw_bytes)]
+
+        pieces = []
+        for start, end in zip(segment_starts, segment_ends):
+            header_end = HEADER_END_RE.search(raw_bytes, start, end) if end - start > limit else None
+            headers = raw_bytes[start:header_end.start()] if header_end else b''
+            if not header_end or not TEXT_PART_RE.search(headers) or NAMED_PART_RE.search(headers):
+                pieces.append(raw_bytes[start:end])
+                continue
+
+            body_start = header_end.end()
+            cut = raw_bytes.rfind(b'\n', body_start, body_start + limit) + 1 or body_start + limit
+            newline = b'\r\n' if raw_bytes[header_end.start():header_end.start() + 1] == b'\r' else b'\n'
+            pieces.extend([headers, newline, f'{TRUNCATED_HEADER}: 1'.encode(), newline, newline,
+                           raw_bytes[body_start:cut], newline])
+
+        return b''.join(pieces)
+
+    def _decode_part(self, part: Message) -> Tuple[str, bool]:
+        """Decode a text part with its declared charset, within the part size budget"""
+        content_type = part.get_content_type()
+        charset = part.get_content_charset()
+        truncated = part.get(TRUNCATED_HEADER) is not None
+
+        encoding = (part.get('content-transfer-encoding') or '').strip().lower()
+        if encoding == 'base64':
+            # Decode only the prefix that fits the budget instead of the whole part
+            try:
+                return size_budget.decode_part(part.get_payload(), content_type, charset, truncated=truncated)
+            except (binascii.Error, ValueError):
+                # Malformed base64: fall back to the lenient stdlib decoder
+                pass
+
+        return size_budget.decode_bytes(part.get_payload(decode=True) or b'', content_type, charset,
+                                        truncated=truncated)
+
+
+# Create global instance
+mime_parser = MimeMessageParser()
@@ -0,0 +1,356 @@
+# Push-based ingest driven by Gmail watch notifications
+
+import base64
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from auth.gmail_auth import gmail_auth
+from ingest.gmail_concurrency import get_quota_bucket
+from ingest.gmail_fetcher import gmail_fetcher
+from processors.email_normalizer import email_normalizer
+from models.database import get_db_manager
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationSource(ABC):
+    """
+    Delivers Gmail change notifications for registered users
+
+    Notifications use the Pub/Sub push envelope format:
+    {'message': {'data': base64(json({'emailAddress', 'historyId'})), 'messageId', ...}, 'subscription'}
+    """
+
+    def __init__(self):
+        self.handler: Optional[Callable[[Dict], Dict]] = None
+
+    def attach(self, handler: Callable[[Dict], Dict]):
+        """Set the callback that receives delivered envelopes"""
+        self.handler = handler
+
+    @abstractmethod
+    def register(self, service, user_email: str) -> Dict:
+        """
+        Start sending notifications for a user's mailbox
+
+        Returns:
+            Dictionary with 'historyId' and 'expires_at' (datetime or None)
+        """
+
+    @abstractmethod
+    def stop(self, service, user_email: str):
+        """Stop sending notifications for a user's mailbox"""
+
+    @staticmethod
+    def decode(envelope: Dict) -> Optional[Dict]:
+        """
+        Extract the mailbox change from a push envelope
+
+        Returns:
+            Dictionary with 'email_address', 'history_id' and 'message_id', or None if malformed
+        """
+        try:
+            message = envelope['message']
+            data = json.loads(base64.b64decode(message['data']).decode('utf-8'))
+            return {
+                'email_address': data['emailAddress'],
+                'history_id': str(data['historyId']),
+                'message_id': message.get('messageId') or message.get('message_id')
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed push notification: {str(e)}")
+            return None
+
+
+class PubSubNotificationSource(NotificationSource):
+    """Gmail users.watch publishing to a Cloud Pub/Sub topic with a push subscription to our webhook"""
+
+    def __init__(self, topic_name: str = settings.GMAIL_PUBSUB_TOPIC):
+        super().__init__()
+        self.topic_name = topic_name
+
+    def register(self, service, user_email: str) -> Dict:
+        if not self.topic_name:
+            raise ValueError("GMAIL_PUBSUB_TOPIC is not configured")
+
+        response = service.users().watch(userId='me', body={'topicName': self.topic_name}).execute()
+        expiration = response.get('expiration')
+        return {
+            'historyId': response.get('historyId'),
+            'expires_at': datetime.utcfromtimestamp(int(expiration) / 1000) if expiration else None
+        }
+
+    def stop(self, service, user_email: str):
+        service.users().stop(userId='me').execute()
+
+
+class LocalNotificationSource(NotificationSource):
+    """
+    In-process stand-in for Gmail and Pub/Sub
+
+    register() only records the user; publish() builds the same envelope Pub/Sub
+    would push to the webhook and hands it straight to the attached handler.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.registered = set()
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def register(self, service, user_email: str) -> Dict:
+        self.registered.add(user_email)
+        return {'historyId': None, 'expires_at': datetime.utcnow() + timedelta(days=7)}
+
+    def stop(self, service, user_email: str):
+        self.registered.discard(user_email)
+
+    def publish(self, user_email: str, history_id) -> Dict:
+        """Deliver a change notification for a user as if Pub/Sub had pushed it"""
+        with self._lock:
+            self._sequence += 1
+            message_id = f"local-{self._sequence}"
+
+        envelope = {
+            'message': {
+                'data': base64.b64encode(json.dumps({
+                    'emailAddress': user_email,
+                    'historyId': int(history_id)
+                }).encode('utf-8')).decode('ascii'),
+                'messageId': message_id,
+                'publishTime': datetime.utcnow().isoformat() + 'Z'
+            },
+            'subscription': 'local'
+        }
+
+        if not self.handler:
+            raise RuntimeError("No handler attached to the local notification source")
+        return self.handler(envelope)
+
+
+def create_notification_source(kind: str = None) -> NotificationSource:
+    """Create the notification source selected by GMAIL_PUSH_SOURCE"""
+    kind = kind or settings.GMAIL_PUSH_SOURCE
+    if kind == 'local':
+        return LocalNotificationSource()
+    if kind == 'pubsub':
+        return PubSubNotificationSource()
+    raise ValueError(f"Unknown push notification source: {kind}")
+
+
+class PushIngest:
+    """
+    Runs an incremental sync for exactly the user a change notification names
+
+    Notifications are acknowledged immediately and synced on a small worker
+    pool. Notifications for a user whose sync is already running are
+    coalesced into a single follow-up sync, and notifications at or below the
+    user's stored historyId watermark are dropped as already synced.
+
+    Gmail stops sending notifications when a watch expires (after 7 days), so
+    the watch renewer re-registers expiring watches on a fixed interval.
+    """
+
+    def __init__(self, source: NotificationSource = None, max_workers: int = settings.PUSH_SYNC_WORKERS):
+        self.source = source or create_notification_source()
+        self.source.attach(self.handle_notification)
+        self.watch_renewal_margin = timedelta(days=1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gmail-push')
+        self._state: Dict[str, str] = {}  # user_email -> 'running' or 'rerun'
+        self._received_at: Dict[str, float] = {}
+        self._idle = threading.Condition()
+        self._renewer: Optional[threading.Thread] = None
+        self._stop_renewer = threading.Event()
+        self.last_sync: Dict[str, Dict] = {}
+
+    def register_watch(self, user_email: str) -> Dict:
+        """
+        Register a user's mailbox for push notifications
+
+        Args:
+            user_email: Gmail address of the user
+
+        Returns:
+            Dictionary with the registration expiry
+        """
+        try:
+            user = get_db_manager().get_user_by_email(user_email)
+            if not user:
+                return {'success': False, 'error': f'User {user_email} not found'}
+
+            service = gmail_auth.get_gmail_service(user_email)
+            if not service:
+                return {'success': False, 'error': f'No valid credentials for {user_email}'}
+
+            get_quota_bucket(user.id).acquire_call('users.watch')
+            registration = self.source.register(service, user_email)
+
+            # Without a watermark the first notification would trigger a full resync
+            if not user.gmail_history_id and registration.get('historyId'):
+                get_db_manager().update_user_history_id(user.id, registration['historyId'])
+
+            get_db_manager().update_user_watch(user.id, registration.get('expires_at'))
+            logger.info(f"Registered push notifications for {user_email} until {registration.get('expires_at')}")
+
+            return {
+                'success': True,
+                'user_email': user_email,
+                'expires_at': registration['expires_at'].isoformat() if registration.get('expires_at') else None
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to register push notifications for {user_email}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def stop_watch(self, user_email: str) -> Dict:
+        """Stop push notifications for a user's mailbox"""
+        try:
+            user = get_db_manager().get_user_by_email(user_email)
+            if not user:
+                return {'success': False, 'error': f'User {user_email} not found'}
+
+            service = gmail_auth.get_gmail_service(user_email)
+            if service:
+                self.source.stop(service, user_email)
+
+            get_db_manager().update_user_watch(user.id, None)
+            return {'success': True, 'user_email': user_email}
+
+        except Exception as e:
+            logger.error(f"Failed to stop push notifications for {user_email}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def renew_expiring_watches(self) -> Dict:
+        """Re-register every watch that expires within the renewal margin"""
+        users = get_db_manager().get_users_with_expiring_watch(datetime.utcnow() + self.watch_renewal_margin)
+        failed = []
+
+        for user in users:
+            result = self.register_watch(user.email)
+            if not result.get('success'):
+                logger.warning(f"Could not renew push notifications for {user.email}: {result.get('error')}")
+                failed.append(user.email)
+
+        if users:
+            logger.info(f"Renewed {len(users) - len(failed)} of {len(users)} expiring push registrations")
+        return {'success': not failed, 'renewed': len(users) - len(failed), 'due': len(users), 'failed': failed}
+
+    def run_watch_renewer(self, interval: int = settings.GMAIL_WATCH_RENEWAL_MINUTES * 60):
+        """Renew expiring watches every interval seconds until stop_watch_renewer() is called"""
+        while True:
+            try:
+                self.renew_expiring_watches()
+            except Exception as e:
+                logger.error(f"Push notification renewal failed: {str(e)}")
+            if self._stop_renewer.wait(interval):
+                return
+
+    def start_watch_renewer(self, interval: int = settings.GMAIL_WATCH_RENEWAL_MINUTES * 60) -> bool:
+        """Run the watch renewer in a background thread of this process; False if already running"""
+        if self._renewer and self._renewer.is_alive():
+            return False
+
+        self._stop_renewer.clear()
+        self._renewer = threading.Thread(
+            target=self.run_watch_renewer,
+            kwargs={'interval': interval},
+            name='gmail-watch-renewer',
+            daemon=True
+        )
+        self._renewer.start()
+        return True
+
+    def stop_watch_renewer(self):
+        """Make a running watch renewer return after its current pass"""
+        self._stop_renewer.set()
+
+    def handle_notification(self, envelope: Dict) -> Dict:
+        """
+        Accept one push envelope and schedule a sync for the user it names
+
+        Args:
+            envelope: Pub/Sub push envelope
+
+        Returns:
+            Dictionary describing what was done; always safe to acknowledge
+        """
+        notification = NotificationSource.decode(envelope)
+        if not notification:
+            return {'success': False, 'error': 'Malformed notification'}
+
+        user_email = notification['email_address']
+        user = get_db_manager().get_user_by_email(user_email)
+        if not user or not user.is_active:
+            return {'success': False, 'error': f'Unknown user {user_email}'}
+
+        if user.gmail_history_id and int(notification['history_id']) <= int(user.gmail_history_id):
+            return {'success': True, 'user_email': user_email, 'scheduled': False, 'reason': 'already_synced'}
+
+        scheduled = self._schedule(user_email)
+        return {
+            'success': True,
+            'user_email': user_email,
+            'scheduled': scheduled,
+            'reason': None if scheduled else 'coalesced'
+        }
+
+    def sync_user(self, user_email: str) -> Dict:
+        """Incrementally sync and normalize one user's new mail"""
+        result = gmail_fetcher.fetch_recent_emails(user_email, incremental=True)
+        if result.get('success'):
+            email_normalizer.normalize_user_emails(user_email)
+        return result
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until no sync is running or queued; returns False on timeout"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._state, timeout=timeout)
+
+    def _schedule(self, user_email: str) -> bool:
+        with self._idle:
+            state = self._state.get(user_email)
+            if state:
+                # A sync is running; make sure one more runs after it so nothing is missed
+                self._state[user_email] = 'rerun'
+                return False
+            self._state[user_email] = 'running'
+            self._received_at[user_email] = time.monotonic()
+
+        self._executor.submit(self._sync_loop, user_email)
+        return True
+
+    def _sync_loop(self, user_email: str):
+        while True:
+            try:
+                result = self.sync_user(user_email)
+                latency = time.monotonic() - self._received_at.get(user_email, time.monotonic())
+                self.last_sync[user_email] = {
+                    'success': result.get('success', False),
+                    'count': result.get('count', 0),
+                    'source': result.get('source'),
+                    'latency_seconds': round(latency, 3),
+                    'synced_at': datetime.utcnow().isoformat()
+                }
+                logger.info(f"Push sync for {user_email}: {result.get('count', 0)} emails in {latency:.2f}s")
+            except Exception as e:
+                logger.error(f"Push sync failed for {user_email}: {str(e)}")
+
+            with self._idle:
+                if self._state.get(user_email) == 'rerun':
+                    self._state[user_email] = 'running'
+                    self._received_at[user_email] = time.monotonic()
+                    continue
+                self._state.pop(user_email, None)
+                self._idle.notify_all()
+                return
+
+
+# Create global instance
+push_ingest = PushIngest()
@@ -1,16 +1,23 @@
 # Main Flask application for AI Chief of Staff
 
 import os
+import hmac
 import logging
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from urllib.parse import quote
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, flash
 import anthropic
 
 from config.settings import settings
 from auth.gmail_auth import gmail_auth
 from ingest.gmail_fetcher import gmail_fetcher
+from ingest.backfill import mailbox_backfill
+from ingest.push import push_ingest
+from ingest.filter_rules import gmail_filter_rules
+from processors.batch_analysis import batch_analysis
 from processors.email_normalizer import email_normalizer
 from processors.task_extractor import task_extractor
+from storage.attachment_store import attachment_store
 from models.database import get_db_manager, Email, Task
 
 # Configure logging
@@ -150,16 +157,22 @@ def api_process_emails():
         data = request.get_json() or {}
         days_back = data.get('days_back', 7)
         limit = data.get('limit', 50)
+        incremental = data.get('incremental', False)
         force_refresh = data.get('force_refresh', False)
+        by_thread = data.get('by_thread', False)
         
-        # Step 1: Fetch emails
+        # Step 1: Fetch, normalize and store new emails in a single streaming pass
         logger.info(f"Fetching emails for {user_email}")
-        fetch_result = gmail_fetcher.fetch_recent_emails(
-            user_email, 
-            days_back=days_back, 
-            limit=limit,
-            force_refresh=force_refresh
-        )
+        if by_thread:
+            fetch_result = gmail_fetcher.ingest_threads(user_email, days_back=days_back, limit=limit)
+        else:
+            fetch_result = gmail_fetcher.ingest_emails(
+                user_email, 
+                days_back=days_back, 
+                limit=limit,
+                incremental=incremental,
+                force_refresh=force_refresh
+            )
         
         if not fetch_result['success']:
             return jsonify({
@@ -167,7 +180,7 @@ def api_process_emails():
                 'error': f"Failed to fetch emails: {fetch_result.get('error')}"
             }), 400
         
-        # Step 2: Normalize emails
+        # Step 2: Normalize any stored emails that were not normalized at ingest
         logger.info(f"Normalizing emails for {user_email}")
         normalize_result = email_normalizer.normalize_user_emails(user_email, limit)
         
@@ -216,6 +229,273 @@ def api_get_emails():
         logger.error(f"Get emails error for {user_email}: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/threads')
+def api_get_threads():
+    """API endpoint to get user threads, most recently active first"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    try:
+        limit = request.args.get('limit', 50, type=int)
+
+        user = get_db_manager().get_user_by_email(user_email)
+        if not user:
+            return jsonify({'success': False, 'error': 'User not found'}), 404
+
+        threads = get_db_manager().get_user_threads(user.id, limit)
+
+        return jsonify({
+            'success': True,
+            'threads': [thread.to_dict() for thread in threads],
+            'count': len(threads)
+        })
+
+    except Exception as e:
+        logger.error(f"Get threads error for {user_email}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/threads/<thread_id>')
+def api_get_thread(thread_id):
+    """API endpoint to get the emails of one thread in conversation order"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    try:
+        user = get_db_manager().get_user_by_email(user_email)
+        if not user:
+            return jsonify({'success': False, 'error': 'User not found'}), 404
+
+        emails = get_db_manager().get_thread_emails(user.id, thread_id)
+
+        return jsonify({
+            'success': True,
+            'thread_id': thread_id,
+            'emails': [email.to_dict() for email in emails],
+            'count': len(emails)
+        })
+
+    except Exception as e:
+        logger.error(f"Get thread error for {user_email}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/emails/<gmail_id>/body', methods=['POST'])
+def api_load_email_body(gmail_id):
+    """API endpoint to download the body of an email skipped during triage"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    try:
+        result = gmail_fetcher.load_email_body(user_email, gmail_id)
+        if not result.get('success'):
+            return jsonify(result), 400
+
+        # Re-normalize so the downloaded body replaces the metadata-only preview
+        email_normalizer.normalize_user_emails(user_email)
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Load email body error for {user_email}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def attachment_disposition(filename: str) -> str:
+    """Build a Content-Disposition header with an ASCII fallback and an RFC 6266 filename* parameter"""
+    filename = filename or 'attachment'
+    fallback = ''.join(
+        char if 32 <= ord(char) < 127 and char not in '"\\' else '_'
+        for char in filename
+    )
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@app.route('/api/emails/<gmail_id>/attachments/<int:index>')
+def api_get_attachment(gmail_id, index):
+    """API endpoint to download an email attachment, with HTTP Range support"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    try:
+        result = attachment_store.get_attachment(user_email, gmail_id, index)
+        if not result.get('success'):
+            return jsonify(result), 404
+
+        attachment = result['attachment']
+        size = result['size']
+        start, end = 0, size
+        status = 200
+
+        if request.range:
+            byte_range = request.range.range_for_length(size)
+            if byte_range is None:
+                return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+            start, end = byte_range
+            status = 206
+
+        response = Response(
+            attachment_store.iter_range(attachment['sha256'], start, end),
+            status=status,
+            mimetype=attachment.get('mime_type') or 'application/octet-stream'
+        )
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Content-Length'] = str(end - start)
+        response.headers['Content-Disposition'] = attachment_disposition(attachment.get('filename'))
+        if status == 206:
+            response.headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        return response
+
+    except Exception as e:
+        logger.error(f"Get attachment error for {user_email}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/backfill', methods=['GET'])
+def api_backfill_progress():
+    """API endpoint to get full-mailbox backfill progress, rate and ETA"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    return jsonify(mailbox_backfill.get_progress(user_email))
+
+@app.route('/api/backfill', methods=['POST'])
+def api_start_backfill():
+    """API endpoint to start or resume the full-mailbox backfill in the background"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    try:
+        data = request.get_json(silent=True) or {}
+        result = mailbox_backfill.start_background(
+            user_email,
+            restart=data.get('restart', False),
+            query=data.get('query')
+        )
+        return jsonify(result)
+
+    except Exception as e:
+        logger.error(f"Start backfill error for {user_email}: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/backfill/pause', methods=['POST'])
+def api_pause_backfill():
+    """API endpoint to pause the full-mailbox backfill after its current page"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    result = mailbox_backfill.pause(user_email)
+    return jsonify(result), (200 if result.get('success') else 400)
+
+@app.route('/api/analysis-batches', methods=['GET'])
+def api_analysis_batches():
+    """API endpoint to list the user's batch analysis submissions"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    return jsonify(batch_analysis.get_batches(user_email))
+
+@app.route('/api/analysis-batches', methods=['POST'])
+def api_submit_analysis_batch():
+    """API endpoint to submit the user's pending emails for overnight batch analysis"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    data = request.get_json(silent=True) or {}
+    result = batch_analysis.submit(
+        user_email,
+        kind=data.get('kind', 'intelligence'),
+        limit=data.get('limit'),
+        force_refresh=data.get('force_refresh', False)
+    )
+    return jsonify(result), (200 if result.get('success') else 400)
+
+@app.route('/api/analysis-batches/poll', methods=['POST'])
+def api_poll_analysis_batches():
+    """API endpoint to import the results of the user's ended analysis batches"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    result = batch_analysis.poll(user_email)
+    return jsonify(result), (200 if result.get('success') else 400)
+
+@app.route('/api/filter-rules', methods=['GET'])
+def api_filter_rules():
+    """API endpoint to list the user's filter rules and the Gmail query they compile to"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    user = get_db_manager().get_user_by_email(user_email)
+    if not user:
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+
+    rules = gmail_filter_rules.list_rules(user.id)
+    query, label_ids = gmail_filter_rules.build_query(user.id)
+    return jsonify({
+        'success': True,
+        'prefilter_enabled': gmail_filter_rules.enabled,
+        'rules': rules,
+        'query': query,
+        'label_ids': label_ids
+    })
+
+@app.route('/api/filter-rules', methods=['POST', 'DELETE'])
+def api_update_filter_rule():
+    """API endpoint to add (POST) or disable (DELETE) a filter rule"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    user = get_db_manager().get_user_by_email(user_email)
+    if not user:
+        return jsonify({'success': False, 'error': 'User not found'}), 404
+
+    data = request.get_json(silent=True) or {}
+    if request.method == 'DELETE':
+        result = gmail_filter_rules.disable_rule(user.id, data.get('rule_type'), data.get('value'))
+    else:
+        result = gmail_filter_rules.add_rule(user.id, data.get('rule_type'), data.get('value'))
+    return jsonify(result), (200 if result.get('success') else 400)
+
+@app.route('/api/push/watch', methods=['POST', 'DELETE'])
+def api_push_watch():
+    """API endpoint to register (POST) or stop (DELETE) push notifications for the user's mailbox"""
+    user_email = session.get('user_email')
+    if not user_email:
+        return jsonify({'success': False, 'error': 'Not authenticated'}), 401
+
+    if request.method == 'DELETE':
+        result = push_ingest.stop_watch(user_email)
+    else:
+        result = push_ingest.register_watch(user_email)
+    return jsonify(result), (200 if result.get('success') else 400)
+
+@app.route('/webhooks/gmail', methods=['POST'])
+def gmail_push_webhook():
+    """Receive Gmail change notifications pushed by Pub/Sub"""
+    # Fail closed: without a configured token anyone could trigger syncs
+    expected_token = settings.GMAIL_PUSH_VERIFICATION_TOKEN
+    if not expected_token:
+        logger.warning("Rejected push notification: GMAIL_PUSH_VERIFICATION_TOKEN is not set")
+        return jsonify({'success': False, 'error': 'Push notifications are not configured'}), 403
+    if not hmac.compare_digest(request.args.get('token', ''), expected_token):
+        return jsonify({'success': False, 'error': 'Invalid token'}), 403
+
+    envelope = request.get_json(silent=True)
+    if not envelope:
+        return jsonify({'success': False, 'error': 'Missing envelope'}), 400
+
+    # Always acknowledge quickly; the sync itself runs in the background
+    result = push_ingest.handle_notification(envelope)
+    if not result.get('success'):
+        logger.warning(f"Push notification not processed: {result.get('error')}")
+    return '', 204
+
 @app.route('/api/tasks')
 def api_get_tasks():
     """API endpoint to get user tasks"""
@@ -379,6 +659,9 @@ if __name__ == '__main__':
         logger.error(f"Database initialization failed: {str(e)}")
         exit(1)
     
+    # Gmail watches expire after 7 days; keep them registered while the app runs
+    push_ingest.start_watch_renewer()
+    
     app.run(
         host='0.0.0.0',
         port=settings.PORT,
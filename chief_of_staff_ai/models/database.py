@@ -1,11 +1,13 @@
 import os
 import json
 import logging
+import zlib
 from datetime import datetime
-from typing import Dict, List, Optional
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, Index
+from typing import Dict, List, Optional, Set
+from sqlalchemy import create_engine, inspect, text, insert, update, bindparam, exists, func, Column, Integer, String, Text, DateTime, Boolean, Float, ForeignKey, Index, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, relationship, deferred, selectinload, Session
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.types import TypeDecorator
 
@@ -30,6 +32,21 @@ class JSONType(TypeDecorator):
             return json.loads(value)
         return value
 
+# Text stored zlib-compressed; message bodies shrink several-fold
+class CompressedText(TypeDecorator):
+    impl = LargeBinary
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is not None:
+            return zlib.compress(value.encode('utf-8', 'surrogatepass'), settings.BODY_COMPRESSION_LEVEL)
+        return value
+    
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            return zlib.decompress(value).decode('utf-8', 'surrogatepass')
+        return value
+
 class User(Base):
     """User model for multi-tenant authentication"""
     __tablename__ = 'users'
@@ -55,11 +72,20 @@ class User(Base):
     email_days_back = Column(Integer, default=30)
     auto_process_emails = Column(Boolean, default=True)
     
+    # Incremental sync watermark (Gmail historyId of the last successful sync)
+    gmail_history_id = Column(String(50))
+    gmail_history_synced_at = Column(DateTime)
+    
+    # Gmail push notifications (users.watch registrations expire after 7 days)
+    gmail_watch_expires_at = Column(DateTime)
+    
     # Relationships
     emails = relationship("Email", back_populates="user", cascade="all, delete-orphan")
     tasks = relationship("Task", back_populates="user", cascade="all, delete-orphan")
     people = relationship("Person", back_populates="user", cascade="all, delete-orphan")
     projects = relationship("Project", back_populates="user", cascade="all, delete-orphan")
+    normalization_cache_entries = relationship("NormalizationCacheEntry", cascade="all, delete-orphan")
+    analysis_batches = relationship("AnalysisBatch", cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<User(email='{self.email}', name='{self.name}')>"
@@ -75,7 +101,10 @@ class User(Base):
             'is_active': self.is_active,
             'email_fetch_limit': self.email_fetch_limit,
             'email_days_back': self.email_days_back,
-            'auto_process_emails': self.auto_process_emails
+            'auto_process_emails': self.auto_process_emails,
+            'gmail_history_id': self.gmail_history_id,
+            'gmail_history_synced_at': self.gmail_history_synced_at.isoformat() if self.gmail_history_synced_at else None,
+            'gmail_watch_expires_at': self.gmail_watch_expires_at.isoformat() if self.gmail_watch_expires_at else None
         }
 
 class Email(Base):
@@ -88,14 +117,12 @@ class Email(Base):
     # Gmail identifiers
     gmail_id = Column(String(255), nullable=False, index=True)
     thread_id = Column(String(255), index=True)
+    thread_position = Column(Integer)  # 0-based order within the thread, oldest first
     
-    # Email content
+    # Email content (full bodies live in email_bodies, see EmailBody)
     sender = Column(String(255), index=True)
     sender_name = Column(String(255))
     subject = Column(Text)
-    body_text = Column(Text)
-    body_html = Column(Text)
-    body_clean = Column(Text)
     body_preview = Column(Text)
     snippet = Column(Text)
     
@@ -107,6 +134,11 @@ class Email(Base):
     attachments = Column(JSONType)  # Attachment metadata
     entities = Column(JSONType)  # Extracted entities
     
+    # Bulk mail headers, kept for message type classification at normalization
+    list_unsubscribe = Column(Text)
+    precedence = Column(String(50))
+    auto_submitted = Column(String(100))
+    
     # Email properties
     email_date = Column(DateTime, index=True)
     size_estimate = Column(Integer)
@@ -118,6 +150,8 @@ class Email(Base):
     is_important = Column(Boolean, default=False)
     is_starred = Column(Boolean, default=False)
     has_attachments = Column(Boolean, default=False)
+    body_status = Column(String(20), default='full')  # full, metadata (body not downloaded yet)
+    body_truncated = Column(Boolean, default=False)  # Body cut to a size budget (see processors/size_budget.py)
     
     # Email classification and AI insights
     project_id = Column(Integer, ForeignKey('projects.id'), index=True)
@@ -140,6 +174,8 @@ class Email(Base):
     # Relationships
     user = relationship("User", back_populates="emails")
     tasks = relationship("Task", back_populates="email", cascade="all, delete-orphan")
+    body = relationship("EmailBody", back_populates="email", uselist=False, cascade="all, delete-orphan")
+    batch_entries = relationship("AnalysisBatchEmail", back_populates="email", cascade="all, delete-orphan")
     
     # Indexes for performance - Fixed naming to avoid conflicts
     __table_args__ = (
@@ -158,6 +194,7 @@ class Email(Base):
             'user_id': self.user_id,
             'gmail_id': self.gmail_id,
             'thread_id': self.thread_id,
+            'thread_position': self.thread_position,
             'sender': self.sender,
             'sender_name': self.sender_name,
             'subject': self.subject,
@@ -171,6 +208,8 @@ class Email(Base):
             'is_important': self.is_important,
             'is_starred': self.is_starred,
             'has_attachments': self.has_attachments,
+            'body_status': self.body_status,
+            'body_truncated': self.body_truncated,
             'processed_at': self.processed_at.isoformat() if self.processed_at else None,
             'project_id': self.project_id,
             'mentioned_people': self.mentioned_people,
@@ -184,6 +223,81 @@ class Email(Base):
             'follow_up_required': self.follow_up_required
         }
 
+class EmailBody(Base):
+    """Full message bodies, compressed and kept out of the emails table"""
+    __tablename__ = 'email_bodies'
+    
+    email_id = Column(Integer, ForeignKey('emails.id'), primary_key=True)
+    
+    # Deferred: each body is read only by the code that asks for it (see with_bodies)
+    body_text = deferred(Column(CompressedText))
+    body_html = deferred(Column(CompressedText))
+    body_clean = deferred(Column(CompressedText))
+    
+    email = relationship("Email", back_populates="body")
+    
+    def __repr__(self):
+        return f"<EmailBody(email_id={self.email_id})>"
+
+# Inline body columns of emails tables created before email_bodies existed
+INLINE_BODY_COLUMNS = ('body_text', 'body_html', 'body_clean')
+
+def with_bodies(*fields: str):
+    """
+    Query option loading the named EmailBody columns together with each Email
+    
+    Example: session.query(Email).options(with_bodies('body_clean')), then email.body.body_clean
+    """
+    return selectinload(Email.body).load_only(*[getattr(EmailBody, field) for field in fields])
+
+class Thread(Base):
+    """Conversation summary built from a whole Gmail thread"""
+    __tablename__ = 'threads'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    gmail_thread_id = Column(String(255), nullable=False)
+    
+    subject = Column(Text)
+    snippet = Column(Text)
+    participants = Column(JSONType)  # Unique sender/recipient addresses, in order of appearance
+    message_count = Column(Integer, default=0)
+    labels = Column(JSONType)
+    
+    first_message_at = Column(DateTime)
+    last_message_at = Column(DateTime)
+    last_sender = Column(String(255))
+    user_sent_last = Column(Boolean, default=False)  # The user's own address sent the latest message
+    history_id = Column(String(50))
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_thread_user_gmail', 'user_id', 'gmail_thread_id', unique=True),
+        Index('idx_thread_user_last_message', 'user_id', 'last_message_at'),
+    )
+    
+    def __repr__(self):
+        return f"<Thread(gmail_thread_id='{self.gmail_thread_id}', messages={self.message_count})>"
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'thread_id': self.gmail_thread_id,
+            'subject': self.subject,
+            'snippet': self.snippet,
+            'participants': self.participants,
+            'message_count': self.message_count,
+            'labels': self.labels,
+            'first_message_at': self.first_message_at.isoformat() if self.first_message_at else None,
+            'last_message_at': self.last_message_at.isoformat() if self.last_message_at else None,
+            'last_sender': self.last_sender,
+            'user_sent_last': self.user_sent_last,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class Task(Base):
     """Task model for storing extracted tasks per user"""
     __tablename__ = 'tasks'
@@ -430,9 +544,274 @@ class Project(Base):
             'ai_version': self.ai_version
         }
 
+class AttachmentBlob(Base):
+    """Attachment content stored once on disk, addressed by its SHA-256 digest"""
+    __tablename__ = 'attachment_blobs'
+    
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), unique=True, nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    mime_type = Column(String(255))
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<AttachmentBlob(sha256='{self.sha256[:12]}', size={self.size})>"
+    
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'size': self.size,
+            'mime_type': self.mime_type,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_accessed_at': self.last_accessed_at.isoformat() if self.last_accessed_at else None
+        }
+
+class EmailAttachment(Base):
+    """Maps an attachment of a user's email to its content-addressed blob"""
+    __tablename__ = 'email_attachments'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    gmail_id = Column(String(255), nullable=False)
+    attachment_index = Column(Integer, nullable=False)
+    
+    filename = Column(String(500))
+    mime_type = Column(String(255))
+    size = Column(Integer)
+    gmail_attachment_id = Column(Text)
+    sha256 = Column(String(64), index=True)  # Set once the content has been downloaded
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_email_attachment_user_gmail', 'user_id', 'gmail_id', 'attachment_index', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<EmailAttachment(gmail_id='{self.gmail_id}', filename='{self.filename}')>"
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'gmail_id': self.gmail_id,
+            'attachment_index': self.attachment_index,
+            'filename': self.filename,
+            'mime_type': self.mime_type,
+            'size': self.size,
+            'sha256': self.sha256,
+            'downloaded': self.sha256 is not None
+        }
+
+class BackfillJob(Base):
+    """Checkpointed full-mailbox backfill, one per user"""
+    __tablename__ = 'backfill_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, unique=True, index=True)
+    
+    status = Column(String(20), default='pending')  # pending, running, paused, completed, incomplete, failed
+    query = Column(Text, default='')
+    page_token = Column(Text)  # Next messages.list page; None before the first page
+    
+    # Progress counters
+    pages_completed = Column(Integer, default=0)
+    messages_listed = Column(Integer, default=0)
+    messages_stored = Column(Integer, default=0)
+    messages_failed = Column(Integer, default=0)
+    estimated_total = Column(Integer)  # messagesTotal from the mailbox profile
+    active_seconds = Column(Float, default=0.0)  # Time spent processing pages, for rate and ETA
+    failed_ids = Column(JSONType)  # Messages still missing after their page; retried before the job completes
+    
+    last_error = Column(Text)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<BackfillJob(user_id={self.user_id}, status='{self.status}', listed={self.messages_listed})>"
+    
+    def to_dict(self):
+        rate = self.messages_listed / self.active_seconds if self.active_seconds else 0.0
+        remaining = max((self.estimated_total or 0) - (self.messages_listed or 0), 0)
+        
+        return {
+            'status': self.status,
+            'query': self.query,
+            'pages_completed': self.pages_completed,
+            'messages_listed': self.messages_listed,
+            'messages_stored': self.messages_stored,
+            'messages_failed': self.messages_failed,
+            'messages_missing': len(self.failed_ids or []),
+            'estimated_total': self.estimated_total,
+            'percent_complete': round(100.0 * self.messages_listed / self.estimated_total, 1) if self.estimated_total else None,
+            'rate_per_second': round(rate, 2),
+            'eta_seconds': round(remaining / rate) if rate and self.status != 'completed' else None,
+            'last_error': self.last_error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class AnalysisBatch(Base):
+    """Message Batches submission of email analysis requests, polled until its results are imported"""
+    __tablename__ = 'analysis_batches'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    batch_id = Column(String(100), unique=True, nullable=False)  # ID returned by the batch API
+    
+    kind = Column(String(20), nullable=False)  # intelligence or tasks
+    status = Column(String(20), default='in_progress', index=True)  # in_progress, imported, failed
+    
+    # Result counters, filled in when the results are imported
+    request_count = Column(Integer, default=0)
+    succeeded_count = Column(Integer, default=0)
+    errored_count = Column(Integer, default=0)
+    
+    last_error = Column(Text)
+    submitted_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    imported_at = Column(DateTime)
+    
+    # Relationships
+    emails = relationship("AnalysisBatchEmail", back_populates="batch", cascade="all, delete-orphan")
+    
+    def __repr__(self):
+        return f"<AnalysisBatch(batch_id='{self.batch_id}', kind='{self.kind}', status='{self.status}')>"
+    
+    def to_dict(self):
+        return {
+            'batch_id': self.batch_id,
+            'kind': self.kind,
+            'status': self.status,
+            'request_count': self.request_count,
+            'succeeded_count': self.succeeded_count,
+            'errored_count': self.errored_count,
+            'last_error': self.last_error,
+            'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'imported_at': self.imported_at.isoformat() if self.imported_at else None
+        }
+
+class AnalysisBatchEmail(Base):
+    """Email submitted in an analysis batch, marked once its result has been imported"""
+    __tablename__ = 'analysis_batch_emails'
+    
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(Integer, ForeignKey('analysis_batches.id'), nullable=False)
+    email_id = Column(Integer, ForeignKey('emails.id', ondelete='CASCADE'), nullable=False, index=True)
+    
+    result_type = Column(String(20))  # succeeded, errored, canceled or expired
+    imported_at = Column(DateTime)  # Set once the result was persisted, so it is never imported twice
+    
+    batch = relationship("AnalysisBatch", back_populates="emails")
+    email = relationship("Email", back_populates="batch_entries")
+    
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_analysis_batch_emails_batch_email', 'batch_id', 'email_id', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<AnalysisBatchEmail(batch_id={self.batch_id}, email_id={self.email_id})>"
+
+def in_pending_batch(kind: str):
+    """
+    Filter condition: the Email waits in an open analysis batch of this kind, its result not imported yet
+    
+    Example: session.query(Email).filter(~in_pending_batch('tasks'))
+    """
+    return exists().where(
+        AnalysisBatchEmail.email_id == Email.id,
+        AnalysisBatchEmail.imported_at.is_(None),
+        AnalysisBatchEmail.batch_id == AnalysisBatch.id,
+        AnalysisBatch.kind == kind,
+        AnalysisBatch.status == 'in_progress'
+    )
+
+class FilterRule(Base):
+    """Per-user exclusion applied to the Gmail search before anything is listed or downloaded"""
+    __tablename__ = 'filter_rules'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    
+    rule_type = Column(String(20), nullable=False)  # category, sender, domain, label, require_label
+    value = Column(String(255), nullable=False)
+    status = Column(String(20), default='active')  # active, candidate (still learning), disabled
+    source = Column(String(20), default='manual')  # default, manual, learned
+    
+    # Learning counters: how often mail from this sender was downloaded and then skipped
+    skip_count = Column(Integer, default=0)
+    last_skipped_at = Column(DateTime)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_filter_rule_user_value', 'user_id', 'rule_type', 'value', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<FilterRule(rule_type='{self.rule_type}', value='{self.value}', status='{self.status}')>"
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'rule_type': self.rule_type,
+            'value': self.value,
+            'status': self.status,
+            'source': self.source,
+            'skip_count': self.skip_count,
+            'last_skipped_at': self.last_skipped_at.isoformat() if self.last_skipped_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class NormalizationCacheEntry(Base):
+    """Body-derived normalization output shared by a user's emails with the same raw body"""
+    __tablename__ = 'normalization_cache'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # Entries are deleted with their user
+    normalizer_version = Column(String(20), nullable=False)  # Normalizer version and settings fingerprint
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of the raw body the normalizer reads
+    
+    body_clean = Column(CompressedText)
+    body_preview = Column(Text)
+    entities = Column(JSONType)
+    body_keywords = Column(JSONType)  # Keyword hits in the clean body, inputs to message type and priority
+    quote_cut = Column(JSONType)
+    
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Indexes for performance
+    __table_args__ = (
+        Index('idx_normalization_cache_user_key', 'user_id', 'normalizer_version', 'content_hash', unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<NormalizationCacheEntry(normalizer_version='{self.normalizer_version}', content_hash='{self.content_hash[:12]}')>"
+    
+    def to_dict(self):
+        return {
+            'body_clean': self.body_clean,
+            'body_preview': self.body_preview,
+            'entities': self.entities,
+            'body_keywords': self.body_keywords,
+            'quote_cut': self.quote_cut
+        }
+
 class DatabaseManager:
     """Database manager for handling connections and sessions"""
     
+    # Maximum number of values bound into a single IN (...) clause
+    IN_QUERY_CHUNK_SIZE = 500
+    
     def __init__(self):
         self.engine = None
         self.SessionLocal = None
@@ -468,15 +847,107 @@ class DatabaseManager:
             # Create session factory
             self.SessionLocal = sessionmaker(bind=self.engine)
             
+            # Drop cache tables whose layout changed; they are rebuilt on demand
+            self._drop_legacy_normalization_cache()
+            
             # Create all tables
             Base.metadata.create_all(bind=self.engine)
             
+            # Add columns introduced after a table was first created
+            self._add_missing_columns()
+            
+            # Move bodies stored inline by earlier versions into email_bodies
+            self._migrate_inline_bodies()
+            
             logger.info("Database initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize database: {str(e)}")
             raise
     
+    def _add_missing_columns(self):
+        """Add nullable columns that exist on the models but not yet in the database"""
+        inspector = inspect(self.engine)
+        
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                
+                existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing_columns:
+                        continue
+                    
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                    logger.info(f"Added column {table.name}.{column.name}")
+    
+    def _drop_legacy_normalization_cache(self):
+        """Drop a normalization_cache table from before entries were scoped per user"""
+        inspector = inspect(self.engine)
+        if not inspector.has_table('normalization_cache'):
+            return
+        
+        if 'user_id' not in {column['name'] for column in inspector.get_columns('normalization_cache')}:
+            NormalizationCacheEntry.__table__.drop(bind=self.engine)
+            logger.info("Dropped the shared normalization_cache table; entries are now kept per user")
+    
+    def _migrate_inline_bodies(self, batch_size: int = 500) -> int:
+        """
+        Copy bodies from the old inline emails columns into email_bodies, then drop those columns
+        
+        Runs in batches of emails that have no email_bodies row yet, each batch in its own
+        transaction, so an interrupted migration resumes where it stopped.
+        
+        Args:
+            batch_size: Emails moved per transaction
+            
+        Returns:
+            Number of emails migrated
+        """
+        existing_columns = {column['name'] for column in inspect(self.engine).get_columns('emails')}
+        inline_columns = [name for name in INLINE_BODY_COLUMNS if name in existing_columns]
+        if not inline_columns:
+            return 0
+        
+        selected = ', '.join(f'e.{name}' for name in inline_columns)
+        select_batch = text(
+            f'SELECT e.id, {selected} FROM emails e '
+            f'LEFT JOIN email_bodies b ON b.email_id = e.id '
+            f'WHERE b.email_id IS NULL ORDER BY e.id LIMIT :limit'
+        )
+        clear_batch = text(
+            f"UPDATE emails SET {', '.join(f'{name} = NULL' for name in inline_columns)} WHERE id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True))
+        
+        migrated = 0
+        while True:
+            with self.engine.begin() as connection:
+                rows = connection.execute(select_batch, {'limit': batch_size}).mappings().all()
+                if not rows:
+                    break
+                
+                connection.execute(insert(EmailBody.__table__), [
+                    {'email_id': row['id'], **{name: row[name] for name in inline_columns}}
+                    for row in rows
+                ])
+                connection.execute(clear_batch, {'ids': [row['id'] for row in rows]})
+                migrated += len(rows)
+        
+        if migrated:
+            logger.info(f"Moved the bodies of {migrated} emails into email_bodies")
+        
+        # The inline copies are all NULL now; dropping the columns keeps them out of every row read
+        for name in inline_columns:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE emails DROP COLUMN {name}'))
+            except Exception as e:
+                logger.warning(f"Could not drop emails.{name} (left empty): {str(e)}")
+        
+        return migrated
+    
     def get_session(self) -> Session:
         """Get a new database session"""
         return self.SessionLocal()
@@ -486,6 +957,11 @@ class DatabaseManager:
         with self.get_session() as session:
             return session.query(User).filter(User.email == email).first()
     
+    def get_user_by_id(self, user_id: int) -> Optional[User]:
+        """Get user by primary key"""
+        with self.get_session() as session:
+            return session.query(User).filter(User.id == user_id).first()
+    
     def create_or_update_user(self, user_info: Dict, credentials: Dict) -> User:
         """Create or update user with OAuth info"""
         with self.get_session() as session:
@@ -529,42 +1005,602 @@ class DatabaseManager:
                 return existing
             
             # Create new email record
-            email = Email(
-                user_id=user_id,
-                gmail_id=email_data['id'],
-                thread_id=email_data.get('thread_id'),
-                sender=email_data.get('sender'),
-                sender_name=email_data.get('sender_name'),
-                subject=email_data.get('subject'),
+            email = self._build_email(user_id, email_data)
+            
+            session.add(email)
+            session.commit()
+            session.refresh(email)
+            return email
+    
+    def save_emails(self, user_id: int, emails_data: List[Dict]) -> List[Email]:
+        """
+        Save a list of emails that are known not to be stored yet in one transaction
+        
+        Callers are expected to have filtered out stored IDs with get_emails_by_gmail_ids,
+        so no per-email existence SELECT is issued here.
+        """
+        if not emails_data:
+            return []
+        
+        with self.get_session() as session:
+            emails = [self._build_email(user_id, email_data) for email_data in emails_data]
+            session.add_all(emails)
+            session.commit()
+            
+            # Load the generated IDs and defaults before the session closes
+            for email in emails:
+                session.refresh(email)
+            return emails
+    
+    def get_emails_by_gmail_ids(self, user_id: int, gmail_ids: List[str]) -> Dict[str, Email]:
+        """
+        Resolve a list of Gmail IDs against stored emails using indexed IN queries
+        
+        Args:
+            user_id: Database user ID
+            gmail_ids: Candidate Gmail message IDs
+            
+        Returns:
+            Dictionary of gmail_id to Email for the IDs that are already stored
+        """
+        found = {}
+        unique_ids = list(dict.fromkeys(gmail_ids))
+        
+        with self.get_session() as session:
+            # Chunk to stay under SQLite's bound-parameter limit
+            for i in range(0, len(unique_ids), self.IN_QUERY_CHUNK_SIZE):
+                chunk = unique_ids[i:i + self.IN_QUERY_CHUNK_SIZE]
+                for email in session.query(Email).filter(
+                    Email.user_id == user_id,
+                    Email.gmail_id.in_(chunk)
+                ):
+                    found[email.gmail_id] = email
+        
+        return found
+    
+    def get_existing_gmail_ids(self, user_id: int, gmail_ids: List[str]) -> Set[str]:
+        """Return the subset of Gmail IDs already stored for a user (IDs only, no row data)"""
+        found = set()
+        unique_ids = list(dict.fromkeys(gmail_ids))
+        
+        with self.get_session() as session:
+            for i in range(0, len(unique_ids), self.IN_QUERY_CHUNK_SIZE):
+                chunk = unique_ids[i:i + self.IN_QUERY_CHUNK_SIZE]
+                rows = session.query(Email.gmail_id).filter(
+                    Email.user_id == user_id,
+                    Email.gmail_id.in_(chunk)
+                ).all()
+                found.update(row.gmail_id for row in rows)
+        
+        return found
+    
+    def get_emails_by_ids(self, user_id: int, email_ids: List[int], body_fields: tuple = ()) -> Dict[int, Email]:
+        """
+        Load a user's emails by primary key with one IN query per chunk
+        
+        Args:
+            user_id: Owner of the emails
+            email_ids: Email primary keys
+            body_fields: EmailBody columns to load along with each email (see with_bodies)
+            
+        Returns:
+            Dictionary mapping email ID to Email for the IDs that exist
+        """
+        found = {}
+        unique_ids = list(dict.fromkeys(email_ids))
+        
+        with self.get_session() as session:
+            for i in range(0, len(unique_ids), self.IN_QUERY_CHUNK_SIZE):
+                chunk = unique_ids[i:i + self.IN_QUERY_CHUNK_SIZE]
+                query = session.query(Email).filter(
+                    Email.user_id == user_id,
+                    Email.id.in_(chunk)
+                )
+                if body_fields:
+                    query = query.options(with_bodies(*body_fields))
+                for email in query:
+                    found[email.id] = email
+        
+        return found
+    
+    def _build_email(self, user_id: int, email_data: Dict) -> Email:
+        """Create an Email record from processed email data"""
+        return Email(
+            user_id=user_id,
+            gmail_id=email_data['id'],
+            thread_id=email_data.get('thread_id'),
+            thread_position=email_data.get('thread_position'),
+            sender=email_data.get('sender'),
+            sender_name=email_data.get('sender_name'),
+            subject=email_data.get('subject'),
+            body=EmailBody(
                 body_text=email_data.get('body_text'),
                 body_html=email_data.get('body_html'),
-                body_clean=email_data.get('body_clean'),
-                body_preview=email_data.get('body_preview'),
-                snippet=email_data.get('snippet'),
-                recipients=email_data.get('recipients', []),
-                cc=email_data.get('cc', []),
-                bcc=email_data.get('bcc', []),
-                labels=email_data.get('labels', []),
-                attachments=email_data.get('attachments', []),
-                entities=email_data.get('entities', {}),
-                email_date=email_data.get('timestamp'),
-                size_estimate=email_data.get('size_estimate'),
-                message_type=email_data.get('message_type'),
-                priority_score=email_data.get('priority_score'),
-                is_read=email_data.get('is_read', False),
-                is_important=email_data.get('is_important', False),
-                is_starred=email_data.get('is_starred', False),
-                has_attachments=email_data.get('has_attachments', False),
-                normalizer_version=email_data.get('processing_metadata', {}).get('normalizer_version'),
-                has_errors=email_data.get('error', False),
-                error_message=email_data.get('error_message')
-            )
+                body_clean=email_data.get('body_clean')
+            ),
+            body_preview=email_data.get('body_preview'),
+            snippet=email_data.get('snippet'),
+            recipients=email_data.get('recipients', []),
+            cc=email_data.get('cc', []),
+            bcc=email_data.get('bcc', []),
+            labels=email_data.get('labels', email_data.get('label_ids', [])),
+            attachments=email_data.get('attachments', []),
+            entities=email_data.get('entities', {}),
+            list_unsubscribe=email_data.get('list_unsubscribe') or None,
+            precedence=email_data.get('precedence') or None,
+            auto_submitted=email_data.get('auto_submitted') or None,
+            email_date=email_data.get('timestamp'),
+            size_estimate=email_data.get('size_estimate'),
+            message_type=email_data.get('message_type'),
+            priority_score=email_data.get('priority_score'),
+            is_read=email_data.get('is_read', False),
+            is_important=email_data.get('is_important', False),
+            is_starred=email_data.get('is_starred', False),
+            has_attachments=email_data.get('has_attachments', False),
+            body_status=email_data.get('body_status', 'full'),
+            body_truncated=email_data.get('body_truncated', False),
+            # Only set once the email was normalized successfully, so failures are picked up again
+            normalizer_version=(
+                email_data.get('processing_metadata', {}).get('normalizer_version')
+                if 'body_clean' in email_data else None
+            ),
+            has_errors=email_data.get('error', False),
+            error_message=email_data.get('error_message')
+        )
+    
+    def bulk_update_normalized(self, updates: List[Dict], chunk_size: int = None) -> Dict:
+        """
+        Write normalization results back with one executemany UPDATE per chunk
+        
+        Each chunk is its own transaction, so a failing chunk is rolled back
+        without losing the chunks written before or after it.
+        
+        Args:
+            updates: Dictionaries with the email's primary key 'id' and the columns to set
+                     (body_clean, body_preview, entities, message_type, priority_score, normalizer_version);
+                     body columns are written to email_bodies
+            chunk_size: Rows per UPDATE and commit (defaults to NORMALIZE_WRITE_CHUNK_SIZE)
+            
+        Returns:
+            Dictionary with the IDs updated, the IDs whose chunk failed and the number of commits
+        """
+        chunk_size = chunk_size or settings.NORMALIZE_WRITE_CHUNK_SIZE
+        updated_ids = []
+        failed_ids = []
+        commits = 0
+        
+        for i in range(0, len(updates), chunk_size):
+            chunk = updates[i:i + chunk_size]
+            chunk_ids = [row['id'] for row in chunk]
+            
+            email_rows = [{key: value for key, value in row.items() if key not in INLINE_BODY_COLUMNS} for row in chunk]
+            body_rows = [
+                {'email_id': row['id'], **{key: row[key] for key in INLINE_BODY_COLUMNS if key in row}}
+                for row in chunk if any(key in row for key in INLINE_BODY_COLUMNS)
+            ]
+            
+            with self.get_session() as session:
+                try:
+                    # A list of parameter sets keyed by primary key runs as a single executemany
+                    session.execute(update(Email), email_rows)
+                    if body_rows:
+                        session.execute(update(EmailBody), body_rows)
+                    session.commit()
+                    commits += 1
+                    updated_ids.extend(chunk_ids)
+                except Exception as e:
+                    session.rollback()
+                    failed_ids.extend(chunk_ids)
+                    logger.error(f"Failed to write normalization results for {len(chunk)} emails: {str(e)}")
+        
+        return {'updated_ids': updated_ids, 'failed_ids': failed_ids, 'commits': commits}
+    
+    def update_email_body(self, user_id: int, gmail_id: str, email_data: Dict) -> Optional[Email]:
+        """Store a lazily downloaded body and queue the email for re-normalization"""
+        with self.get_session() as session:
+            email = session.query(Email).filter(
+                Email.user_id == user_id,
+                Email.gmail_id == gmail_id
+            ).first()
+            
+            if not email:
+                return None
+            
+            if email_data.get('body_status') == 'metadata':
+                # Headers-only download: keep the stored body and its status
+                return email
+            
+            if email.body is None:
+                email.body = EmailBody()
+            email.body.body_text = email_data.get('body_text')
+            email.body.body_html = email_data.get('body_html')
+            email.body.body_clean = None
+            email.attachments = email_data.get('attachments', [])
+            email.has_attachments = email_data.get('has_attachments', False)
+            for header in ('list_unsubscribe', 'precedence', 'auto_submitted'):
+                if email_data.get(header):
+                    setattr(email, header, email_data[header])
+            email.body_status = 'full'
+            email.body_truncated = email_data.get('body_truncated', False)
+            email.normalizer_version = None
             
-            session.add(email)
             session.commit()
             session.refresh(email)
             return email
     
+    def save_thread(self, user_id: int, thread_data: Dict, positions: Dict[str, int]) -> Thread:
+        """
+        Create or update a thread summary and the thread order of its stored emails
+        
+        Args:
+            user_id: Database user ID
+            thread_data: Thread summary fields (gmail_thread_id, subject, participants, ...)
+            positions: Thread position of each message, keyed by Gmail message ID
+        """
+        with self.get_session() as session:
+            thread = session.query(Thread).filter(
+                Thread.user_id == user_id,
+                Thread.gmail_thread_id == thread_data['gmail_thread_id']
+            ).first()
+            
+            if not thread:
+                thread = Thread(user_id=user_id, gmail_thread_id=thread_data['gmail_thread_id'])
+                session.add(thread)
+            
+            for key, value in thread_data.items():
+                if hasattr(thread, key):
+                    setattr(thread, key, value)
+            
+            # Messages stored earlier keep their rows; only their order may change
+            if positions:
+                emails = session.query(Email).filter(
+                    Email.user_id == user_id,
+                    Email.gmail_id.in_(list(positions))
+                ).all()
+                for email in emails:
+                    if email.thread_position != positions[email.gmail_id]:
+                        email.thread_position = positions[email.gmail_id]
+            
+            session.commit()
+            session.refresh(thread)
+            return thread
+    
+    def get_user_threads(self, user_id: int, limit: int = 50) -> List[Thread]:
+        """Get a user's threads, most recently active first"""
+        with self.get_session() as session:
+            return session.query(Thread).filter(
+                Thread.user_id == user_id
+            ).order_by(Thread.last_message_at.desc()).limit(limit).all()
+    
+    def get_thread_emails(self, user_id: int, gmail_thread_id: str) -> List[Email]:
+        """Get the stored emails of one thread in conversation order"""
+        with self.get_session() as session:
+            return session.query(Email).filter(
+                Email.user_id == user_id,
+                Email.thread_id == gmail_thread_id
+            ).order_by(Email.thread_position.asc(), Email.email_date.asc()).all()
+    
+    def update_user_history_id(self, user_id: int, history_id: str):
+        """Store the Gmail historyId watermark after a successful sync"""
+        with self.get_session() as session:
+            user = session.query(User).filter(User.id == user_id).first()
+            if user:
+                user.gmail_history_id = str(history_id)
+                user.gmail_history_synced_at = datetime.utcnow()
+                session.commit()
+    
+    def get_backfill_job(self, user_id: int) -> Optional[BackfillJob]:
+        """Get the backfill job for a user"""
+        with self.get_session() as session:
+            return session.query(BackfillJob).filter(BackfillJob.user_id == user_id).first()
+    
+    def save_backfill_job(self, user_id: int, updates: Dict) -> BackfillJob:
+        """Create or update the backfill job for a user"""
+        with self.get_session() as session:
+            job = session.query(BackfillJob).filter(BackfillJob.user_id == user_id).first()
+            if not job:
+                job = BackfillJob(user_id=user_id)
+                session.add(job)
+            
+            for key, value in updates.items():
+                if hasattr(job, key):
+                    setattr(job, key, value)
+            job.updated_at = datetime.utcnow()
+            
+            session.commit()
+            session.refresh(job)
+            return job
+    
+    def get_analysis_batches(self, user_id: int = None, status: str = None) -> List[AnalysisBatch]:
+        """Get analysis batches, optionally only one user's or those with one status"""
+        with self.get_session() as session:
+            query = session.query(AnalysisBatch)
+            if user_id is not None:
+                query = query.filter(AnalysisBatch.user_id == user_id)
+            if status:
+                query = query.filter(AnalysisBatch.status == status)
+            return query.order_by(AnalysisBatch.submitted_at).all()
+    
+    def get_unimported_batch_email_ids(self, batch_id: int) -> Set[int]:
+        """Get the IDs of the emails in an analysis batch whose results are not imported yet"""
+        with self.get_session() as session:
+            rows = session.query(AnalysisBatchEmail.email_id).filter(
+                AnalysisBatchEmail.batch_id == batch_id,
+                AnalysisBatchEmail.imported_at.is_(None)
+            ).all()
+            return {row.email_id for row in rows}
+    
+    def mark_batch_email_imported(self, batch_id: int, email_id: int, result_type: str):
+        """Record that the result for one email of an analysis batch has been imported"""
+        with self.get_session() as session:
+            session.query(AnalysisBatchEmail).filter(
+                AnalysisBatchEmail.batch_id == batch_id,
+                AnalysisBatchEmail.email_id == email_id
+            ).update({'result_type': result_type, 'imported_at': datetime.utcnow()}, synchronize_session=False)
+            session.commit()
+    
+    def count_batch_results(self, batch_id: int) -> Dict[str, int]:
+        """Count the imported results of an analysis batch by result type"""
+        with self.get_session() as session:
+            rows = session.query(AnalysisBatchEmail.result_type, func.count(AnalysisBatchEmail.id)).filter(
+                AnalysisBatchEmail.batch_id == batch_id,
+                AnalysisBatchEmail.imported_at.isnot(None)
+            ).group_by(AnalysisBatchEmail.result_type).all()
+            return {result_type: count for result_type, count in rows}
+    
+    def save_analysis_batch(self, batch_id: str, updates: Dict, email_ids: List[int] = None) -> AnalysisBatch:
+        """
+        Create or update the analysis batch with the given batch API ID
+        
+        Args:
+            batch_id: ID returned by the batch API
+            updates: Column values to set
+            email_ids: Emails submitted in the batch, recorded when it is created
+        """
+        with self.get_session() as session:
+            batch = session.query(AnalysisBatch).filter(AnalysisBatch.batch_id == batch_id).first()
+            if not batch:
+                batch = AnalysisBatch(batch_id=batch_id)
+                batch.emails = [AnalysisBatchEmail(email_id=email_id) for email_id in dict.fromkeys(email_ids or [])]
+                session.add(batch)
+            
+            for key, value in updates.items():
+                if hasattr(batch, key):
+                    setattr(batch, key, value)
+            batch.updated_at = datetime.utcnow()
+            
+            session.commit()
+            session.refresh(batch)
+            return batch
+    
+    def get_filter_rules(self, user_id: int, status: str = None) -> List[FilterRule]:
+        """Get a user's filter rules, optionally only those with one status"""
+        with self.get_session() as session:
+            query = session.query(FilterRule).filter(FilterRule.user_id == user_id)
+            if status:
+                query = query.filter(FilterRule.status == status)
+            return query.order_by(FilterRule.rule_type, FilterRule.value).all()
+    
+    def save_filter_rule(self, user_id: int, rule_type: str, value: str, updates: Dict) -> FilterRule:
+        """Create or update the filter rule identified by its type and value"""
+        with self.get_session() as session:
+            rule = session.query(FilterRule).filter(
+                FilterRule.user_id == user_id,
+                FilterRule.rule_type == rule_type,
+                FilterRule.value == value
+            ).first()
+            if not rule:
+                rule = FilterRule(user_id=user_id, rule_type=rule_type, value=value)
+                session.add(rule)
+            
+            for key, new_value in updates.items():
+                if hasattr(rule, key):
+                    setattr(rule, key, new_value)
+            
+            session.commit()
+            session.refresh(rule)
+            return rule
+    
+    def record_filter_skips(self, user_id: int, skipped: Dict[str, int], kept: Set[str], threshold: int) -> List[FilterRule]:
+        """
+        Update learned sender exclusions from one round of processed emails
+        
+        Args:
+            user_id: Database user ID
+            skipped: Number of skipped emails per sender address
+            kept: Sender addresses that had at least one email worth keeping
+            threshold: Skips after which a candidate sender becomes an active exclusion
+        
+        Returns:
+            Rules that became active in this call
+        """
+        activated = []
+        senders = set(skipped) | kept
+        if not senders:
+            return activated
+        
+        with self.get_session() as session:
+            rules = {}
+            sender_list = list(senders)
+            for i in range(0, len(sender_list), self.IN_QUERY_CHUNK_SIZE):
+                chunk = sender_list[i:i + self.IN_QUERY_CHUNK_SIZE]
+                for rule in session.query(FilterRule).filter(
+                    FilterRule.user_id == user_id,
+                    FilterRule.rule_type == 'sender',
+                    FilterRule.value.in_(chunk)
+                ).all():
+                    rules[rule.value] = rule
+            
+            now = datetime.utcnow()
+            for sender in senders:
+                rule = rules.get(sender)
+                
+                if sender in kept:
+                    # A sender that also sends mail worth keeping is never learned
+                    if rule and rule.status == 'candidate':
+                        rule.skip_count = 0
+                    continue
+                
+                if not rule:
+                    rule = FilterRule(user_id=user_id, rule_type='sender', value=sender,
+                                      status='candidate', source='learned', skip_count=0)
+                    session.add(rule)
+                elif rule.status != 'candidate':
+                    continue
+                
+                rule.skip_count = (rule.skip_count or 0) + skipped[sender]
+                rule.last_skipped_at = now
+                if rule.skip_count >= threshold:
+                    rule.status = 'active'
+                    activated.append(rule)
+            
+            session.commit()
+            for rule in activated:
+                session.refresh(rule)
+            return activated
+
+    def get_normalization_cache_entries(self, user_id: int, normalizer_version: str,
+                                        content_hashes: List[str]) -> Dict[str, Dict]:
+        """
+        Look up a user's cached normalization output by content hash and count the hits
+        
+        Args:
+            user_id: Database user ID
+            normalizer_version: Version of the normalizer that produced the entries
+            content_hashes: SHA-256 hex digests of raw bodies
+            
+        Returns:
+            Dictionary of content hash to cached fields for the hashes that are stored
+        """
+        found = {}
+        unique_hashes = list(dict.fromkeys(content_hashes))
+        
+        with self.get_session() as session:
+            for i in range(0, len(unique_hashes), self.IN_QUERY_CHUNK_SIZE):
+                chunk = unique_hashes[i:i + self.IN_QUERY_CHUNK_SIZE]
+                entries = session.query(NormalizationCacheEntry).filter(
+                    NormalizationCacheEntry.user_id == user_id,
+                    NormalizationCacheEntry.normalizer_version == normalizer_version,
+                    NormalizationCacheEntry.content_hash.in_(chunk)
+                ).all()
+                for entry in entries:
+                    found[entry.content_hash] = entry.to_dict()
+                    entry.hit_count = (entry.hit_count or 0) + 1
+                    entry.last_used_at = datetime.utcnow()
+            
+            if found:
+                session.commit()
+        
+        return found
+    
+    def save_normalization_cache_entries(self, user_id: int, normalizer_version: str, entries: Dict[str, Dict]) -> int:
+        """
+        Store a user's normalization output for content hashes that are not cached yet
+        
+        Args:
+            user_id: Database user ID
+            normalizer_version: Version of the normalizer that produced the entries
+            entries: Dictionary of content hash to cached fields
+            
+        Returns:
+            Number of entries inserted
+        """
+        if not entries:
+            return 0
+        
+        existing = set()
+        hashes = list(entries)
+        
+        with self.get_session() as session:
+            for i in range(0, len(hashes), self.IN_QUERY_CHUNK_SIZE):
+                chunk = hashes[i:i + self.IN_QUERY_CHUNK_SIZE]
+                rows = session.query(NormalizationCacheEntry.content_hash).filter(
+                    NormalizationCacheEntry.user_id == user_id,
+                    NormalizationCacheEntry.normalizer_version == normalizer_version,
+                    NormalizationCacheEntry.content_hash.in_(chunk)
+                ).all()
+                existing.update(row.content_hash for row in rows)
+            
+            new_entries = [
+                NormalizationCacheEntry(
+                    user_id=user_id,
+                    normalizer_version=normalizer_version,
+                    content_hash=content_hash,
+                    body_clean=fields.get('body_clean'),
+                    body_preview=fields.get('body_preview'),
+                    entities=fields.get('entities'),
+                    body_keywords=fields.get('body_keywords'),
+                    quote_cut=fields.get('quote_cut')
+                )
+                for content_hash, fields in entries.items() if content_hash not in existing
+            ]
+            if not new_entries:
+                return 0
+            
+            try:
+                session.add_all(new_entries)
+                session.commit()
+                return len(new_entries)
+            except IntegrityError:
+                # Another process cached the same body first; its entry is equivalent
+                session.rollback()
+                return 0
+    
+    def update_user_watch(self, user_id: int, expires_at: Optional[datetime]):
+        """Store when the user's Gmail push registration expires (None when stopped)"""
+        with self.get_session() as session:
+            user = session.query(User).filter(User.id == user_id).first()
+            if user:
+                user.gmail_watch_expires_at = expires_at
+                session.commit()
+    
+    def get_users_with_expiring_watch(self, before: datetime) -> List[User]:
+        """Get active users whose Gmail push registration expires before the given time"""
+        with self.get_session() as session:
+            return session.query(User).filter(
+                User.is_active == True,
+                User.gmail_watch_expires_at.isnot(None),
+                User.gmail_watch_expires_at < before
+            ).all()
+    
+    def delete_emails(self, user_id: int, gmail_ids: List[str]) -> int:
+        """Delete emails (and their tasks and batch entries) that were removed from the mailbox"""
+        if not gmail_ids:
+            return 0
+        
+        with self.get_session() as session:
+            emails = session.query(Email).filter(
+                Email.user_id == user_id,
+                Email.gmail_id.in_(gmail_ids)
+            ).all()
+            
+            for email in emails:
+                session.delete(email)
+            
+            session.commit()
+            return len(emails)
+    
+    def update_email_labels(self, user_id: int, labels_by_gmail_id: Dict[str, List[str]]) -> int:
+        """Update Gmail labels and the flags derived from them"""
+        if not labels_by_gmail_id:
+            return 0
+        
+        with self.get_session() as session:
+            emails = session.query(Email).filter(
+                Email.user_id == user_id,
+                Email.gmail_id.in_(list(labels_by_gmail_id.keys()))
+            ).all()
+            
+            for email in emails:
+                label_ids = labels_by_gmail_id[email.gmail_id]
+                email.labels = label_ids
+                email.is_read = 'UNREAD' not in label_ids
+                email.is_important = 'IMPORTANT' in label_ids
+                email.is_starred = 'STARRED' in label_ids
+            
+            session.commit()
+            return len(emails)
+    
     def save_task(self, user_id: int, email_id: Optional[int], task_data: Dict) -> Task:
         """Save extracted task to database"""
         with self.get_session() as session:
@@ -0,0 +1,369 @@
+# Bulk email analysis through the Message Batches API
+
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import anthropic
+
+from config.settings import settings
+from models.database import get_db_manager, AnalysisBatch
+from processors.email_intelligence import email_intelligence
+from processors.task_extractor import task_extractor
+
+logger = logging.getLogger(__name__)
+
+# Analyses that can be submitted in batches: EmailIntelligenceProcessor and TaskExtractor
+ANALYSIS_KINDS = ('intelligence', 'tasks')
+
+
+class BatchBackend(ABC):
+    """
+    Submits Message Batches and reads back their results
+
+    Results are dictionaries with 'custom_id' and 'type' (succeeded, errored,
+    canceled or expired), plus 'text' for succeeded requests and 'error' otherwise.
+    """
+
+    @abstractmethod
+    def create(self, requests: List[Dict]) -> str:
+        """
+        Submit a batch of {'custom_id', 'params'} requests
+
+        Returns:
+            The batch ID
+        """
+
+    @abstractmethod
+    def is_ended(self, batch_id: str) -> bool:
+        """Check whether every request in a batch has finished processing"""
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        """Iterate over the results of an ended batch"""
+
+
+class AnthropicBatchBackend(BatchBackend):
+    """The Anthropic Message Batches API"""
+
+    def __init__(self):
+        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+
+    def create(self, requests: List[Dict]) -> str:
+        return self.client.messages.batches.create(requests=requests).id
+
+    def is_ended(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == 'ended'
+
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == 'succeeded':
+                content = result.message.content
+                yield {'custom_id': entry.custom_id, 'type': 'succeeded', 'text': content[0].text if content else ''}
+            else:
+                error = getattr(result, 'error', None)
+                yield {'custom_id': entry.custom_id, 'type': result.type, 'error': str(error) if error else result.type}
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    In-process stand-in for the Message Batches API
+
+    Requests are answered by the responder, a callable taking the
+    messages.create params of one request and returning the response text;
+    a responder that raises marks that request errored. Batches stay in
+    progress until complete() is called, or end the first time they are
+    polled when auto_complete is set.
+    """
+
+    def __init__(self, responder: Callable[[Dict], str] = None, auto_complete: bool = True):
+        # Without a responder every request gets an empty JSON object: no insights, no tasks
+        self.responder = responder or (lambda params: '{}')
+        self.auto_complete = auto_complete
+        self.batches: Dict[str, Dict] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def create(self, requests: List[Dict]) -> str:
+        with self._lock:
+            self._sequence += 1
+            batch_id = f"msgbatch_local_{self._sequence}"
+            self.batches[batch_id] = {'requests': list(requests), 'results': None}
+        return batch_id
+
+    def complete(self, batch_id: str = None):
+        """Answer every request of one batch (or of all batches) and end it"""
+        for pending_id in ([batch_id] if batch_id else list(self.batches)):
+            batch = self.batches[pending_id]
+            if batch['results'] is not None:
+                continue
+
+            results = []
+            for request in batch['requests']:
+                try:
+                    results.append({
+                        'custom_id': request['custom_id'],
+                        'type': 'succeeded',
+                        'text': self.responder(request['params'])
+                    })
+                except Exception as e:
+                    results.append({'custom_id': request['custom_id'], 'type': 'errored', 'error': str(e)})
+            batch['results'] = results
+
+    def is_ended(self, batch_id: str) -> bool:
+        if batch_id not in self.batches:
+            raise KeyError(f"Unknown batch {batch_id}")
+        if self.auto_complete:
+            self.complete(batch_id)
+        return self.batches[batch_id]['results'] is not None
+
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        return iter(self.batches[batch_id]['results'] or [])
+
+
+def create_batch_backend(kind: str = None) -> BatchBackend:
+    """Create the batch backend selected by CLAUDE_BATCH_BACKEND"""
+    kind = kind or settings.CLAUDE_BATCH_BACKEND
+    if kind == 'local':
+        return LocalBatchBackend()
+    if kind == 'anthropic':
+        return AnthropicBatchBackend()
+    raise ValueError(f"Unknown batch backend: {kind}")
+
+
+class BatchAnalysis:
+    """
+    Runs bulk email analysis through Message Batches instead of one call per email
+
+    submit() packs a user's pending emails into batches of the same requests the
+    synchronous path sends and records each batch ID in analysis_batches, with
+    one analysis_batch_emails row per email. Emails waiting in a batch are not
+    submitted again. poll() checks the open batches and, once a batch has
+    ended, feeds its results through the same persistence as the synchronous
+    path: email insights, people, projects and tasks. Each imported result is
+    marked on its analysis_batch_emails row, so a poll that retries a
+    partially imported batch skips the results already persisted.
+
+    Interactive requests keep using the synchronous processors; this is for
+    overnight and backfill work, where results arriving within hours is fine.
+    """
+
+    def __init__(self, backend: BatchBackend = None, max_requests: int = settings.CLAUDE_BATCH_MAX_REQUESTS):
+        self._backend = backend
+        self.max_requests = max(1, max_requests)
+        self._stop = threading.Event()
+
+    @property
+    def backend(self) -> BatchBackend:
+        # Created on first use so importing this module needs no API key
+        if self._backend is None:
+            self._backend = create_batch_backend()
+        return self._backend
+
+    def submit(self, user_email: str, kind: str = 'intelligence', limit: int = None, force_refresh: bool = False) -> Dict:
+        """
+        Submit a user's pending emails for batch analysis
+
+        Args:
+            user_email: Email of the user
+            kind: 'intelligence' (EmailIntelligenceProcessor) or 'tasks' (TaskExtractor)
+            limit: Maximum number of emails to submit (all pending emails if None)
+            force_refresh: Whether to re-analyze emails that were already analyzed
+
+        Returns:
+            Dictionary with the submitted batches
+        """
+        if kind not in ANALYSIS_KINDS:
+            return {'success': False, 'error': f'Unknown analysis kind: {kind}'}
+
+        db = get_db_manager()
+        user = db.get_user_by_email(user_email)
+        if not user:
+            return {'success': False, 'error': 'User not found'}
+
+        try:
+            requests = self._build_requests(user, kind, limit, force_refresh)
+
+            batches = []
+            for i in range(0, len(requests), self.max_requests):
+                chunk = requests[i:i + self.max_requests]
+                batch_id = self.backend.create([request for _, request in chunk])
+                batch = db.save_analysis_batch(batch_id, {
+                    'user_id': user.id,
+                    'kind': kind,
+                    'status': 'in_progress',
+                    'request_count': len(chunk)
+                }, email_ids=[email_id for email_id, _ in chunk])
+                batches.append(batch.to_dict())
+                logger.info(f"Submitted {kind} batch {batch_id} with {len(chunk)} emails for {user_email}")
+
+            return {
+                'success': True,
+                'user_email': user_email,
+                'kind': kind,
+                'submitted_emails': len(requests),
+                'batches': batches
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to submit {kind} batch for {user_email}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def poll(self, user_email: str = None) -> Dict:
+        """
+        Import the results of every open batch that has ended
+
+        Args:
+            user_email: Only poll this user's batches (all users if None)
+
+        Returns:
+            Dictionary with the imported batches and how many are still in progress
+        """
+        db = get_db_manager()
+        user_id = None
+        if user_email:
+            user = db.get_user_by_email(user_email)
+            if not user:
+                return {'success': False, 'error': 'User not found'}
+            user_id = user.id
+
+        imported = []
+        in_progress = 0
+
+        for batch in db.get_analysis_batches(user_id, status='in_progress'):
+            try:
+                if not self.backend.is_ended(batch.batch_id):
+                    in_progress += 1
+                    continue
+
+                counts = self._import_results(batch)
+                batch = db.save_analysis_batch(batch.batch_id, dict(
+                    counts,
+                    status='imported',
+                    imported_at=datetime.utcnow(),
+                    last_error=None
+                ))
+                imported.append(dict(batch.to_dict(), **counts))
+                logger.info(f"Imported {batch.kind} batch {batch.batch_id}: {counts}")
+
+            except Exception as e:
+                # Left in progress so the next poll retries it
+                logger.error(f"Failed to import batch {batch.batch_id}: {str(e)}")
+                db.save_analysis_batch(batch.batch_id, {'last_error': str(e)})
+                in_progress += 1
+
+        return {'success': True, 'imported_batches': imported, 'in_progress': in_progress}
+
+    def get_batches(self, user_email: str) -> Dict:
+        """List a user's analysis batches"""
+        db = get_db_manager()
+        user = db.get_user_by_email(user_email)
+        if not user:
+            return {'success': False, 'error': 'User not found'}
+
+        return {
+            'success': True,
+            'user_email': user_email,
+            'batches': [batch.to_dict() for batch in db.get_analysis_batches(user.id)]
+        }
+
+    def stop_poller(self):
+        """Make a running run_poller() return after its current poll"""
+        self._stop.set()
+
+    def run_poller(self, interval: int = settings.CLAUDE_BATCH_POLL_SECONDS, until_idle: bool = False,
+                   user_email: str = None) -> Dict:
+        """
+        Poll open batches until stopped, or until none are left when until_idle is set
+
+        Args:
+            interval: Seconds between polls
+            until_idle: Return once no batch is in progress
+            user_email: Only poll this user's batches (all users if None)
+
+        Returns:
+            The result of the last poll
+        """
+        while True:
+            result = self.poll(user_email)
+            if not result.get('success') or (until_idle and not result.get('in_progress')):
+                return result
+            if self._stop.wait(interval):
+                return result
+
+    def _build_requests(self, user, kind: str, limit: Optional[int], force_refresh: bool) -> List[Tuple[int, Dict]]:
+        """Build (email ID, batch request) pairs for a user's pending emails not already in an open batch"""
+        requests = []
+
+        if kind == 'intelligence':
+            for email in email_intelligence._get_unreplied_emails(user.id, limit, force_refresh, kind):
+                params = email_intelligence._build_analysis_request(email, user)
+                requests.append((email.id, {'custom_id': self._custom_id(email.id), 'params': params}))
+        else:
+            for email in task_extractor._get_pending_emails(user.id, limit, force_refresh, kind):
+                email_data = task_extractor._email_to_dict(email)
+                if task_extractor._skip_reason(email_data):
+                    continue
+                params = task_extractor._build_task_request(task_extractor._prepare_email_context(email_data))
+                requests.append((email.id, {'custom_id': self._custom_id(email.id), 'params': params}))
+
+        return requests
+
+    def _import_results(self, batch: AnalysisBatch) -> Dict:
+        """
+        Persist the results of an ended batch that were not imported yet and return its counters
+
+        succeeded_count and errored_count cover the whole batch; insights_extracted
+        and tasks_created only the results persisted by this call.
+        """
+        db = get_db_manager()
+        user = db.get_user_by_id(batch.user_id)
+        emails = db.get_emails_by_ids(
+            batch.user_id,
+            db.get_unimported_batch_email_ids(batch.id),
+            body_fields=('body_clean',) if batch.kind == 'tasks' else ()
+        )
+
+        counts = {'insights_extracted': 0, 'tasks_created': 0}
+
+        for result in self.backend.results(batch.batch_id):
+            # Results imported by an earlier poll are no longer in emails
+            email = emails.pop(self._email_id(result['custom_id']), None)
+            if not email:
+                continue
+
+            if result['type'] != 'succeeded':
+                logger.warning(f"Batch request for email {email.gmail_id} {result['type']}: {result.get('error')}")
+            elif batch.kind == 'intelligence':
+                analysis = email_intelligence._parse_analysis_response(result['text'], email)
+                outcome = email_intelligence._persist_email_analysis(user, email, analysis)
+                counts['insights_extracted'] += int(outcome['analyzed'])
+                counts['tasks_created'] += outcome['tasks_created']
+            else:
+                tasks = task_extractor._tasks_from_response(result['text'], task_extractor._email_to_dict(email))
+                counts['tasks_created'] += task_extractor._save_tasks(batch.user_id, email.id, tasks)
+
+            db.mark_batch_email_imported(batch.id, email.id, result['type'])
+
+        results = db.count_batch_results(batch.id)
+        counts['succeeded_count'] = results.get('succeeded', 0)
+        counts['errored_count'] = sum(results.values()) - counts['succeeded_count']
+        return counts
+
+    @staticmethod
+    def _custom_id(email_id: int) -> str:
+        return f"email-{email_id}"
+
+    @staticmethod
+    def _email_id(custom_id: str) -> Optional[int]:
+        try:
+            return int(custom_id.rsplit('-', 1)[1])
+        except (IndexError, ValueError):
+            return None
+
+
+# Global instance
+batch_analysis = BatchAnalysis()
@@ -0,0 +1,66 @@
+# Runs many Claude analysis requests concurrently on the async Anthropic client
+
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+
+import anthropic
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class ConcurrentAnalyzer:
+    """
+    Sends one messages.create request per item, at most `concurrency` at a time
+
+    Each call spends seconds waiting on the API, so the calls are overlapped on
+    one event loop instead of being made back to back. Results are yielded as
+    the calls complete (arrival order, not input order) together with the item
+    they belong to. A failed call yields its exception instead of a message, so
+    one bad request does not stop the rest.
+
+    The client's own retries (max_retries) handle rate limits and transient
+    errors; the semaphore keeps the number of in-flight requests bounded.
+    """
+
+    def __init__(self, concurrency: int = settings.CLAUDE_ANALYSIS_CONCURRENCY,
+                 client_factory: Optional[Callable[[], anthropic.AsyncAnthropic]] = None):
+        self.concurrency = max(1, concurrency)
+        self.client_factory = client_factory or (lambda: anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY))
+
+    async def stream(self, items: Iterable[T], build_request: Callable[[T], Dict]) -> AsyncIterator[Tuple[T, object]]:
+        """
+        Analyze every item and yield (item, message or exception) as each call completes
+
+        Args:
+            items: Items to analyze
+            build_request: Returns the messages.create keyword arguments for an item
+
+        Yields:
+            Tuples of the item and the API message, or the exception the call raised
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        # The async client's connection pool belongs to the running event loop
+        async with self.client_factory() as client:
+
+            async def analyze(item: T) -> Tuple[T, object]:
+                async with semaphore:
+                    try:
+                        return item, await client.messages.create(**build_request(item))
+                    except Exception as e:
+                        return item, e
+
+            tasks = [asyncio.create_task(analyze(item)) for item in items]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                # Consumer stopped early: do not leave requests running against a closed client
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,5 +1,6 @@
 # Enhanced Email Intelligence Processor using Claude 4 Sonnet
 
+import asyncio
 import json
 import logging
 import re
@@ -8,7 +9,10 @@ from typing import Dict, List, Optional, Tuple
 import anthropic
 
 from config.settings import settings
-from models.database import get_db_manager, Email, Person, Project, Task, User
+from models.database import get_db_manager, in_pending_batch, Email, Person, Project, Task, User, with_bodies
+from processors.concurrent_analysis import ConcurrentAnalyzer
+from processors.keyword_matcher import keyword_matcher
+from processors.size_budget import size_budget
 
 logger = logging.getLogger(__name__)
 
@@ -48,45 +52,14 @@ class EmailIntelligenceProcessor:
                     'message': 'No unreplied emails need processing'
                 }
             
-            processed_count = 0
-            insights_extracted = 0
-            people_identified = 0
-            projects_identified = 0
-            tasks_created = 0
+            # Claude calls run concurrently; each result is stored as soon as its call completes
+            email_results = asyncio.run(self._analyze_emails_concurrently(emails, user))
             
-            for email in emails:
-                try:
-                    # Get comprehensive email analysis from Claude
-                    analysis = self._get_comprehensive_email_analysis(email, user)
-                    
-                    if analysis:
-                        # Update email with insights
-                        self._update_email_with_insights(email, analysis)
-                        
-                        # Extract and update people information
-                        if analysis.get('people'):
-                            people_count = self._process_people_insights(user.id, analysis, email)
-                            people_identified += people_count
-                        
-                        # Extract and update project information
-                        if analysis.get('project'):
-                            project = self._process_project_insights(user.id, analysis['project'], email)
-                            if project:
-                                projects_identified += 1
-                                email.project_id = project.id
-                        
-                        # Extract specific tasks for the user
-                        if analysis.get('tasks'):
-                            tasks_count = self._process_intelligent_tasks(user.id, email.id, analysis['tasks'])
-                            tasks_created += tasks_count
-                        
-                        insights_extracted += 1
-                    
-                    processed_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to intelligently process email {email.gmail_id}: {str(e)}")
-                    continue
+            processed_count = sum(1 for result in email_results if result['processed'])
+            insights_extracted = sum(1 for result in email_results if result['analyzed'])
+            people_identified = sum(result['people_identified'] for result in email_results)
+            projects_identified = sum(result['projects_identified'] for result in email_results)
+            tasks_created = sum(result['tasks_created'] for result in email_results)
             
             logger.info(f"Intelligently processed {processed_count} emails for {user_email}")
             
@@ -98,6 +71,7 @@ class EmailIntelligenceProcessor:
                 'people_identified': people_identified,
                 'projects_identified': projects_identified,
                 'tasks_created': tasks_created,
+                'email_results': email_results,
                 'processor_version': self.version
             }
             
@@ -105,14 +79,19 @@ class EmailIntelligenceProcessor:
             logger.error(f"Failed intelligent email processing for {user_email}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def _get_unreplied_emails(self, user_id: int, limit: int, force_refresh: bool) -> List[Email]:
+    def _get_unreplied_emails(self, user_id: int, limit: int, force_refresh: bool,
+                          exclude_batch_kind: str = None) -> List[Email]:
         """Get emails that the user hasn't replied to and need processing"""
         with get_db_manager().get_session() as session:
-            query = session.query(Email).filter(
+            query = session.query(Email).options(with_bodies('body_clean')).filter(
                 Email.user_id == user_id,
-                Email.body_clean.isnot(None)  # Already normalized
+                Email.normalizer_version.isnot(None)  # Already normalized
             )
             
+            if exclude_batch_kind:
+                # Already submitted in a batch whose results are not imported yet
+                query = query.filter(~in_pending_batch(exclude_batch_kind))
+            
             if not force_refresh:
                 # Only process emails that don't have AI analysis yet
                 query = query.filter(Email.ai_summary.is_(None))
@@ -137,32 +116,100 @@ class EmailIntelligenceProcessor:
         if email.sender and user_email.lower() in email.sender.lower():
             return False
         
-        # If email contains certain patterns suggesting it's automated, skip
-        automated_patterns = [
-            'noreply', 'no-reply', 'donotreply', 'automated', 'newsletter',
-            'unsubscribe', 'notification only', 'system generated'
-        ]
-        
-        sender_lower = (email.sender or '').lower()
-        subject_lower = (email.subject or '').lower()
+        hits = keyword_matcher.scan({'sender': email.sender, 'subject': email.subject})
         
-        if any(pattern in sender_lower or pattern in subject_lower for pattern in automated_patterns):
+        # If email contains certain patterns suggesting it's automated, skip
+        if hits.has('automated_pattern'):
             return False
         
         # If email is marked as important or has action-oriented subject, include it
-        action_words = ['review', 'approve', 'sign', 'confirm', 'urgent', 'asap', 'deadline', 'meeting']
-        if any(word in subject_lower for word in action_words):
+        if hits.has('action_word'):
             return True
         
         # Default to including emails that seem personal/business oriented
         return True
     
+    async def _analyze_emails_concurrently(self, emails: List[Email], user) -> List[Dict]:
+        """
+        Analyze emails with concurrent Claude calls and store each result as it arrives
+        
+        Results are consumed one at a time, so database writes never overlap; each
+        write runs in a worker thread so the calls still in flight keep progressing.
+        
+        Returns:
+            Per-email result dictionaries, in completion order
+        """
+        analyzer = ConcurrentAnalyzer()
+        email_results = []
+        
+        async for email, message in analyzer.stream(emails, lambda email: self._build_analysis_request(email, user)):
+            if isinstance(message, Exception):
+                logger.error(f"Failed to get email analysis from Claude: {str(message)}")
+                analysis = None
+            else:
+                analysis = self._parse_analysis_response(self._response_text(message), email)
+            
+            email_results.append(await asyncio.to_thread(self._persist_email_analysis, user, email, analysis))
+        
+        return email_results
+    
+    def _persist_email_analysis(self, user, email: Email, analysis: Optional[Dict]) -> Dict:
+        """Store one email's analysis: insights, people, project and tasks"""
+        result = {
+            'email_id': email.id,
+            'gmail_id': email.gmail_id,
+            'processed': False,
+            'analyzed': False,
+            'people_identified': 0,
+            'projects_identified': 0,
+            'tasks_created': 0
+        }
+        
+        try:
+            if analysis:
+                # Update email with insights
+                self._update_email_with_insights(email, analysis)
+                
+                # Extract and update people information
+                if analysis.get('people'):
+                    result['people_identified'] = self._process_people_insights(user.id, analysis, email)
+                
+                # Extract and update project information
+                if analysis.get('project'):
+                    project = self._process_project_insights(user.id, analysis['project'], email)
+                    if project:
+                        result['projects_identified'] = 1
+                        email.project_id = project.id
+                
+                # Extract specific tasks for the user
+                if analysis.get('tasks'):
+                    result['tasks_created'] = self._process_intelligent_tasks(user.id, email.id, analysis['tasks'])
+                
+                result['analyzed'] = True
+            
+            result['processed'] = True
+            
+        except Exception as e:
+            logger.error(f"Failed to intelligently process email {email.gmail_id}: {str(e)}")
+            result['error'] = str(e)
+        
+        return result
+    
     def _get_comprehensive_email_analysis(self, email: Email, user) -> Optional[Dict]:
-        """Get comprehensive email analysis from Claude"""
+        """Get comprehensive email analysis from Claude (one synchronous call)"""
         try:
-            email_context = self._prepare_enhanced_email_context(email, user)
+            message = self.client.messages.create(**self._build_analysis_request(email, user))
+            return self._parse_analysis_response(self._response_text(message), email)
             
-            system_prompt = f"""You are an expert AI Chief of Staff that provides comprehensive email analysis for business intelligence and productivity.
+        except Exception as e:
+            logger.error(f"Failed to get email analysis from Claude: {str(e)}")
+            return None
+    
+    def _build_analysis_request(self, email: Email, user) -> Dict:
+        """Build the messages.create arguments for analyzing one email"""
+        email_context = self._prepare_enhanced_email_context(email, user)
+        
+        system_prompt = f"""You are an expert AI Chief of Staff that provides comprehensive email analysis for business intelligence and productivity.
 
 Your task is to analyze the email and provide a structured analysis covering:
 
@@ -235,21 +282,29 @@ Return a JSON object with this structure:
 
 Only extract tasks that are clearly directed at or relevant to the email recipient. Be specific and actionable."""
 
-            user_prompt = f"""Please analyze this email comprehensively:
+        user_prompt = f"""Please analyze this email comprehensively:
 
 {email_context}
 
 Focus on extracting meaningful business intelligence and actionable insights."""
 
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=3000,
-                temperature=0.1,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_prompt}]
-            )
-            
-            response_text = message.content[0].text.strip()
+        return {
+            'model': self.model,
+            'max_tokens': 3000,
+            'temperature': 0.1,
+            'system': system_prompt,
+            'messages': [{"role": "user", "content": user_prompt}]
+        }
+    
+    @staticmethod
+    def _response_text(message) -> str:
+        """Text of a Claude message (empty if it has no content blocks)"""
+        return message.content[0].text if message.content else ''
+    
+    def _parse_analysis_response(self, response_text: str, email: Email) -> Optional[Dict]:
+        """Parse the JSON analysis out of a Claude response"""
+        try:
+            response_text = response_text.strip()
             
             # Parse JSON response
             json_start = response_text.find('{')
@@ -260,12 +315,12 @@ Focus on extracting meaningful business intelligence and actionable insights."""
                 analysis = json.loads(json_text)
                 return analysis
             
-            logger.warning(f"Could not parse Claude response for email {email.gmail_id}")
-            return None
-            
         except Exception as e:
-            logger.error(f"Failed to get email analysis from Claude: {str(e)}")
+            logger.error(f"Failed to parse Claude response for email {email.gmail_id}: {str(e)}")
             return None
+        
+        logger.warning(f"Could not parse Claude response for email {email.gmail_id}")
+        return None
     
     def _prepare_enhanced_email_context(self, email: Email, user) -> str:
         """Prepare comprehensive email context for Claude analysis"""
@@ -279,7 +334,7 @@ Date: {timestamp}
 Subject: {email.subject}
 
 Email Content:
-{email.body_clean or email.snippet}
+{size_budget.analysis_text((email.body.body_clean if email.body else None) or email.snippet)}
 
 Additional Context:
 - Recipients: {', '.join(email.recipients) if email.recipients else 'Not specified'}
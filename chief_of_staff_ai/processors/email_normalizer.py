@@ -1,21 +1,33 @@
 # Normalizes raw Gmail data into clean format
 
 import re
+import json
+import hashlib
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from html import unescape
-from bs4 import BeautifulSoup
 
-from models.database import get_db_manager, Email
+from models.database import get_db_manager, Email, with_bodies
+from ingest.filter_rules import gmail_filter_rules
+from processors.html_to_text import html_to_text
+from processors.quote_stripper import quote_stripper
+from processors.keyword_matcher import keyword_matcher, KeywordHit, KeywordHits
+from processors.entity_extractor import entity_extractor
+from processors.parallel_normalizer import parallel_normalizer
+from processors.normalization_cache import normalization_cache
+from processors.size_budget import size_budget
 
 logger = logging.getLogger(__name__)
 
 class EmailNormalizer:
     """Normalizes emails into clean, standardized format with entity extraction"""
     
+    BULK_PRECEDENCE_VALUES = {'bulk', 'list', 'junk'}
+    
     def __init__(self):
-        self.version = "1.0"
+        self.version = "1.1"
+        self.cache_version = self._cache_version()
         
     def normalize_user_emails(self, user_email: str, limit: int = None) -> Dict:
         """
@@ -35,9 +47,9 @@ class EmailNormalizer:
             
             # Get emails that need normalization
             with get_db_manager().get_session() as session:
-                emails = session.query(Email).filter(
+                emails = session.query(Email).options(with_bodies('body_text', 'body_html')).filter(
                     Email.user_id == user.id,
-                    Email.body_clean.is_(None)  # Not normalized yet
+                    Email.normalizer_version.is_(None)  # Not normalized yet
                 ).limit(limit or 100).all()
             
             if not emails:
@@ -49,56 +61,66 @@ class EmailNormalizer:
                     'message': 'No emails need normalization'
                 }
             
-            processed_count = 0
-            error_count = 0
-            
-            for email in emails:
-                try:
-                    # Convert database email to dict for processing
-                    email_dict = {
-                        'id': email.gmail_id,
-                        'subject': email.subject,
-                        'body_text': email.body_text,
-                        'body_html': email.body_html,
-                        'sender': email.sender,
-                        'sender_name': email.sender_name,
-                        'snippet': email.snippet,
-                        'timestamp': email.email_date
-                    }
-                    
-                    # Normalize the email
-                    normalized = self.normalize_email(email_dict)
-                    
-                    # Update the database record
-                    with get_db_manager().get_session() as session:
-                        email_record = session.query(Email).filter(
-                            Email.user_id == user.id,
-                            Email.gmail_id == email.gmail_id
-                        ).first()
-                        
-                        if email_record:
-                            email_record.body_clean = normalized.get('body_clean')
-                            email_record.body_preview = normalized.get('body_preview')
-                            email_record.entities = normalized.get('entities', {})
-                            email_record.message_type = normalized.get('message_type')
-                            email_record.priority_score = normalized.get('priority_score')
-                            email_record.normalizer_version = self.version
-                            
-                            session.commit()
-                            processed_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Failed to normalize email {email.gmail_id}: {str(e)}")
-                    error_count += 1
-                    continue
-            
-            logger.info(f"Normalized {processed_count} emails for {user_email} ({error_count} errors)")
+            # Convert database emails to dicts for processing
+            email_dicts = [
+                {
+                    'id': email.gmail_id,
+                    'subject': email.subject,
+                    'body_text': email.body.body_text if email.body else None,
+                    'body_html': email.body.body_html if email.body else None,
+                    'sender': email.sender,
+                    'sender_name': email.sender_name,
+                    'snippet': email.snippet,
+                    'timestamp': email.email_date,
+                    'list_unsubscribe': email.list_unsubscribe,
+                    'precedence': email.precedence,
+                    'auto_submitted': email.auto_submitted,
+                    'triage_type': email.message_type if email.body_status == 'metadata' else None,
+                    'body_truncated': email.body_truncated
+                }
+                for email in emails
+            ]
+            
+            # Normalize across worker processes; results arrive as chunks finish
+            emails_by_id = {email.gmail_id: email for email in emails}
+            updates = []
+            
+            for normalized in parallel_normalizer.normalize(email_dicts, user.id):
+                email = emails_by_id[normalized['id']]
+                updates.append({
+                    'id': email.id,
+                    'body_clean': normalized.get('body_clean'),
+                    'body_preview': normalized.get('body_preview'),
+                    'entities': normalized.get('entities', {}),
+                    'message_type': normalized.get('message_type'),
+                    'priority_score': normalized.get('priority_score'),
+                    'body_truncated': normalized.get('body_truncated', False),
+                    'normalizer_version': self.version
+                })
+            
+            # Write all results back in a few chunked executemany UPDATEs
+            write_result = get_db_manager().bulk_update_normalized(updates)
+            updated_ids = set(write_result['updated_ids'])
+            processed_count = len(updated_ids)
+            error_count = len(write_result['failed_ids'])
+            
+            truncated_count = sum(1 for row in updates if row['body_truncated'] and row['id'] in updated_ids)
+            
+            message_types = {row['id']: row['message_type'] for row in updates}
+            outcomes = [(email.sender, message_types[email.id]) for email in emails if email.id in updated_ids]
+            
+            # Learn sender exclusions so repeatedly skipped mail is not listed again
+            gmail_filter_rules.record_outcomes(user.id, outcomes)
+            
+            logger.info(f"Normalized {processed_count} emails for {user_email} "
+                        f"({error_count} errors, {truncated_count} truncated)")
             
             return {
                 'success': True,
                 'user_email': user_email,
                 'processed': processed_count,
                 'errors': error_count,
+                'truncated': truncated_count,
                 'normalizer_version': self.version
             }
             
@@ -106,12 +128,144 @@ class EmailNormalizer:
             logger.error(f"Failed to normalize emails for {user_email}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def normalize_email(self, email_data: Dict) -> Dict:
+    def normalize_emails(self, emails: List[Dict], use_cache: bool = True, user_id: int = None) -> List[Dict]:
+        """
+        Normalize a batch of emails, extracting the entities of all bodies in one scan
+        
+        Body work (HTML to text, quote stripping, entities, body keywords) is
+        looked up by content hash first and done once per distinct body; only
+        the subject, sender and header heuristics run for every email.
+        
+        Args:
+            emails: Raw email data dictionaries
+            use_cache: Whether to read and fill the normalization cache
+            user_id: Owner of the emails, whose stored cache entries are used
+            
+        Returns:
+            Normalized email data, in the same order
+        """
+        cached = self.cached_bodies(emails, user_id) if use_cache else {}
+        normalized_emails, bodies = self.normalize_batch(emails, cached)
+        
+        if use_cache:
+            self.store_bodies(bodies, user_id)
+        
+        return normalized_emails
+    
+    def cached_bodies(self, emails: List[Dict], user_id: int = None) -> Dict[str, Dict]:
+        """Look up the cached body output of a user's batch of emails, keyed by content hash"""
+        content_hashes = [normalization_cache.content_hash(email_data) for email_data in emails]
+        return normalization_cache.get_many(user_id, self.cache_version, content_hashes)
+    
+    def store_bodies(self, bodies: Dict[str, Dict], user_id: int = None):
+        """Cache body output computed by normalize_batch for a user"""
+        normalization_cache.put_many(user_id, self.cache_version, bodies)
+    
+    def normalize_batch(self, emails: List[Dict], cached: Dict[str, Dict]) -> Tuple[List[Dict], Dict[str, Dict]]:
+        """
+        Normalize a batch of emails given the cached output of their bodies
+        
+        Neither reads nor writes the cache or the database, so it is safe to
+        run in normalization worker processes; the caller looks bodies up with
+        cached_bodies() and stores the returned new bodies with store_bodies().
+        
+        Args:
+            emails: Raw email data dictionaries
+            cached: Cached body output by content hash (may be empty)
+            
+        Returns:
+            Tuple of the normalized email data (same order) and the body output
+            computed for bodies that were not cached, by content hash
+        """
+        content_hashes = [normalization_cache.content_hash(email_data) for email_data in emails]
+        
+        # Normalize each distinct uncached body once
+        bodies = {}
+        failures = {}
+        for email_data, content_hash in zip(emails, content_hashes):
+            if content_hash in cached or content_hash in bodies or content_hash in failures:
+                continue
+            try:
+                bodies[content_hash] = self._normalize_body(email_data)
+            except Exception as e:
+                failures[content_hash] = str(e)
+        
+        pending = list(bodies.values())
+        extracted = entity_extractor.extract_batch([body['body_clean'] for body in pending])
+        for body, entities in zip(pending, extracted):
+            body['entities'] = entity_extractor.group(entities)
+        
+        normalized_emails = []
+        for email_data, content_hash in zip(emails, content_hashes):
+            if content_hash in failures:
+                normalized_emails.append(self._normalization_error(email_data, failures[content_hash]))
+            else:
+                body = cached.get(content_hash) or bodies[content_hash]
+                normalized_emails.append(self._finish_email(email_data, content_hash, body, content_hash in cached))
+        
+        return normalized_emails, bodies
+    
+    def normalize_email(self, email_data: Dict, user_id: int = None) -> Dict:
         """
         Normalize a single email into clean format
         
         Args:
             email_data: Raw email data dictionary
+            user_id: Owner of the email, whose stored cache entries are used
+            
+        Returns:
+            Normalized email data
+        """
+        return self.normalize_emails([email_data], user_id=user_id)[0]
+    
+    def _cache_version(self) -> str:
+        """
+        Normalizer version plus a fingerprint of the settings that shape body output
+        
+        Cached bodies normalized under other size budgets or another HTML
+        backend are not reused.
+        """
+        config = {
+            'max_part_bytes': size_budget.max_part_bytes,
+            'max_clean_chars': size_budget.max_clean_chars,
+            'html_tree_max_chars': html_to_text.tree_max_chars,
+            'html_backend': html_to_text.converter.name
+        }
+        fingerprint = hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"{self.version}-{fingerprint[:12]}"
+    
+    def _normalize_body(self, email_data: Dict) -> Dict:
+        """
+        Compute the body-derived part of a normalized email (what the cache stores, less entities)
+        
+        Args:
+            email_data: Raw email data dictionary
+            
+        Returns:
+            Dictionary with body_clean, body_preview, quote_cut and body_keywords
+        """
+        # Clean and extract body content
+        body_clean, quote_cut = self._extract_clean_body(email_data)
+        
+        # Keyword hits of the body feed message type and priority; kept as plain lists for storage
+        body_hits = keyword_matcher.scan({'body': body_clean}).hits
+        
+        return {
+            'body_clean': body_clean,
+            'body_preview': self._create_preview(body_clean),
+            'quote_cut': quote_cut,
+            'body_keywords': [list(hit) for hit in body_hits]
+        }
+    
+    def _finish_email(self, email_data: Dict, content_hash: str, body: Dict, cache_hit: bool) -> Dict:
+        """
+        Combine an email's headers with its (possibly cached) body output
+        
+        Args:
+            email_data: Raw email data dictionary
+            content_hash: Content hash of the email body
+            body: Body output from _normalize_body plus entities
+            cache_hit: Whether the body output came from the cache
             
         Returns:
             Normalized email data
@@ -120,44 +274,65 @@ class EmailNormalizer:
             # Start with original data
             normalized = email_data.copy()
             
-            # Clean and extract body content
-            body_clean = self._extract_clean_body(email_data)
+            body_clean = body['body_clean']
             normalized['body_clean'] = body_clean
+            normalized['body_preview'] = body['body_preview']
+            normalized['body_truncated'] = bool(email_data.get('body_truncated')) or size_budget.is_truncated(body_clean)
             
-            # Create preview (first 300 chars)
-            normalized['body_preview'] = self._create_preview(body_clean)
+            # Cached entries are shared between emails, so hand out copies
+            normalized['entities'] = {key: list(values) for key, values in (body['entities'] or {}).items()}
             
-            # Extract entities
-            normalized['entities'] = self._extract_entities(email_data, body_clean)
+            # Scan the headers and merge in the body hits
+            header_hits = keyword_matcher.scan({
+                'subject': email_data.get('subject'),
+                'sender': email_data.get('sender')
+            })
+            hits = KeywordHits(header_hits.hits + [KeywordHit(*hit) for hit in body['body_keywords'] or []])
             
-            # Determine message type
-            normalized['message_type'] = self._classify_message_type(email_data, body_clean)
+            # Determine message type (keep the header triage result when the body was never downloaded)
+            normalized['message_type'] = email_data.get('triage_type') or self._classify_message_type(email_data, hits)
             
             # Calculate priority score
-            normalized['priority_score'] = self._calculate_priority_score(email_data, body_clean)
+            normalized['priority_score'] = self._calculate_priority_score(email_data, body_clean, hits)
             
             # Add processing metadata
             normalized['processing_metadata'] = {
                 'normalizer_version': self.version,
                 'normalized_at': datetime.utcnow().isoformat(),
-                'body_length': len(body_clean) if body_clean else 0
+                'body_length': len(body_clean) if body_clean else 0,
+                'quote_cut': body['quote_cut'],
+                'content_hash': content_hash,
+                'cache_hit': cache_hit
             }
             
             return normalized
             
         except Exception as e:
-            logger.error(f"Failed to normalize email {email_data.get('id', 'unknown')}: {str(e)}")
-            return {
-                **email_data,
-                'normalization_error': str(e),
-                'processing_metadata': {
-                    'normalizer_version': self.version,
-                    'normalized_at': datetime.utcnow().isoformat(),
-                    'error': True
-                }
+            return self._normalization_error(email_data, str(e))
+    
+    def _normalization_error(self, email_data: Dict, error: str) -> Dict:
+        """
+        Build the result for an email that could not be normalized
+        
+        Args:
+            email_data: Raw email data dictionary
+            error: Error message
+            
+        Returns:
+            Original email data with the error recorded
+        """
+        logger.error(f"Failed to normalize email {email_data.get('id', 'unknown')}: {error}")
+        return {
+            **email_data,
+            'normalization_error': error,
+            'processing_metadata': {
+                'normalizer_version': self.version,
+                'normalized_at': datetime.utcnow().isoformat(),
+                'error': True
             }
+        }
     
-    def _extract_clean_body(self, email_data: Dict) -> str:
+    def _extract_clean_body(self, email_data: Dict) -> Tuple[str, Optional[Dict]]:
         """
         Extract clean text from email body
         
@@ -165,7 +340,8 @@ class EmailNormalizer:
             email_data: Email data dictionary
             
         Returns:
-            Clean body text
+            Tuple of clean body text and where quoted history was cut
+            ({'offset', 'line', 'reason'} in the extracted text, or None)
         """
         try:
             body_text = email_data.get('body_text', '')
@@ -173,37 +349,33 @@ class EmailNormalizer:
             
             # Prefer HTML if available, fallback to text
             if body_html:
-                # Parse HTML and extract text
-                soup = BeautifulSoup(body_html, 'html.parser')
-                
-                # Remove script and style elements
-                for script in soup(['script', 'style']):
-                    script.decompose()
-                
-                # Get text and clean it
-                text = soup.get_text()
-                
-                # Break into lines and remove leading/trailing spaces
-                lines = (line.strip() for line in text.splitlines())
-                
-                # Break multi-headlines into a line each
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                
-                # Drop blank lines
-                clean_text = '\n'.join(chunk for chunk in chunks if chunk)
+                # Visible text only, one line per block (see processors/html_to_text.py);
+                # large documents are streamed and stop at the body_clean budget
+                clean_text, truncated = html_to_text.convert_bounded(body_html, size_budget.max_clean_chars)
                 
             elif body_text:
-                clean_text = body_text
+                clean_text, truncated = body_text, False
                 
             else:
                 # Fallback to snippet
-                clean_text = email_data.get('snippet', '')
+                clean_text, truncated = email_data.get('snippet', ''), False
             
             if not clean_text:
-                return ''
+                return '', None
+            
+            # Keep body_clean within its budget, marking text cut here or by the converter
+            clean_text, _ = size_budget.truncate_text(clean_text, size_budget.max_clean_chars, force=truncated)
                 
-            # Remove quoted text (replies/forwards)
-            clean_text = self._remove_quoted_text(clean_text)
+            # Remove quoted text (replies/forwards) and signatures
+            stripped = self._remove_quoted_text(clean_text)
+            clean_text = stripped['text']
+            quote_cut = None
+            if stripped['cut_reason']:
+                quote_cut = {
+                    'offset': stripped['cut_offset'],
+                    'line': stripped['cut_line'],
+                    'reason': stripped['cut_reason']
+                }
             
             # Remove excessive whitespace
             clean_text = re.sub(r'\n\s*\n', '\n\n', clean_text)
@@ -212,48 +384,28 @@ class EmailNormalizer:
             # Decode HTML entities
             clean_text = unescape(clean_text)
             
-            return clean_text.strip()
+            return clean_text.strip(), quote_cut
             
         except Exception as e:
             logger.error(f"Failed to extract clean body: {str(e)}")
-            return email_data.get('snippet', '')
+            return email_data.get('snippet', ''), None
     
-    def _remove_quoted_text(self, text: str) -> str:
+    def _remove_quoted_text(self, text: str) -> Dict:
         """
-        Remove quoted text from emails (replies/forwards)
+        Remove quoted text (replies/forwards), mobile footers and signatures
         
         Args:
             text: Email body text
             
         Returns:
-            Text with quoted sections removed
+            QuoteStripper result: remaining 'text' plus where and why it was cut
         """
         try:
-            # Common quote patterns
-            quote_patterns = [
-                r'On .* wrote:.*',
-                r'From:.*\nSent:.*\nTo:.*\nSubject:.*',
-                r'-----Original Message-----.*',
-                r'> .*',  # Lines starting with >
-                r'________________________________.*',  # Outlook separator
-                r'From: .*<.*>.*',
-                r'Sent from my .*',
-                r'\n\n.*On.*\d{4}.*at.*\d{1,2}:\d{2}.*wrote:'
-            ]
-            
-            cleaned_text = text
-            
-            for pattern in quote_patterns:
-                cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.DOTALL | re.IGNORECASE)
-            
-            # Remove excessive newlines created by quote removal
-            cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)
-            
-            return cleaned_text.strip()
+            return quote_stripper.strip(text)
             
         except Exception as e:
             logger.error(f"Failed to remove quoted text: {str(e)}")
-            return text
+            return {'text': text, 'cut_offset': None, 'cut_line': None, 'cut_reason': None, 'removed': []}
     
     def _create_preview(self, body_text: str) -> str:
         """
@@ -281,108 +433,41 @@ class EmailNormalizer:
         
         return preview
     
-    def _extract_entities(self, email_data: Dict, body_text: str) -> Dict:
-        """
-        Extract entities from email content
-        
-        Args:
-            email_data: Email data dictionary
-            body_text: Clean email body text
-            
-        Returns:
-            Dictionary of extracted entities
-        """
-        try:
-            entities = {
-                'people': [],
-                'companies': [],
-                'dates': [],
-                'times': [],
-                'urls': [],
-                'emails': [],
-                'phone_numbers': [],
-                'amounts': []
-            }
-            
-            # Extract email addresses
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            entities['emails'] = list(set(re.findall(email_pattern, body_text)))
-            
-            # Extract URLs
-            url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-            entities['urls'] = list(set(re.findall(url_pattern, body_text)))
-            
-            # Extract phone numbers (US format)
-            phone_pattern = r'\b(?:\+?1[-.\s]?)?\(?([0-9]{3})\)?[-.\s]?([0-9]{3})[-.\s]?([0-9]{4})\b'
-            phone_matches = re.findall(phone_pattern, body_text)
-            entities['phone_numbers'] = ['-'.join(match) for match in phone_matches]
-            
-            # Extract dates (simple patterns)
-            date_patterns = [
-                r'\b\d{1,2}/\d{1,2}/\d{4}\b',
-                r'\b\d{1,2}-\d{1,2}-\d{4}\b',
-                r'\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2},? \d{4}\b'
-            ]
-            for pattern in date_patterns:
-                entities['dates'].extend(re.findall(pattern, body_text, re.IGNORECASE))
-            
-            # Extract times
-            time_pattern = r'\b\d{1,2}:\d{2}(?:\s?[AP]M)?\b'
-            entities['times'] = list(set(re.findall(time_pattern, body_text, re.IGNORECASE)))
-            
-            # Extract monetary amounts
-            amount_pattern = r'\$\d{1,3}(?:,\d{3})*(?:\.\d{2})?'
-            entities['amounts'] = list(set(re.findall(amount_pattern, body_text)))
-            
-            # Remove empty lists and duplicates
-            for key in entities:
-                entities[key] = list(set(entities[key])) if entities[key] else []
-            
-            return entities
-            
-        except Exception as e:
-            logger.error(f"Failed to extract entities: {str(e)}")
-            return {}
-    
-    def _classify_message_type(self, email_data: Dict, body_text: str) -> str:
+    def _classify_message_type(self, email_data: Dict, hits: KeywordHits) -> str:
         """
         Classify the type of email message
         
         Args:
             email_data: Email data dictionary
-            body_text: Clean email body text
+            hits: Keyword hits of the subject, sender and clean body
             
         Returns:
             Message type classification
         """
         try:
-            subject = email_data.get('subject', '').lower()
-            body_lower = body_text.lower() if body_text else ''
-            sender = email_data.get('sender', '').lower()
-            
             # Meeting/Calendar invites
-            meeting_keywords = ['meeting', 'call', 'zoom', 'teams', 'webex', 'conference', 'invite', 'calendar']
-            if any(keyword in subject for keyword in meeting_keywords):
+            if hits.has('meeting'):
                 return 'meeting'
             
             # Automated/System emails
-            system_domains = ['noreply', 'no-reply', 'donotreply', 'mailer-daemon', 'bounce']
-            if any(domain in sender for domain in system_domains):
+            if hits.has('system_sender'):
                 return 'automated'
             
+            # Bulk mail flagged by its headers
+            bulk_type = self._classify_bulk_headers(email_data)
+            if bulk_type:
+                return bulk_type
+            
             # Newsletters/Marketing
-            newsletter_keywords = ['unsubscribe', 'newsletter', 'marketing', 'promotional']
-            if any(keyword in body_lower for keyword in newsletter_keywords):
+            if hits.has('newsletter'):
                 return 'newsletter'
             
             # Action required
-            action_keywords = ['urgent', 'asap', 'deadline', 'required', 'please review', 'action needed']
-            if any(keyword in subject for keyword in action_keywords):
+            if hits.has('action_required'):
                 return 'action_required'
             
             # FYI/Information
-            fyi_keywords = ['fyi', 'for your information', 'heads up', 'update', 'status']
-            if any(keyword in subject for keyword in fyi_keywords):
+            if hits.has('informational'):
                 return 'informational'
             
             # Default to regular
@@ -392,13 +477,58 @@ class EmailNormalizer:
             logger.error(f"Failed to classify message type: {str(e)}")
             return 'regular'
     
-    def _calculate_priority_score(self, email_data: Dict, body_text: str) -> float:
+    def triage_message(self, email_data: Dict) -> Optional[str]:
+        """
+        Classify a message from its headers alone, before its body is downloaded
+        
+        Args:
+            email_data: Email data built from a metadata-format message
+            
+        Returns:
+            'automated' or 'newsletter' for bulk mail whose body can be skipped, None otherwise
+        """
+        hits = keyword_matcher.scan({'subject': email_data.get('subject'), 'sender': email_data.get('sender')})
+        
+        # Meeting invites always need their body, even from system senders
+        if hits.has('meeting'):
+            return None
+        
+        if hits.has('system_sender'):
+            return 'automated'
+        
+        return self._classify_bulk_headers(email_data)
+    
+    def _classify_bulk_headers(self, email_data: Dict) -> Optional[str]:
+        """
+        Detect bulk mail from Auto-Submitted, Precedence and List-Unsubscribe headers
+        
+        Args:
+            email_data: Email data dictionary
+            
+        Returns:
+            'automated', 'newsletter' or None
+        """
+        auto_submitted = (email_data.get('auto_submitted') or '').strip().lower()
+        if auto_submitted and auto_submitted != 'no':
+            return 'automated'
+        
+        precedence = (email_data.get('precedence') or '').strip().lower()
+        if precedence in self.BULK_PRECEDENCE_VALUES:
+            return 'newsletter'
+        
+        if email_data.get('list_unsubscribe'):
+            return 'newsletter'
+        
+        return None
+    
+    def _calculate_priority_score(self, email_data: Dict, body_text: str, hits: KeywordHits) -> float:
         """
         Calculate priority score for email (0.0 to 1.0)
         
         Args:
             email_data: Email data dictionary
             body_text: Clean email body text
+            hits: Keyword hits of the subject, sender and clean body
             
         Returns:
             Priority score between 0.0 and 1.0
@@ -406,34 +536,23 @@ class EmailNormalizer:
         try:
             score = 0.5  # Base score
             
-            subject = email_data.get('subject', '').lower()
-            body_lower = body_text.lower() if body_text else ''
-            
-            # High priority keywords
-            urgent_keywords = ['urgent', 'asap', 'emergency', 'critical', 'deadline']
-            for keyword in urgent_keywords:
-                if keyword in subject or keyword in body_lower:
-                    score += 0.2
+            subject = email_data.get('subject', '') or ''
+            sender = email_data.get('sender', '') or ''
             
-            # Medium priority keywords
-            important_keywords = ['important', 'priority', 'please review', 'action needed']
-            for keyword in important_keywords:
-                if keyword in subject or keyword in body_lower:
-                    score += 0.1
+            # High and medium priority keywords, once per distinct keyword
+            score += hits.score('urgent')
+            score += hits.score('important')
             
             # Questions increase priority slightly
-            if '?' in subject or '?' in body_text:
+            if '?' in subject or (body_text and '?' in body_text):
                 score += 0.05
             
             # Direct communication (personal emails)
-            if '@' in email_data.get('sender', '') and 'noreply' not in email_data.get('sender', ''):
+            if '@' in sender and 'noreply' not in hits.keywords('automated_sender'):
                 score += 0.1
             
             # Reduce score for automated emails
-            automated_keywords = ['unsubscribe', 'automated', 'noreply', 'notification']
-            for keyword in automated_keywords:
-                if keyword in email_data.get('sender', '').lower():
-                    score -= 0.2
+            score += hits.score('automated_sender')
             
             # Ensure score is between 0.0 and 1.0
             return max(0.0, min(1.0, score))
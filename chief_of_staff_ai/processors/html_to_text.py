@@ -0,0 +1,372 @@
+# Converts email HTML to plain text with pluggable parser backends
+
+import logging
+import re
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Elements whose content is never visible
+SKIPPED_TAGS = {'script', 'style', 'head', 'title', 'noscript', 'template', 'object', 'iframe', 'svg'}
+
+# Elements that start and end a line of text
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'center', 'dd', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li',
+    'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tbody', 'tfoot', 'thead', 'tr', 'ul'
+}
+
+# Table cells are separated by a space so a row stays on one line
+CELL_TAGS = {'td', 'th'}
+
+# Elements that never have an end tag, so they cannot open a skipped region
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+# Inline styles that hide an element (preheaders, Outlook-only fallbacks, tracking blocks)
+HIDDEN_STYLE_RE = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden|mso-hide\s*:\s*all', re.IGNORECASE)
+
+# Private-use character marking line breaks until whitespace has been collapsed
+LINE_BREAK = '\ue000'
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+# lxml refuses str input that declares its own encoding; the text is already decoded
+XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+def finish_text(text: str) -> str:
+    """
+    Collapse HTML whitespace and turn line-break markers into one line per block
+
+    Args:
+        text: Extracted text with LINE_BREAK between blocks
+
+    Returns:
+        Non-empty, stripped lines joined with newlines
+    """
+    lines = WHITESPACE_RE.sub(' ', text).split(LINE_BREAK)
+    return '\n'.join(line for line in (line.strip() for line in lines) if line)
+
+
+def is_hidden(attributes: Dict[str, Optional[str]]) -> bool:
+    """Check the attributes of an element for markup that hides it"""
+    if 'hidden' in attributes:
+        return True
+    style = attributes.get('style')
+    return bool(style and HIDDEN_STYLE_RE.search(style))
+
+
+class HtmlToTextConverter(ABC):
+    """
+    Extracts the visible text of an HTML email
+
+    Every backend follows the same contract: script, style and hidden
+    elements are dropped, block elements and <br> become line breaks, table
+    cells in a row are joined by spaces, runs of whitespace collapse to one
+    space, and blank lines are removed. Entities are decoded.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def convert(self, html: str) -> str:
+        """
+        Convert an HTML document or fragment to plain text
+
+        Args:
+            html: HTML source
+
+        Returns:
+            Visible text, one line per block
+        """
+
+
+class LxmlHtmlConverter(HtmlToTextConverter):
+    """
+    libxml2-based backend: parses in C and serializes the text in C
+
+    Block boundaries are marked by inserting LINE_BREAK into the tree before
+    a single tostring(method='text'), so no per-node Python work is done for
+    inline text.
+    """
+
+    name = 'lxml'
+
+    def __init__(self):
+        # Imported here so the module loads without lxml installed
+        from lxml import etree, html as lxml_html
+        self._etree = etree
+        self._lxml_html = lxml_html
+        self._skip_tags = list(SKIPPED_TAGS)
+        self._block_tags = list(BLOCK_TAGS)
+        self._cell_tags = list(CELL_TAGS)
+
+    def convert(self, html: str) -> str:
+        if not html or not html.strip():
+            return ''
+
+        try:
+            root = self._lxml_html.document_fromstring(XML_DECLARATION_RE.sub('', html, count=1))
+        except self._etree.ParserError:
+            # Nothing but comments or whitespace
+            return ''
+
+        # Comments carry Outlook conditional markup; hidden elements carry preheaders
+        for element in list(root.iter(self._etree.Comment, self._etree.ProcessingInstruction, *self._skip_tags)):
+            element.drop_tree()
+        hidden = [
+            element for element in root.iter()
+            if isinstance(element.tag, str) and is_hidden(element.attrib) and element.getparent() is not None
+        ]
+        for element in hidden:
+            element.drop_tree()
+
+        for element in root.iter('pre'):
+            # Whitespace inside <pre> is significant: keep its line breaks
+            for node in element.iter():
+                if node.text:
+                    node.text = node.text.replace('\n', LINE_BREAK)
+                if node.tail and node is not element:
+                    node.tail = node.tail.replace('\n', LINE_BREAK)
+
+        for element in root.iter(*self._block_tags):
+            element.text = LINE_BREAK + (element.text or '')
+            element.tail = LINE_BREAK + (element.tail or '')
+        for element in root.iter(*self._cell_tags):
+            element.tail = ' ' + (element.tail or '')
+
+        return finish_text(self._etree.tostring(root, method='text', encoding='unicode'))
+
+
+class StreamingHtmlConverter(HtmlToTextConverter):
+    """
+    Dependency-free backend built on the stdlib html.parser tokenizer
+
+    Text is emitted as tags stream past instead of building a tree; skipped
+    and hidden elements are tracked with a depth counter.
+    """
+
+    name = 'stream'
+
+    def convert(self, html: str) -> str:
+        if not html or not html.strip():
+            return ''
+
+        tokenizer = _TextTokenizer()
+        tokenizer.feed(html)
+        tokenizer.close()
+        return finish_text(''.join(tokenizer.parts))
+
+    def convert_bounded(self, html: str, max_chars: int, chunk_chars: int = 65536) -> Tuple[str, bool]:
+        """
+        Convert HTML a chunk at a time, stopping once enough text has been collected
+
+        Args:
+            html: HTML source
+            max_chars: Text budget in characters
+            chunk_chars: Characters of HTML fed to the tokenizer at a time
+
+        Returns:
+            Tuple of visible text (at most max_chars) and whether content was left out
+        """
+        if not html or not html.strip():
+            return '', False
+
+        tokenizer = _TextTokenizer()
+        truncated = False
+        for start in range(0, len(html), chunk_chars):
+            tokenizer.feed(html[start:start + chunk_chars])
+            # Raw text shrinks when whitespace collapses, so collect some slack before stopping
+            if tokenizer.size > max_chars * 2 and start + chunk_chars < len(html):
+                truncated = True
+                break
+        if not truncated:
+            # After an early stop the buffer ends mid-document; flushing it would emit a partial tag as text
+            tokenizer.close()
+
+        text = finish_text(''.join(tokenizer.parts))
+        if len(text) > max_chars:
+            return text[:max_chars], True
+        return text, truncated
+
+
+class _TextTokenizer(HTMLParser):
+    """Collects visible text from a token stream"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.size = 0
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._pre_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+
+        if tag in SKIPPED_TAGS or is_hidden(dict(attrs)):
+            if tag not in VOID_TAGS:
+                self._skip_tag = tag
+                self._skip_depth = 1
+            return
+
+        if tag in BLOCK_TAGS:
+            self.parts.append(LINE_BREAK)
+        if tag == 'pre':
+            self._pre_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skip_tag and tag in BLOCK_TAGS:
+            self.parts.append(LINE_BREAK)
+
+    def handle_endtag(self, tag):
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if not self._skip_depth:
+                    self._skip_tag = None
+            return
+
+        if tag in BLOCK_TAGS:
+            self.parts.append(LINE_BREAK)
+        elif tag in CELL_TAGS:
+            self.parts.append(' ')
+        if tag == 'pre' and self._pre_depth:
+            self._pre_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip_tag:
+            return
+        if self._pre_depth:
+            data = data.replace('\n', LINE_BREAK)
+        self.parts.append(data)
+        self.size += len(data)
+
+
+class BeautifulSoupHtmlConverter(HtmlToTextConverter):
+    """Pure-Python fallback using BeautifulSoup with html.parser"""
+
+    name = 'bs4'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup, Comment
+        self._soup_class = BeautifulSoup
+        self._comment_class = Comment
+
+    def convert(self, html: str) -> str:
+        if not html or not html.strip():
+            return ''
+
+        soup = self._soup_class(html, 'html.parser')
+
+        for element in soup(list(SKIPPED_TAGS)):
+            element.decompose()
+        for comment in soup.find_all(string=lambda text: isinstance(text, self._comment_class)):
+            comment.extract()
+        for element in soup.find_all(lambda tag: is_hidden(tag.attrs)):
+            if not element.decomposed:
+                element.decompose()
+
+        for element in soup.find_all('pre'):
+            for string in list(element.find_all(string=True)):
+                string.replace_with(string.replace('\n', LINE_BREAK))
+        for element in soup.find_all(list(BLOCK_TAGS)):
+            element.insert_before(LINE_BREAK)
+            element.insert_after(LINE_BREAK)
+        for element in soup.find_all(list(CELL_TAGS)):
+            element.insert_after(' ')
+
+        return finish_text(soup.get_text())
+
+
+BACKENDS = {
+    'lxml': LxmlHtmlConverter,
+    'stream': StreamingHtmlConverter,
+    'bs4': BeautifulSoupHtmlConverter
+}
+
+
+def create_html_converter(name: str = None) -> HtmlToTextConverter:
+    """
+    Create the converter selected by HTML_TO_TEXT_BACKEND
+
+    'auto' picks lxml when it is installed and the streaming tokenizer otherwise.
+    """
+    name = name or settings.HTML_TO_TEXT_BACKEND
+    if name == 'auto':
+        try:
+            return LxmlHtmlConverter()
+        except ImportError:
+            return StreamingHtmlConverter()
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML to text backend: {name}")
+    return BACKENDS[name]()
+
+
+class HtmlToText:
+    """Converts with the configured backend, falling back to BeautifulSoup if it fails"""
+
+    def __init__(self, converter: HtmlToTextConverter = None, tree_max_chars: int = settings.HTML_TREE_MAX_CHARS):
+        self.converter = converter or create_html_converter()
+        self.tree_max_chars = tree_max_chars
+        self._fallback: Optional[HtmlToTextConverter] = None
+        self._streaming = StreamingHtmlConverter()
+
+    @property
+    def backend(self) -> str:
+        return self.converter.name
+
+    def convert(self, html: str) -> str:
+        """
+        Convert HTML to plain text
+
+        Args:
+            html: HTML source
+
+        Returns:
+            Visible text, one line per block
+        """
+        try:
+            return self.converter.convert(html)
+        except Exception as e:
+            if self.converter.name == 'bs4':
+                raise
+            logger.warning(f"{self.converter.name} HTML conversion failed ({str(e)}), using BeautifulSoup")
+            if self._fallback is None:
+                self._fallback = BeautifulSoupHtmlConverter()
+            return self._fallback.convert(html)
+
+    def convert_bounded(self, html: str, max_chars: int) -> Tuple[str, bool]:
+        """
+        Convert HTML to at most max_chars of text without building a tree for large documents
+
+        HTML longer than tree_max_chars is tokenized in chunks by the streaming
+        backend, which stops reading once the budget is filled, so memory stays
+        proportional to the budget rather than to the document.
+
+        Args:
+            html: HTML source
+            max_chars: Text budget in characters
+
+        Returns:
+            Tuple of visible text and whether content was left out
+        """
+        if html and len(html) > self.tree_max_chars:
+            return self._streaming.convert_bounded(html, max_chars)
+
+        text = self.convert(html)
+        if len(text) > max_chars:
+            return text[:max_chars], True
+        return text, False
+
+
+# Create global instance
+html_to_text = HtmlToText()
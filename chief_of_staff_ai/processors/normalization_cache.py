@@ -0,0 +1,143 @@
+# Content-hash keyed cache of body normalization output
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from config.settings import settings
+from models.database import get_db_manager
+
+logger = logging.getLogger(__name__)
+
+
+class NormalizationCache:
+    """
+    Caches the body-derived part of EmailNormalizer output by raw body content
+
+    Newsletters, notifications and CC'd announcements arrive with
+    byte-identical bodies. Entries are keyed by (normalizer cache version,
+    SHA-256 of the raw body the normalizer reads) and hold the clean body,
+    preview, entities, quote cut and the body's keyword hits. Subject, sender
+    and headers are not part of an entry, so message type and priority are
+    still computed per email from the cached body inputs. The cache version
+    combines the normalizer version with a fingerprint of the settings that
+    shape its output, so changing either invalidates every entry.
+
+    A bounded LRU in this process sits in front of the normalization_cache
+    table. Entries are scoped to one user, in memory and in the table, whose
+    rows are deleted with that user; without a user ID only the in-process
+    LRU is used.
+
+    Scoping is deliberate even though a bulk mail sent to several tenants is
+    then normalized once per tenant. A shared entry holds one recipient's
+    clean body and entities, so it would hand that mail's content to other
+    tenants, and it would outlive the deletion of the user it came from.
+    """
+
+    def __init__(self, max_entries: int = settings.NORMALIZATION_CACHE_SIZE,
+                 enabled: bool = settings.NORMALIZATION_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stored': 0}
+
+    @staticmethod
+    def content_hash(email_data: Dict) -> str:
+        """
+        Hash the body source the normalizer will read: HTML, else plain text, else the snippet
+
+        Args:
+            email_data: Raw email data dictionary
+
+        Returns:
+            SHA-256 hex digest, prefixed by the kind of source so equal text in different fields differs
+        """
+        for field in ('body_html', 'body_text', 'snippet'):
+            value = email_data.get(field)
+            if value:
+                break
+        else:
+            field, value = 'empty', ''
+        return hashlib.sha256(f'{field}\x00{value}'.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def get_many(self, user_id: Optional[int], version: str, content_hashes: List[str]) -> Dict[str, Dict]:
+        """
+        Look up cached body output, first in memory and then in the user's database entries
+
+        Args:
+            user_id: Database user ID (None to skip the database)
+            version: Normalizer cache version
+            content_hashes: Content hashes to look up
+
+        Returns:
+            Dictionary of content hash to cached fields for the hashes that were found
+        """
+        if not self.enabled or not content_hashes:
+            return {}
+
+        found = {}
+        missing = []
+        with self._lock:
+            for content_hash in dict.fromkeys(content_hashes):
+                key = (user_id, version, content_hash)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[content_hash] = self._entries[key]
+                else:
+                    missing.append(content_hash)
+        self.stats['memory_hits'] += len(found)
+
+        if missing and user_id is not None:
+            try:
+                stored = get_db_manager().get_normalization_cache_entries(user_id, version, missing)
+            except Exception as e:
+                logger.error(f"Failed to read the normalization cache: {str(e)}")
+                stored = {}
+            self.stats['db_hits'] += len(stored)
+            self.stats['misses'] += len(missing) - len(stored)
+            self._remember(user_id, version, stored)
+            found.update(stored)
+        else:
+            self.stats['misses'] += len(missing)
+
+        return found
+
+    def put_many(self, user_id: Optional[int], version: str, entries: Dict[str, Dict]):
+        """
+        Cache freshly computed body output in memory and in the user's database entries
+
+        Args:
+            user_id: Database user ID (None to skip the database)
+            version: Normalizer cache version
+            entries: Dictionary of content hash to cached fields
+        """
+        if not self.enabled or not entries:
+            return
+
+        self._remember(user_id, version, entries)
+        if user_id is None:
+            return
+        try:
+            self.stats['stored'] += get_db_manager().save_normalization_cache_entries(user_id, version, entries)
+        except Exception as e:
+            logger.error(f"Failed to write the normalization cache: {str(e)}")
+
+    def clear(self):
+        """Drop the in-process entries (the database table is left alone)"""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, user_id: Optional[int], version: str, entries: Dict[str, Dict]):
+        with self._lock:
+            for content_hash, fields in entries.items():
+                self._entries[(user_id, version, content_hash)] = fields
+                self._entries.move_to_end((user_id, version, content_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Create global instance
+normalization_cache = NormalizationCache()
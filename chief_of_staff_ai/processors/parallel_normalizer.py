@@ -0,0 +1,191 @@
+# Fans email normalization out across a process pool
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _normalizer():
+    # Imported here: the normalizer imports this module, and workers only need it once
+    from processors.email_normalizer import email_normalizer
+    return email_normalizer
+
+
+def _normalize_chunk(emails: List[Dict], cached: Dict[str, Dict]) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Normalize a chunk of email dictionaries (runs in a worker process)
+
+    Pure: the cached body output is looked up by the parent and passed in, and
+    newly computed bodies are returned for the parent to store, so workers
+    never open a database connection. Emails carrying an 'error' key are
+    failed downloads and are returned unchanged.
+    """
+    to_normalize = [email_data for email_data in emails if not email_data.get('error')]
+    normalized, bodies = _normalizer().normalize_batch(to_normalize, cached)
+    normalized = iter(normalized)
+    return [email_data if email_data.get('error') else next(normalized) for email_data in emails], bodies
+
+
+class ParallelNormalizer:
+    """
+    Runs EmailNormalizer over chunks of emails in worker processes
+
+    HTML parsing and the regex passes are CPU-bound and hold the GIL, so
+    threads do not help; processes do. Only plain email dictionaries cross the
+    process boundary, never ORM objects. Workers are started with 'spawn' so
+    they do not inherit the parent's database connections and thread pools,
+    and they never open their own: the parent looks each chunk up in the
+    normalization cache before handing it out and stores the bodies the
+    worker computed when its result comes back.
+
+    Results are yielded as chunks complete (arrival order, not input order),
+    so callers match them back by 'id'. Batches smaller than
+    min_parallel_batch, or a single configured worker, are normalized in
+    this process.
+    """
+
+    def __init__(self, workers: int = settings.NORMALIZE_WORKERS, chunk_size: int = settings.NORMALIZE_CHUNK_SIZE,
+                 min_parallel_batch: int = settings.NORMALIZE_PARALLEL_MIN_BATCH):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self.min_parallel_batch = min_parallel_batch
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def normalize(self, emails: Iterable[Dict], user_id: int = None) -> Iterator[Dict]:
+        """
+        Normalize emails, in parallel when the batch is large enough
+
+        The input may be a generator (e.g. messages still being downloaded); it
+        is consumed as chunks are handed to workers, so downloading and
+        normalizing overlap.
+
+        Args:
+            emails: Raw email data dictionaries
+            user_id: Owner of the emails, whose normalization cache entries are used
+
+        Yields:
+            Normalized email dictionaries in arrival order
+        """
+        emails = iter(emails)
+
+        # Small batches cost more to ship to a worker than to normalize here
+        head = []
+        for email_data in emails:
+            head.append(email_data)
+            if len(head) >= self.min_parallel_batch:
+                break
+
+        if self.workers <= 1 or len(head) < self.min_parallel_batch:
+            yield from self._normalize_serial(head, user_id)
+            yield from self._normalize_serial(emails, user_id)
+            return
+
+        yield from self._normalize_parallel(head, emails, user_id)
+
+    def shutdown(self):
+        """Stop the worker processes (they are started again on the next parallel batch)"""
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _normalize_serial(self, emails: Iterable[Dict], user_id: Optional[int]) -> Iterator[Dict]:
+        chunk = []
+        for email_data in emails:
+            chunk.append(email_data)
+            if len(chunk) >= self.chunk_size:
+                yield from self._normalize_here(chunk, user_id)
+                chunk = []
+        if chunk:
+            yield from self._normalize_here(chunk, user_id)
+
+    def _lookup(self, chunk: List[Dict], user_id: Optional[int]) -> Dict[str, Dict]:
+        """Cached body output of a chunk, read in this process on behalf of the workers"""
+        return _normalizer().cached_bodies([email_data for email_data in chunk if not email_data.get('error')], user_id)
+
+    def _normalize_here(self, chunk: List[Dict], user_id: Optional[int]) -> List[Dict]:
+        results, bodies = _normalize_chunk(chunk, self._lookup(chunk, user_id))
+        _normalizer().store_bodies(bodies, user_id)
+        return results
+
+    def _normalize_parallel(self, head: List[Dict], rest: Iterator[Dict], user_id: Optional[int]) -> Iterator[Dict]:
+        try:
+            executor = self._get_executor()
+        except Exception as e:
+            logger.error(f"Could not create normalization worker pool, normalizing in process: {str(e)}")
+            executor = None
+        max_in_flight = self.workers * 2
+        in_flight = {}
+
+        def chunks():
+            chunk = []
+            for source in (head, rest):
+                for email_data in source:
+                    chunk.append(email_data)
+                    if len(chunk) >= self.chunk_size:
+                        yield chunk
+                        chunk = []
+            if chunk:
+                yield chunk
+
+        for chunk in chunks():
+            if executor is None:
+                yield from self._normalize_here(chunk, user_id)
+                continue
+
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._chunk_result(future, in_flight.pop(future), user_id)
+
+            try:
+                in_flight[executor.submit(_normalize_chunk, chunk, self._lookup(chunk, user_id))] = chunk
+            except Exception as e:
+                # Workers could not be started (or the pool broke): finish this batch here
+                logger.error(f"Normalization workers unavailable, normalizing in process: {str(e)}")
+                with self._lock:
+                    self._executor = None
+                executor = None
+                yield from self._normalize_here(chunk, user_id)
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from self._chunk_result(future, in_flight.pop(future), user_id)
+
+    def _chunk_result(self, future, chunk: List[Dict], user_id: Optional[int]) -> List[Dict]:
+        """Result of a worker chunk, normalizing it here if the worker failed"""
+        try:
+            results, bodies = future.result()
+            _normalizer().store_bodies(bodies, user_id)
+            return results
+        except BrokenProcessPool as e:
+            logger.error(f"Normalization worker pool broke, restarting it: {str(e)}")
+            with self._lock:
+                self._executor = None
+        except Exception as e:
+            logger.error(f"Normalization worker failed on a chunk of {len(chunk)} emails: {str(e)}")
+        return self._normalize_here(chunk, user_id)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                logger.info(f"Started {self.workers} normalization worker processes")
+            return self._executor
+
+
+# Create global instance
+parallel_normalizer = ParallelNormalizer()
@@ -0,0 +1,266 @@
+# Strips quoted replies, forwarded history, mobile footers and signatures from email text
+
+import re
+from typing import Dict, List, Optional
+
+# Reply header openings ("On <date>, <name> wrote:") in the languages we see most
+REPLY_HEADER_STARTS = ('on ', 'le ', 'am ', 'el ', 'op ', 'il ')
+REPLY_HEADER_ENDS = ('wrote:', 'a écrit :', 'a écrit:', 'schrieb:', 'escribió:', 'schreef:', 'ha scritto:')
+
+# Full-line markers after which everything is earlier correspondence
+ORIGINAL_MESSAGE_RE = re.compile(r'-{2,}\s*(original message|mensaje original|message d\'origine|ursprüngliche nachricht)\s*-{2,}$')
+FORWARD_RE = re.compile(r'(-{2,}\s*)?(forwarded message|begin forwarded message|weitergeleitete nachricht|message transféré)\s*-*:?$')
+OUTLOOK_SEPARATOR_RE = re.compile(r'_{20,}$')
+
+# Outlook/Apple header block: "From:" followed by these within HEADER_BLOCK_LINES lines
+HEADER_FIELDS = ('sent:', 'date:', 'to:', 'subject:', 'cc:')
+HEADER_BLOCK_LINES = 5
+
+MOBILE_FOOTER_RE = re.compile(
+    r'(sent from my \w+|sent from (outlook|yahoo mail|mail) for \w+|get outlook for \w+|'
+    r'sent from (outlook|yahoo mail|mail for windows)|sent via \w+|envoyé de mon \w+|von meinem \w+ gesendet)'
+)
+
+SIGN_OFF_RE = re.compile(
+    r'(thanks|thank you|many thanks|best|best regards|kind regards|warm regards|regards|cheers|'
+    r'sincerely|yours|all the best|talk soon|thx)[,!.]?$'
+)
+
+# A sign-off only starts a signature if at most this many short lines follow it
+MAX_SIGNATURE_LINES = 6
+MAX_SIGNATURE_LINE_LENGTH = 60
+
+# Lowercase words that still fit a name, title or contact line ("VP of Sales at Acme", "mobile: ...")
+SIGNATURE_LOWERCASE_WORDS = {
+    'of', 'and', 'at', 'the', 'for', 'in', 'on', '&', 'de', 'del', 'la', 'le', 'van', 'von', 'der', 'da', 'di',
+    'tel', 'phone', 'mobile', 'cell', 'fax', 'email', 'e-mail', 'web', 'office', 'direct', 'ext', 'm', 't', 'f', 'e', 'w'
+}
+
+# Capitalized first words that start a sentence rather than a name or title
+SENTENCE_START_WORDS = {
+    'also', 'please', 'pls', 'can', 'could', 'would', 'should', 'let', 'send', 'call', 'book', 'see', 'do',
+    'does', 'did', 'is', 'are', 'was', 'were', 'have', 'has', 'need', 'i', 'we', 'you', 'it', 'this', 'that',
+    'just', 'btw', 'ps'
+}
+
+
+class QuoteStripper:
+    """
+    Single-pass, line-oriented quote and signature stripper
+
+    Each line is classified with anchored, fixed-shape checks (prefix and
+    suffix tests or regexes without nested repetition), so the work is
+    proportional to the length of the body. Terminal markers cut the message:
+    reply headers ("On ... wrote:", also wrapped over two lines), Outlook
+    header blocks, "Original Message" and underscore separators, and the
+    "-- " signature delimiter. A forwarded-message marker only cuts when
+    something was written above it; otherwise only the forward's header
+    block is removed and the forwarded text is kept as the content. Lines starting with ">" and mobile footers are removed where
+    they occur, so replies interleaved with quotes keep their own lines.
+    Finally a trailing sign-off ("Thanks,") followed by a short block of
+    name, title and contact lines is treated as a signature; if anything
+    after the sign-off reads like a sentence, the body is kept as it is.
+    """
+
+    def strip(self, text: str) -> Dict:
+        """
+        Remove quoted history and signatures from a plain-text body
+
+        Args:
+            text: Email body text
+
+        Returns:
+            Dictionary with 'text' (what remains), 'cut_offset' (character
+            offset in the input where the remaining body ends, None if nothing
+            after it was cut), 'cut_line', 'cut_reason' and 'removed' (every
+            removed range as {'reason', 'start_line', 'end_line'}, end exclusive)
+        """
+        if not text:
+            return self._result('', None, None, None, [])
+
+        lines = text.splitlines(keepends=True)
+        offsets = []
+        position = 0
+        for line in lines:
+            offsets.append(position)
+            position += len(line)
+
+        kept: List[int] = []
+        removed: List[Dict] = []
+        cut_line: Optional[int] = None
+        cut_reason: Optional[str] = None
+        header_start: Optional[int] = None  # Line of a "From:" that may open a header block
+        header_fields = 0
+        has_content = False
+        in_forward_header = False
+
+        for index, raw_line in enumerate(lines):
+            line = raw_line.strip()
+            lower = line.lower()
+
+            # The header block of a bare forward runs to the first blank line
+            if in_forward_header:
+                self._extend(removed, 'forwarded_header', index)
+                in_forward_header = bool(line)
+                continue
+
+            # A pending "From:" line becomes a header block once enough header fields follow it
+            if header_start is not None:
+                if lower.startswith(HEADER_FIELDS):
+                    header_fields += 1
+                    if header_fields >= 2:
+                        cut_line, cut_reason = header_start, 'header_block'
+                        break
+                elif index - header_start > HEADER_BLOCK_LINES or not line:
+                    header_start = None
+
+            if lower.startswith('from:') and header_start is None:
+                header_start, header_fields = index, 0
+
+            reason = self._terminal_reason(lower, lines, index)
+            if reason == 'forwarded_message' and not has_content:
+                # Nothing was written above the forward, so the forwarded text is the content
+                self._extend(removed, 'forwarded_header', index)
+                in_forward_header = True
+                header_start = None
+                continue
+            if reason:
+                cut_line, cut_reason = index, reason
+                break
+
+            if line.startswith('>'):
+                self._extend(removed, 'quote_block', index)
+                continue
+
+            if MOBILE_FOOTER_RE.fullmatch(lower):
+                self._extend(removed, 'mobile_footer', index)
+                continue
+
+            kept.append(index)
+            has_content = has_content or bool(line)
+
+        # Lines of a pending header block that never completed stay in the body
+        if cut_line is not None:
+            kept = [index for index in kept if index < cut_line]
+            removed.append({'reason': cut_reason, 'start_line': cut_line, 'end_line': len(lines)})
+
+        signature_start = self._find_signature(lines, kept)
+        if signature_start is not None:
+            removed.append({'reason': 'signature', 'start_line': signature_start,
+                            'end_line': cut_line if cut_line is not None else len(lines)})
+            kept = [index for index in kept if index < signature_start]
+            cut_line, cut_reason = signature_start, 'signature'
+
+        # Drop trailing blank lines so the cut point is the end of the real content
+        while kept and not lines[kept[-1]].strip():
+            kept.pop()
+
+        body = ''.join(lines[index] for index in kept).strip()
+        cut_offset = None
+        if cut_line is not None:
+            cut_offset = offsets[kept[-1]] + len(lines[kept[-1]].rstrip('\r\n')) if kept else 0
+
+        return self._result(body, cut_offset, cut_line, cut_reason, removed)
+
+    def _terminal_reason(self, lower: str, lines: List[str], index: int) -> Optional[str]:
+        """Classify a line that ends the message's own content, if it is one"""
+        if not lower:
+            return None
+
+        if lower.startswith(REPLY_HEADER_STARTS):
+            if lower.endswith(REPLY_HEADER_ENDS):
+                return 'reply_header'
+            # Gmail wraps long headers: "On Mon, ... <sam@example.com>" / "wrote:"
+            if index + 1 < len(lines) and lines[index + 1].strip().lower().endswith(REPLY_HEADER_ENDS) \
+                    and len(lines[index + 1].strip()) <= 40:
+                return 'reply_header'
+
+        if lower[0] == '-':
+            if lower in ('--', '-- '):
+                return 'signature'
+            if ORIGINAL_MESSAGE_RE.match(lower):
+                return 'original_message'
+
+        if FORWARD_RE.match(lower):
+            return 'forwarded_message'
+
+        if lower[0] == '_' and OUTLOOK_SEPARATOR_RE.match(lower):
+            return 'outlook_separator'
+
+        return None
+
+    def _find_signature(self, lines: List[str], kept: List[int]) -> Optional[int]:
+        """Find a trailing sign-off followed only by a short contact block"""
+        trailing = 0
+        for position in range(len(kept) - 1, -1, -1):
+            line = lines[kept[position]].strip()
+            if not line:
+                continue
+
+            if SIGN_OFF_RE.fullmatch(line.lower()):
+                # Keep the sign-off itself; the name and contact lines after it are the signature
+                if trailing == 0 or position + 1 >= len(kept):
+                    return None
+                return kept[position + 1]
+
+            trailing += 1
+            if trailing > MAX_SIGNATURE_LINES or len(line) > MAX_SIGNATURE_LINE_LENGTH:
+                return None
+            if not self._is_contact_line(line):
+                return None
+        return None
+
+    @staticmethod
+    def _is_contact_line(line: str) -> bool:
+        """
+        Check whether a line after a sign-off reads like a name, title or contact line
+
+        Questions, exclamations and lines with ordinary lowercase words
+        ("plan is to ship Monday") are message text, not a signature.
+        Addresses, URLs and phone numbers are not counted as words.
+        """
+        if '?' in line or line.endswith('!'):
+            return False
+
+        # A full stop ends a sentence unless it ends an abbreviation ("Example Inc.", "Ph.D.")
+        if line.endswith('.'):
+            last = line.split()[-1][:-1]
+            if len(last) > 4 and '.' not in last:
+                return False
+
+        words = []
+        for token in line.split():
+            if any(char.isdigit() or char in '@/' for char in token):
+                continue
+            word = token.strip('.,;:()[]|"\'')
+            if not word or '.' in word:
+                continue
+            words.append(word)
+
+        if words and words[0].lower() in SENTENCE_START_WORDS:
+            return False
+
+        return all(not word.islower() or word in SIGNATURE_LOWERCASE_WORDS for word in words)
+
+    @staticmethod
+    def _extend(removed: List[Dict], reason: str, index: int):
+        """Record a removed line, merging it into the previous range when adjacent"""
+        if removed and removed[-1]['reason'] == reason and removed[-1]['end_line'] == index:
+            removed[-1]['end_line'] = index + 1
+        else:
+            removed.append({'reason': reason, 'start_line': index, 'end_line': index + 1})
+
+    @staticmethod
+    def _result(text: str, cut_offset: Optional[int], cut_line: Optional[int], cut_reason: Optional[str],
+                removed: List[Dict]) -> Dict:
+        return {
+            'text': text,
+            'cut_offset': cut_offset,
+            'cut_line': cut_line,
+            'cut_reason': cut_reason,
+            'removed': removed
+        }
+
+
+# Create global instance
+quote_stripper = QuoteStripper()
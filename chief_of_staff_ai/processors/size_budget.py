@@ -0,0 +1,164 @@
+# Per-stage size budgets that keep oversized messages from exhausting worker memory
+
+import base64
+import codecs
+import re
+from typing import Optional, Tuple
+
+from config.settings import settings
+
+# Appended wherever content was dropped, so readers (and Claude) know the text is incomplete
+TRUNCATION_MARKER = '[... message truncated ...]'
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class SizeBudget:
+    """
+    Caps what each stage of the pipeline keeps of a message
+
+    A single multi-megabyte HTML newsletter used to be decoded in full,
+    stored as body_text, body_html and body_clean, parsed into a complete
+    tree and sent whole to Claude. Each stage now has its own budget:
+
+    - decoding: at most MAX_BODY_PART_BYTES of each text part are decoded,
+      reading only the base64 prefix that covers them
+    - HTML to text: HTML above HTML_TREE_MAX_CHARS is tokenized in chunks
+      instead of being parsed into a tree (see HtmlToText.convert_bounded)
+    - body_clean: at most MAX_BODY_CLEAN_CHARS characters
+    - analysis: at most MAX_ANALYSIS_BODY_CHARS characters of body in a prompt
+
+    Truncated content ends with TRUNCATION_MARKER.
+    """
+
+    def __init__(self, max_part_bytes: int = settings.MAX_BODY_PART_BYTES,
+                 max_clean_chars: int = settings.MAX_BODY_CLEAN_CHARS,
+                 max_analysis_chars: int = settings.MAX_ANALYSIS_BODY_CHARS):
+        self.max_part_bytes = max_part_bytes
+        self.max_clean_chars = max_clean_chars
+        self.max_analysis_chars = max_analysis_chars
+
+    def decode_part(self, data: str, mime_type: str, charset: Optional[str] = None,
+                    urlsafe: bool = False, errors: str = 'replace', truncated: bool = False) -> Tuple[str, bool]:
+        """
+        Decode a base64 text part within the part budget, marking it if it was cut
+
+        Args:
+            data: Base64 (or base64url) encoded part body
+            mime_type: 'text/plain' or 'text/html'
+            charset: Declared charset of the part (utf-8 if missing or unknown)
+            urlsafe: Whether data uses the URL-safe alphabet (Gmail JSON payloads)
+            errors: Codec error handler
+            truncated: Whether data is already a prefix of the part
+
+        Returns:
+            Tuple of decoded text and whether it was truncated
+        """
+        raw, cut = self.decode_base64(data, urlsafe)
+        return self.decode_bytes(raw, mime_type, charset, errors, truncated or cut)
+
+    def decode_base64(self, data: str, urlsafe: bool = False) -> Tuple[bytes, bool]:
+        """
+        Decode only the base64 prefix that covers the part budget
+
+        Args:
+            data: Encoded data; MIME line breaks are allowed
+            urlsafe: Whether data uses the URL-safe alphabet
+
+        Returns:
+            Tuple of decoded bytes and whether data held more than was decoded
+        """
+        # 4 encoded characters per 3 bytes, plus room for a CRLF every 76 characters
+        needed = (self.max_part_bytes // 3 + 1) * 4
+        needed += needed // 38 + 4
+        truncated = len(data) > needed
+
+        if truncated:
+            prefix = WHITESPACE_RE.sub('', data[:needed])
+            data = prefix[:len(prefix) // 4 * 4]
+        else:
+            # Tolerate missing padding
+            encoded_length = len(data) - sum(data.count(char) for char in '\r\n\t ')
+            data += '=' * (-encoded_length % 4)
+
+        raw = base64.urlsafe_b64decode(data) if urlsafe else base64.b64decode(data)
+        return raw, truncated
+
+    def decode_bytes(self, payload: bytes, mime_type: str, charset: Optional[str] = None,
+                     errors: str = 'replace', truncated: bool = False) -> Tuple[str, bool]:
+        """
+        Decode part bytes within the part budget, marking the text if it was cut
+
+        Args:
+            payload: Decoded transfer-encoding bytes of the part
+            mime_type: 'text/plain' or 'text/html'
+            charset: Declared charset of the part (utf-8 if missing or unknown)
+            errors: Codec error handler
+            truncated: Whether payload is already a prefix of the part
+
+        Returns:
+            Tuple of text and whether it was truncated
+        """
+        if len(payload) > self.max_part_bytes:
+            payload = payload[:self.max_part_bytes]
+            truncated = True
+
+        try:
+            decoder = codecs.getincrementaldecoder(charset or 'utf-8')(errors)
+        except LookupError:
+            # Unknown charset name
+            decoder = codecs.getincrementaldecoder('utf-8')(errors)
+
+        # A cut payload may end inside a multi-byte sequence; the decoder holds it back
+        text = decoder.decode(payload, final=not truncated)
+        if truncated:
+            text = self.mark_html(text) if mime_type == 'text/html' else self.mark_text(text)
+        return text, truncated
+
+    def truncate_text(self, text: str, max_chars: int, force: bool = False) -> Tuple[str, bool]:
+        """
+        Cut text to a budget at a word boundary and mark it
+
+        Args:
+            text: Text to bound
+            max_chars: Budget in characters, not counting the marker
+            force: Mark the text even if it fits (an earlier stage dropped content)
+
+        Returns:
+            Tuple of text and whether it was truncated
+        """
+        if not text or (len(text) <= max_chars and not force):
+            return text, False
+
+        if len(text) > max_chars:
+            text = text[:max_chars]
+            last_space = text.rfind(' ', max(0, max_chars - 200))
+            if last_space > 0:
+                text = text[:last_space]
+        return self.mark_text(text), True
+
+    def mark_text(self, text: str) -> str:
+        """Append the truncation marker to plain text (once)"""
+        text = text.rstrip()
+        if text.endswith(TRUNCATION_MARKER):
+            return text
+        return f"{text}\n\n{TRUNCATION_MARKER}"
+
+    def mark_html(self, html: str) -> str:
+        """Drop a trailing partial tag and append the truncation marker as a paragraph"""
+        open_tag = html.rfind('<')
+        if open_tag > html.rfind('>'):
+            html = html[:open_tag]
+        return f"{html}\n<p>{TRUNCATION_MARKER}</p>"
+
+    def is_truncated(self, text: Optional[str]) -> bool:
+        """Check whether text carries the truncation marker"""
+        return bool(text) and text.rstrip().endswith(TRUNCATION_MARKER)
+
+    def analysis_text(self, text: Optional[str]) -> str:
+        """Email body bounded for a Claude prompt"""
+        return self.truncate_text(text or '', self.max_analysis_chars)[0]
+
+
+# Create global instance
+size_budget = SizeBudget()
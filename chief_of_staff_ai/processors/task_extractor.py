@@ -9,13 +9,25 @@ from dateutil import parser
 import anthropic
 
 from config.settings import settings
-from models.database import get_db_manager, Email, Task
+from models.database import get_db_manager, in_pending_batch, Email, Task, with_bodies
+from processors.keyword_matcher import keyword_matcher
+from processors.size_budget import size_budget
 
 logger = logging.getLogger(__name__)
 
 class TaskExtractor:
     """Extracts actionable tasks from emails using Claude 4 Sonnet"""
     
+    # Keyword categories and the task category each implies, in order of precedence
+    TASK_CATEGORY_HITS = {
+        'task_meeting': 'meeting',
+        'task_review': 'review',
+        'task_follow_up': 'follow-up',
+        'task_document': 'document',
+        'task_decision': 'decision',
+        'task_deadline': 'deadline'
+    }
+    
     def __init__(self):
         self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
         self.model = "claude-3-5-sonnet-20241022"
@@ -39,19 +51,7 @@ class TaskExtractor:
                 return {'success': False, 'error': 'User not found'}
             
             # Get normalized emails that need task extraction
-            with get_db_manager().get_session() as session:
-                query = session.query(Email).filter(
-                    Email.user_id == user.id,
-                    Email.body_clean.isnot(None)  # Already normalized
-                )
-                
-                if not force_refresh:
-                    # Only process emails that don't have tasks yet
-                    query = query.filter(~session.query(Task).filter(
-                        Task.email_id == Email.id
-                    ).exists())
-                
-                emails = query.limit(limit or 50).all()
+            emails = self._get_pending_emails(user.id, limit or 50, force_refresh)
             
             if not emails:
                 logger.info(f"No emails to process for task extraction for {user_email}")
@@ -69,31 +69,12 @@ class TaskExtractor:
             
             for email in emails:
                 try:
-                    # Convert database email to dict for processing
-                    email_dict = {
-                        'id': email.gmail_id,
-                        'subject': email.subject,
-                        'sender': email.sender,
-                        'sender_name': email.sender_name,
-                        'body_clean': email.body_clean,
-                        'body_preview': email.body_preview,
-                        'timestamp': email.email_date,
-                        'message_type': email.message_type,
-                        'priority_score': email.priority_score
-                    }
-                    
                     # Extract tasks from this email
-                    extraction_result = self.extract_tasks_from_email(email_dict)
+                    extraction_result = self.extract_tasks_from_email(self._email_to_dict(email))
                     
                     if extraction_result['success'] and extraction_result['tasks']:
                         # Save tasks to database
-                        for task_data in extraction_result['tasks']:
-                            task_data['email_id'] = email.id
-                            task_data['extractor_version'] = self.version
-                            task_data['model_used'] = self.model
-                            
-                            get_db_manager().save_task(user.id, email.id, task_data)
-                            total_tasks += 1
+                        total_tasks += self._save_tasks(user.id, email.id, extraction_result['tasks'])
                     
                     processed_emails += 1
                     
@@ -117,6 +98,52 @@ class TaskExtractor:
             logger.error(f"Failed to extract tasks for {user_email}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def _get_pending_emails(self, user_id: int, limit: int, force_refresh: bool,
+                           exclude_batch_kind: str = None) -> List[Email]:
+        """Get normalized emails that need task extraction"""
+        with get_db_manager().get_session() as session:
+            query = session.query(Email).options(with_bodies('body_clean')).filter(
+                Email.user_id == user_id,
+                Email.normalizer_version.isnot(None)  # Already normalized
+            )
+            
+            if exclude_batch_kind:
+                # Already submitted in a batch whose results are not imported yet
+                query = query.filter(~in_pending_batch(exclude_batch_kind))
+            
+            if not force_refresh:
+                # Only process emails that don't have tasks yet
+                query = query.filter(~session.query(Task).filter(
+                    Task.email_id == Email.id
+                ).exists())
+            
+            return query.limit(limit).all()
+    
+    def _email_to_dict(self, email: Email) -> Dict:
+        """Convert a database email (loaded with body_clean) to the dictionary the extractor works on"""
+        return {
+            'id': email.gmail_id,
+            'subject': email.subject,
+            'sender': email.sender,
+            'sender_name': email.sender_name,
+            'body_clean': email.body.body_clean if email.body else None,
+            'body_preview': email.body_preview,
+            'timestamp': email.email_date,
+            'message_type': email.message_type,
+            'priority_score': email.priority_score
+        }
+    
+    def _save_tasks(self, user_id: int, email_id: int, tasks: List[Dict]) -> int:
+        """Save extracted tasks for an email and return how many were saved"""
+        for task_data in tasks:
+            task_data['email_id'] = email_id
+            task_data['extractor_version'] = self.version
+            task_data['model_used'] = self.model
+            
+            get_db_manager().save_task(user_id, email_id, task_data)
+        
+        return len(tasks)
+    
     def extract_tasks_from_email(self, email_data: Dict) -> Dict:
         """
         Extract actionable tasks from a single email using Claude 4 Sonnet
@@ -128,24 +155,13 @@ class TaskExtractor:
             Dictionary containing extracted tasks and metadata
         """
         try:
-            # Check if email has enough content for task extraction
-            body_clean = email_data.get('body_clean', '')
-            if not body_clean or len(body_clean.strip()) < 20:
-                return {
-                    'success': True,
-                    'email_id': email_data.get('id'),
-                    'tasks': [],
-                    'reason': 'Email content too short for task extraction'
-                }
-            
-            # Skip certain message types that unlikely contain tasks
-            message_type = email_data.get('message_type', 'regular')
-            if message_type in ['newsletter', 'automated']:
+            skip_reason = self._skip_reason(email_data)
+            if skip_reason:
                 return {
                     'success': True,
                     'email_id': email_data.get('id'),
                     'tasks': [],
-                    'reason': f'Message type "{message_type}" skipped for task extraction'
+                    'reason': skip_reason
                 }
             
             # Prepare email context for Claude
@@ -161,14 +177,8 @@ class TaskExtractor:
                     'error': 'Failed to get response from Claude'
                 }
             
-            # Parse Claude's response
-            tasks = self._parse_claude_response(claude_response, email_data)
-            
-            # Enhance tasks with additional metadata
-            enhanced_tasks = []
-            for task in tasks:
-                enhanced_task = self._enhance_task(task, email_data)
-                enhanced_tasks.append(enhanced_task)
+            # Parse Claude's response and enhance tasks with additional metadata
+            enhanced_tasks = self._tasks_from_response(claude_response, email_data)
             
             return {
                 'success': True,
@@ -190,6 +200,24 @@ class TaskExtractor:
                 'error': str(e)
             }
     
+    def _skip_reason(self, email_data: Dict) -> Optional[str]:
+        """Return why an email is not worth sending to Claude, or None if it is"""
+        # Check if email has enough content for task extraction
+        body_clean = email_data.get('body_clean', '')
+        if not body_clean or len(body_clean.strip()) < 20:
+            return 'Email content too short for task extraction'
+        
+        # Skip certain message types that unlikely contain tasks
+        message_type = email_data.get('message_type', 'regular')
+        if message_type in ['newsletter', 'automated']:
+            return f'Message type "{message_type}" skipped for task extraction'
+        
+        return None
+    
+    def _tasks_from_response(self, response: str, email_data: Dict) -> List[Dict]:
+        """Parse Claude's response into tasks enhanced with additional metadata"""
+        return [self._enhance_task(task, email_data) for task in self._parse_claude_response(response, email_data)]
+    
     def _prepare_email_context(self, email_data: Dict) -> str:
         """
         Prepare email context for Claude task extraction
@@ -202,7 +230,7 @@ class TaskExtractor:
         """
         sender = email_data.get('sender_name') or email_data.get('sender', '')
         subject = email_data.get('subject', '')
-        body = email_data.get('body_clean', '')
+        body = size_budget.analysis_text(email_data.get('body_clean', ''))
         timestamp = email_data.get('timestamp')
         
         # Format timestamp
@@ -237,7 +265,28 @@ Email Content:
             Claude's response or None if failed
         """
         try:
-            system_prompt = """You are an expert AI assistant that extracts actionable tasks from emails. Your job is to identify specific tasks, action items, deadlines, and follow-ups from email content.
+            message = self.client.messages.create(**self._build_task_request(email_context))
+            
+            response_text = message.content[0].text.strip()
+            logger.debug(f"Claude response: {response_text}")
+            
+            return response_text
+            
+        except Exception as e:
+            logger.error(f"Failed to call Claude for task extraction: {str(e)}")
+            return None
+    
+    def _build_task_request(self, email_context: str) -> Dict:
+        """
+        Build the messages.create arguments for extracting tasks from one email
+        
+        Args:
+            email_context: Formatted email context
+            
+        Returns:
+            Keyword arguments for messages.create (also used as Message Batches params)
+        """
+        system_prompt = """You are an expert AI assistant that extracts actionable tasks from emails. Your job is to identify specific tasks, action items, deadlines, and follow-ups from email content.
 
 Please analyze the email and extract actionable tasks following these guidelines:
 
@@ -269,33 +318,24 @@ Please analyze the email and extract actionable tasks following these guidelines
 
 Return ONLY the JSON array. If no actionable tasks are found, return an empty array []."""
 
-            user_prompt = f"""Please analyze this email and extract actionable tasks:
+        user_prompt = f"""Please analyze this email and extract actionable tasks:
 
 {email_context}
 
 Remember to return only a JSON array of tasks, or an empty array [] if no actionable tasks are found."""
 
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=2000,
-                temperature=0.1,
-                system=system_prompt,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": user_prompt
-                    }
-                ]
-            )
-            
-            response_text = message.content[0].text.strip()
-            logger.debug(f"Claude response: {response_text}")
-            
-            return response_text
-            
-        except Exception as e:
-            logger.error(f"Failed to call Claude for task extraction: {str(e)}")
-            return None
+        return {
+            'model': self.model,
+            'max_tokens': 2000,
+            'temperature': 0.1,
+            'system': system_prompt,
+            'messages': [
+                {
+                    "role": "user",
+                    "content": user_prompt
+                }
+            ]
+        }
     
     def _parse_claude_response(self, response: str, email_data: Dict) -> List[Dict]:
         """
@@ -453,32 +493,12 @@ Remember to return only a JSON array of tasks, or an empty array [] if no action
         Returns:
             Task category
         """
-        description_lower = description.lower()
-        subject = email_data.get('subject', '').lower()
-        
-        # Meeting-related tasks
-        if any(keyword in description_lower for keyword in ['meeting', 'call', 'schedule', 'zoom', 'teams']):
-            return 'meeting'
-        
-        # Review tasks
-        if any(keyword in description_lower for keyword in ['review', 'check', 'look at', 'examine']):
-            return 'review'
-        
-        # Response tasks
-        if any(keyword in description_lower for keyword in ['reply', 'respond', 'answer', 'get back']):
-            return 'follow-up'
-        
-        # Document tasks
-        if any(keyword in description_lower for keyword in ['document', 'report', 'write', 'create', 'draft']):
-            return 'document'
-        
-        # Decision tasks
-        if any(keyword in description_lower for keyword in ['decide', 'choose', 'approve', 'confirm']):
-            return 'decision'
+        hits = keyword_matcher.scan({'description': description})
         
-        # Deadline tasks
-        if any(keyword in description_lower for keyword in ['deadline', 'due', 'submit', 'deliver']):
-            return 'deadline'
+        # Meeting, review, response, document, decision and deadline tasks, in that order
+        category = hits.first(self.TASK_CATEGORY_HITS)
+        if category:
+            return self.TASK_CATEGORY_HITS[category]
         
         return 'action_item'
     
@@ -13,6 +13,11 @@ Usage:
     python run.py --email user@example.com
     python run.py --email user@example.com --max-emails 10
     python run.py --test-auth user@example.com
+    python run.py --email user@example.com --backfill
+    python run.py --email user@example.com --backfill --backfill-pages 5
+    python run.py --email user@example.com --batch-analysis intelligence
+    python run.py --email user@example.com --poll-batches
+    python run.py --renew-watches
 """
 
 import sys
@@ -32,6 +37,9 @@ try:
     from config.settings import settings
     from auth.gmail_auth import gmail_auth
     from ingest.gmail_fetcher import gmail_fetcher
+    from ingest.backfill import mailbox_backfill
+    from ingest.push import push_ingest
+    from processors.batch_analysis import batch_analysis
     from processors.email_normalizer import email_normalizer
     from processors.task_extractor import task_extractor
 except ImportError as e:
@@ -246,25 +254,100 @@ def generate_summary_report(results: Dict, normalized_messages: List[Dict], task
     
     print("\n" + "="*60)
 
+def run_backfill(user_email: str, max_pages: int = None, restart: bool = False) -> Dict:
+    """Run or resume the full-mailbox backfill in the foreground"""
+    print(f"\n=== Mailbox Backfill for {user_email} ===")
+    
+    result = mailbox_backfill.run(user_email, max_pages=max_pages, restart=restart)
+    progress = result.get('backfill') or {}
+    
+    if result.get('success'):
+        print(f"Status: {progress.get('status')}")
+    else:
+        print(f"✗ {result.get('error')}")
+    
+    if progress:
+        print(f"Listed {progress.get('messages_listed')} of ~{progress.get('estimated_total')} messages "
+              f"({progress.get('percent_complete')}%), stored {progress.get('messages_stored')}, "
+              f"failed {progress.get('messages_failed')}")
+        print(f"Rate: {progress.get('rate_per_second')} msg/s, ETA: {progress.get('eta_seconds')}s")
+    
+    return result
+
+def run_batch_analysis(user_email: str, kind: str, limit: int = None) -> Dict:
+    """Submit the user's pending emails for batch analysis"""
+    print(f"\n=== Batch Analysis ({kind}) for {user_email} ===")
+    
+    result = batch_analysis.submit(user_email, kind=kind, limit=limit)
+    
+    if result.get('success'):
+        print(f"Submitted {result.get('submitted_emails')} emails in {len(result.get('batches', []))} batches")
+        for batch in result.get('batches', []):
+            print(f"  - {batch['batch_id']}: {batch['request_count']} requests")
+    else:
+        print(f"✗ {result.get('error')}")
+    
+    return result
+
+def poll_batches(user_email: str, wait: bool = False) -> Dict:
+    """Import the results of ended analysis batches, optionally waiting for all of them"""
+    print(f"\n=== Analysis Batches for {user_email} ===")
+    
+    if wait:
+        result = batch_analysis.run_poller(until_idle=True, user_email=user_email)
+    else:
+        result = batch_analysis.poll(user_email)
+    
+    if result.get('success'):
+        for batch in result.get('imported_batches', []):
+            print(f"Imported {batch['kind']} batch {batch['batch_id']}: {batch['succeeded_count']} succeeded, "
+                  f"{batch['errored_count']} errored, {batch.get('tasks_created', 0)} tasks created")
+        print(f"Still in progress: {result.get('in_progress')}")
+    else:
+        print(f"✗ {result.get('error')}")
+    
+    return result
+
+def renew_watches() -> Dict:
+    """Re-register every push notification watch that is about to expire"""
+    print("\n=== Push Notification Renewal ===")
+    
+    result = push_ingest.renew_expiring_watches()
+    
+    print(f"Renewed {result.get('renewed')} of {result.get('due')} expiring watches")
+    for user_email in result.get('failed', []):
+        print(f"✗ Could not renew {user_email}")
+    
+    return result
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description='AI Chief of Staff - Gmail E2E Flow')
-    parser.add_argument('--email', '-e', required=True, help='User email address')
+    parser.add_argument('--email', '-e', help='User email address (required except with --renew-watches)')
     parser.add_argument('--max-emails', '-m', type=int, default=10, help='Maximum emails to process (default: 10)')
     parser.add_argument('--days-back', '-d', type=int, default=7, help='Days back to fetch emails (default: 7)')
     parser.add_argument('--test-auth', action='store_true', help='Only test authentication')
     parser.add_argument('--verbose', '-v', action='store_true', help='Enable verbose logging')
+    parser.add_argument('--backfill', action='store_true', help='Run or resume the full-mailbox backfill')
+    parser.add_argument('--backfill-pages', type=int, help='Stop the backfill after this many pages (resumable)')
+    parser.add_argument('--restart-backfill', action='store_true', help='Discard saved backfill progress and start over')
+    parser.add_argument('--batch-analysis', choices=['intelligence', 'tasks'], help='Submit pending emails for batch analysis')
+    parser.add_argument('--batch-limit', type=int, help='Submit at most this many emails (default: all pending)')
+    parser.add_argument('--poll-batches', action='store_true', help='Import the results of ended analysis batches')
+    parser.add_argument('--wait', action='store_true', help='With --poll-batches, keep polling until every batch is imported')
+    parser.add_argument('--renew-watches', action='store_true', help='Renew expiring push notification watches of all users')
     
     args = parser.parse_args()
+    if not args.email and not args.renew_watches:
+        parser.error('--email is required')
     
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
     # Validate configuration
-    try:
-        settings.validate_required_settings()
-    except ValueError as e:
-        print(f"Configuration Error: {e}")
+    config_errors = settings.validate_config()
+    if config_errors:
+        print(f"Configuration Error: {'; '.join(config_errors)}")
         print("Please check your .env file and ensure all required variables are set.")
         sys.exit(1)
     
@@ -274,10 +357,22 @@ def main():
     print("AI Chief of Staff - Gmail E2E Flow")
     print("=" * 40)
     
-    if args.test_auth:
+    if args.renew_watches:
+        result = renew_watches()
+        sys.exit(0 if result.get('success') else 1)
+    elif args.test_auth:
         # Only test authentication
         success = test_authentication(args.email)
         sys.exit(0 if success else 1)
+    elif args.backfill:
+        result = run_backfill(args.email, max_pages=args.backfill_pages, restart=args.restart_backfill)
+        sys.exit(0 if result.get('success') else 1)
+    elif args.batch_analysis:
+        result = run_batch_analysis(args.email, args.batch_analysis, limit=args.batch_limit)
+        sys.exit(0 if result.get('success') else 1)
+    elif args.poll_batches:
+        result = poll_batches(args.email, wait=args.wait)
+        sys.exit(0 if result.get('success') else 1)
     else:
         # Run full E2E flow
         results = run_gmail_e2e_flow(
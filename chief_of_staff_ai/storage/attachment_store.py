@@ -0,0 +1,378 @@
+# Content-addressed attachment store with lazy Gmail downloads and LRU eviction
+
+import base64
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from auth.gmail_auth import gmail_auth
+from ingest.gmail_concurrency import get_quota_bucket
+from ingest.mime_parser import mime_parser
+from models.database import get_db_manager, AttachmentBlob, EmailAttachment
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AttachmentStore:
+    """
+    Stores attachment bodies on local disk, keyed by the SHA-256 of their content
+
+    Ingest only records attachment metadata; the body is downloaded through
+    attachments.get the first time something asks for it. Identical content
+    received in several emails is stored once, and the least recently read
+    blobs are evicted when the store grows past its size budget. Blobs that
+    are being streamed to a client are skipped by eviction until the stream
+    is closed.
+    """
+
+    def __init__(
+        self,
+        root: str = None,
+        max_bytes: int = settings.ATTACHMENT_STORE_MAX_BYTES,
+        max_attachment_size: int = settings.ATTACHMENT_MAX_SIZE,
+        denied_extensions: str = settings.ATTACHMENT_DENIED_EXTENSIONS
+    ):
+        self.root = os.path.join(root or settings.UPLOAD_FOLDER, 'attachments')
+        self.max_bytes = max_bytes
+        self.max_attachment_size = max_attachment_size
+        self.denied_extensions = {ext.strip().lower().lstrip('.') for ext in (denied_extensions or '').split(',') if ext.strip()}
+        self.read_chunk_size = 64 * 1024
+        self._evict_lock = threading.Lock()
+        self._open_blobs: Dict[str, int] = {}
+        self._open_lock = threading.Lock()
+
+    def blob_path(self, sha256: str) -> str:
+        """Path of a blob, fanned out over two directory levels"""
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def get_attachment(self, user_email: str, gmail_id: str, index: int) -> Dict:
+        """
+        Resolve an email attachment to a local blob, downloading it on first access
+
+        Args:
+            user_email: Email of the user
+            gmail_id: Gmail message ID
+            index: Position of the attachment in the email's attachment list
+
+        Returns:
+            Dictionary with the attachment metadata, blob path and size
+        """
+        try:
+            user = get_db_manager().get_user_by_email(user_email)
+            if not user:
+                return {'success': False, 'error': 'User not found'}
+
+            email = get_db_manager().get_emails_by_gmail_ids(user.id, [gmail_id]).get(gmail_id)
+            if not email:
+                return {'success': False, 'error': f'Email {gmail_id} not found'}
+
+            entries = email.attachments or []
+            if index < 0 or index >= len(entries):
+                return {'success': False, 'error': f'Email {gmail_id} has no attachment {index}'}
+
+            entry = entries[index]
+            error = self._check_allowed(entry)
+            if error:
+                return {'success': False, 'error': error}
+
+            with get_db_manager().get_session() as session:
+                mapping = session.query(EmailAttachment).filter(
+                    EmailAttachment.user_id == user.id,
+                    EmailAttachment.gmail_id == gmail_id,
+                    EmailAttachment.attachment_index == index
+                ).first()
+
+                if not mapping:
+                    mapping = EmailAttachment(
+                        user_id=user.id,
+                        gmail_id=gmail_id,
+                        attachment_index=index,
+                        filename=entry.get('filename'),
+                        mime_type=entry.get('mime_type'),
+                        size=entry.get('size'),
+                        gmail_attachment_id=entry.get('attachment_id')
+                    )
+                    session.add(mapping)
+                    session.commit()
+
+                # Serve from disk when the content is already stored
+                if mapping.sha256 and self._touch(session, mapping.sha256):
+                    session.commit()
+                    session.refresh(mapping)
+                    return self._attachment_response(mapping)
+
+                # Release the read transaction before writing the blob in its own session
+                session.rollback()
+                if mapping.gmail_attachment_id:
+                    data = self._download(user_email, user.id, gmail_id, mapping.gmail_attachment_id)
+                else:
+                    data = self._download_inline(user_email, user.id, gmail_id, index)
+                mapping.sha256 = self.put_bytes(data, mapping.mime_type)
+                mapping.size = len(data)
+                session.commit()
+                session.refresh(mapping)
+                return self._attachment_response(mapping)
+
+        except Exception as e:
+            logger.error(f"Failed to get attachment {index} of {gmail_id} for {user_email}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+    def put_bytes(self, data: bytes, mime_type: str = None) -> str:
+        """
+        Store content once under its SHA-256 digest
+
+        Args:
+            data: Attachment content
+            mime_type: Content type recorded with a new blob
+
+        Returns:
+            Hex SHA-256 digest of the content
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+
+            # Write to a temporary file first so readers never see a partial blob
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+        with get_db_manager().get_session() as session:
+            if not self._touch(session, digest):
+                session.add(AttachmentBlob(sha256=digest, size=len(data), mime_type=mime_type))
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another request stored the same content concurrently
+                session.rollback()
+
+        self.evict(keep=digest)
+        return digest
+
+    def read_range(self, sha256: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        """
+        Read bytes [start, end) of a blob through a read-only memory map
+
+        Args:
+            sha256: Blob digest
+            start: First byte offset
+            end: Offset after the last byte, or None for the end of the blob
+
+        Returns:
+            The requested bytes
+        """
+        with open(self.blob_path(sha256), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            end = size if end is None else min(end, size)
+            if start >= end:
+                return b''
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[start:end]
+
+    def iter_range(self, sha256: str, start: int = 0, end: Optional[int] = None) -> 'BlobRangeStream':
+        """
+        Stream bytes [start, end) of a blob in read_chunk_size pieces from a memory map
+
+        The blob is opened right away and protected from eviction until the
+        returned stream is exhausted or closed (WSGI servers close response
+        iterables, also when the client disconnects).
+        """
+        self._pin(sha256)
+        try:
+            return BlobRangeStream(self, sha256, start, end)
+        except Exception:
+            self._unpin(sha256)
+            raise
+
+    def evict(self, keep: str = None) -> int:
+        """
+        Delete least recently read blobs until the store fits its size budget
+
+        Args:
+            keep: Digest that must not be evicted (the blob just written)
+
+        Returns:
+            Number of bytes freed
+        """
+        freed = 0
+
+        with self._evict_lock, get_db_manager().get_session() as session:
+            total = session.query(func.coalesce(func.sum(AttachmentBlob.size), 0)).scalar()
+            if total <= self.max_bytes:
+                return 0
+
+            for blob in session.query(AttachmentBlob).order_by(AttachmentBlob.last_accessed_at.asc()).all():
+                if total <= self.max_bytes:
+                    break
+                if blob.sha256 == keep or self._is_open(blob.sha256):
+                    continue
+
+                try:
+                    os.remove(self.blob_path(blob.sha256))
+                except FileNotFoundError:
+                    pass
+
+                total -= blob.size
+                freed += blob.size
+                session.delete(blob)
+
+            session.commit()
+
+        if freed:
+            logger.info(f"Evicted {freed} bytes of attachments, store now holds {total} bytes")
+        return freed
+
+    def get_stats(self) -> Dict:
+        """Get the number of stored blobs and their total size"""
+        with get_db_manager().get_session() as session:
+            count, total = session.query(
+                func.count(AttachmentBlob.id),
+                func.coalesce(func.sum(AttachmentBlob.size), 0)
+            ).one()
+
+        return {
+            'blobs': count,
+            'bytes': total,
+            'max_bytes': self.max_bytes
+        }
+
+    def _check_allowed(self, entry: Dict) -> Optional[str]:
+        """Return an error message if an attachment may not be stored"""
+        filename = entry.get('filename') or ''
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if extension in self.denied_extensions:
+            return f'Attachment type .{extension} is not allowed'
+
+        if (entry.get('size') or 0) > self.max_attachment_size:
+            return f'Attachment exceeds the {self.max_attachment_size} byte limit'
+
+        if not entry.get('attachment_id') and not entry.get('inline_only'):
+            return 'Attachment has no Gmail attachment ID'
+
+        return None
+
+    def _pin(self, sha256: str):
+        with self._open_lock:
+            self._open_blobs[sha256] = self._open_blobs.get(sha256, 0) + 1
+
+    def _unpin(self, sha256: str):
+        with self._open_lock:
+            remaining = self._open_blobs.get(sha256, 0) - 1
+            if remaining > 0:
+                self._open_blobs[sha256] = remaining
+            else:
+                self._open_blobs.pop(sha256, None)
+
+    def _is_open(self, sha256: str) -> bool:
+        with self._open_lock:
+            return sha256 in self._open_blobs
+
+    def _touch(self, session, sha256: str) -> bool:
+        """Mark a blob as recently read; returns False if it is not on disk"""
+        blob = session.query(AttachmentBlob).filter(AttachmentBlob.sha256 == sha256).first()
+        if not blob or not os.path.exists(self.blob_path(sha256)):
+            return False
+
+        blob.last_accessed_at = datetime.utcnow()
+        return True
+
+    def _download(self, user_email: str, user_id: int, gmail_id: str, attachment_id: str) -> bytes:
+        """Download one attachment body through attachments.get"""
+        service = gmail_auth.get_gmail_service(user_email)
+        if not service:
+            raise ValueError(f"No valid credentials for {user_email}")
+
+        get_quota_bucket(user_id).acquire_call('messages.attachments.get')
+        response = service.users().messages().attachments().get(
+            userId='me',
+            messageId=gmail_id,
+            id=attachment_id
+        ).execute()
+
+        data = base64.urlsafe_b64decode(response.get('data', ''))
+        logger.info(f"Downloaded attachment of {gmail_id} ({len(data)} bytes)")
+        return data
+
+    def _download_inline(self, user_email: str, user_id: int, gmail_id: str, index: int) -> bytes:
+        """Read an attachment stored inline in a raw message, which has no Gmail attachment ID"""
+        service = gmail_auth.get_gmail_service(user_email)
+        if not service:
+            raise ValueError(f"No valid credentials for {user_email}")
+
+        get_quota_bucket(user_id).acquire_call('messages.get')
+        response = service.users().messages().get(userId='me', id=gmail_id, format='raw').execute()
+
+        data = mime_parser.extract_attachment(base64.urlsafe_b64decode(response.get('raw', '')), index)
+        logger.info(f"Extracted inline attachment {index} of {gmail_id} ({len(data)} bytes)")
+        return data
+
+    def _attachment_response(self, mapping: EmailAttachment) -> Dict:
+        return {
+            'success': True,
+            'attachment': mapping.to_dict(),
+            'path': self.blob_path(mapping.sha256),
+            'size': mapping.size
+        }
+
+
+class BlobRangeStream:
+    """
+    Iterable over a byte range of a blob, holding the blob open until closed
+
+    The file and its memory map are opened on creation, so the content stays
+    readable even if the path is removed afterwards; close() releases them and
+    lets the blob be evicted again.
+    """
+
+    def __init__(self, store: AttachmentStore, sha256: str, start: int = 0, end: Optional[int] = None):
+        self.store = store
+        self.sha256 = sha256
+        self._file = open(store.blob_path(sha256), 'rb')
+        self._mapped = None
+
+        size = os.fstat(self._file.fileno()).st_size
+        self.start = start
+        self.end = size if end is None else min(end, size)
+        if self.start < self.end:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            if self._mapped is not None:
+                for offset in range(self.start, self.end, self.store.read_chunk_size):
+                    yield self._mapped[offset:min(offset + self.store.read_chunk_size, self.end)]
+        finally:
+            self.close()
+
+    def close(self):
+        if self._file is None:
+            return
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        self._file.close()
+        self._file = None
+        self.store._unpin(self.sha256)
+
+
+# Create global instance
+attachment_store = AttachmentStore()
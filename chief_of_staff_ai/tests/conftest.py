@@ -0,0 +1,38 @@
+# Shared fixtures: every test runs against a fresh SQLite database
+
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so the environment is set before any application import
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='cos_tests_'), 'test.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE_PATH}'
+os.environ['FLASK_DEBUG'] = 'False'
+os.environ['NORMALIZE_WORKERS'] = '1'
+os.environ.setdefault('ANTHROPIC_API_KEY', 'test-key')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from models.database import Base, get_db_manager, User
+
+
+@pytest.fixture
+def db():
+    """The database manager, with every table emptied"""
+    manager = get_db_manager()
+    Base.metadata.drop_all(bind=manager.engine)
+    Base.metadata.create_all(bind=manager.engine)
+    return manager
+
+
+@pytest.fixture
+def user(db):
+    """A stored user"""
+    with db.get_session() as session:
+        record = User(email='me@example.com', name='Me', google_id='google-me')
+        session.add(record)
+        session.commit()
+        session.refresh(record)
+        return record
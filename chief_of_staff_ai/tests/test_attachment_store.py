@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from main import attachment_disposition
+from models.database import AttachmentBlob
+from storage.attachment_store import AttachmentStore
+
+
+@pytest.fixture
+def store(db, tmp_path):
+    return AttachmentStore(root=str(tmp_path), max_bytes=10 * 1024 * 1024)
+
+
+def save_email_with_attachment(db, user, gmail_id, filename, size=4):
+    db.save_email(user.id, {
+        'id': gmail_id,
+        'sender': 'sam@example.com',
+        'subject': 'Deck',
+        'attachments': [{'filename': filename, 'mime_type': 'application/octet-stream', 'size': size,
+                         'attachment_id': f'att-{gmail_id}'}],
+        'has_attachments': True
+    })
+
+
+def test_same_deck_in_several_emails_is_stored_once(db, user, store, monkeypatch):
+    downloads = []
+
+    def download(user_email, user_id, gmail_id, attachment_id):
+        downloads.append(gmail_id)
+        return b'PPTX'
+
+    monkeypatch.setattr(store, '_download', download)
+    for gmail_id in ('m1', 'm2', 'm3'):
+        save_email_with_attachment(db, user, gmail_id, 'Q3 review.pptx')
+
+    results = [store.get_attachment(user.email, gmail_id, 0) for gmail_id in ('m1', 'm2', 'm3')]
+
+    assert all(result['success'] for result in results)
+    assert len({result['path'] for result in results}) == 1
+    assert store.get_stats()['blobs'] == 1
+
+    # Reading an attachment again is served from disk
+    assert store.get_attachment(user.email, 'm1', 0)['success']
+    assert downloads == ['m1', 'm2', 'm3']
+
+
+def test_denied_extensions_and_oversized_attachments_are_rejected(db, user, tmp_path):
+    store = AttachmentStore(root=str(tmp_path), max_attachment_size=10, denied_extensions='exe, .scr')
+    save_email_with_attachment(db, user, 'm1', 'setup.exe')
+    save_email_with_attachment(db, user, 'm2', 'photo.jpg', size=11)
+    save_email_with_attachment(db, user, 'm3', 'notes.xlsx', size=10)
+
+    assert 'not allowed' in store.get_attachment(user.email, 'm1', 0)['error']
+    assert 'limit' in store.get_attachment(user.email, 'm2', 0)['error']
+    assert store._check_allowed({'filename': 'notes.xlsx', 'size': 10, 'attachment_id': 'a'}) is None
+
+
+def test_blob_being_streamed_is_not_evicted(db, tmp_path):
+    store = AttachmentStore(root=str(tmp_path), max_bytes=150)
+    first = store.put_bytes(b'a' * 100)
+
+    stream = store.iter_range(first, 10, 20)
+    store.put_bytes(b'b' * 100)
+    assert os.path.exists(store.blob_path(first))
+    assert b''.join(stream) == b'a' * 10
+
+    # Once the stream is closed the blob can be evicted again
+    store.put_bytes(b'c' * 100)
+    assert not os.path.exists(store.blob_path(first))
+    with db.get_session() as session:
+        assert session.query(AttachmentBlob).filter(AttachmentBlob.sha256 == first).first() is None
+
+
+def test_content_disposition_quotes_filename():
+    header = attachment_disposition('Q3 "final"\r\nrépört.pdf')
+
+    assert header == ("attachment; filename=\"Q3 _final___r_p_rt.pdf\"; "
+                      "filename*=UTF-8''Q3%20%22final%22%0D%0Ar%C3%A9p%C3%B6rt.pdf")
+    assert attachment_disposition(None).startswith('attachment; filename="attachment"')
@@ -0,0 +1,94 @@
+from auth.gmail_auth import gmail_auth
+from ingest.backfill import MailboxBackfill
+from ingest.gmail_fetcher import gmail_fetcher
+from models.database import Email
+
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, http=None):
+        return self.result
+
+
+class FakeService:
+    """Just enough of the Gmail API for messages.list paging"""
+
+    _http = None
+
+    def __init__(self, pages):
+        self.pages = pages  # page token (None for the first page) -> message IDs
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def getProfile(self, userId):
+        return FakeRequest({'messagesTotal': sum(len(ids) for ids in self.pages.values()), 'historyId': '100'})
+
+    def list(self, userId, q, maxResults, pageToken):
+        tokens = list(self.pages)
+        index = tokens.index(pageToken)
+        result = {'messages': [{'id': message_id} for message_id in self.pages[pageToken]]}
+        if index + 1 < len(tokens):
+            result['nextPageToken'] = tokens[index + 1]
+        return FakeRequest(result)
+
+
+def fake_downloads(monkeypatch, failures):
+    """Download stub where a message fails as many times as failures[message_id]"""
+    def download(service, message_ids, stats, quota, prefilter):
+        for message_id in message_ids:
+            if failures.get(message_id, 0) > 0:
+                failures[message_id] -= 1
+                stats.record_failure(message_id)
+                continue
+            yield {'id': message_id, 'sender': 'sam@example.com', 'subject': message_id, 'body_text': 'Hello'}
+
+    monkeypatch.setattr(gmail_fetcher, '_download_emails', download)
+
+
+def stored_ids(db):
+    with db.get_session() as session:
+        return {gmail_id for (gmail_id,) in session.query(Email.gmail_id)}
+
+
+def run_backfill(monkeypatch, pages, retry_passes=3):
+    monkeypatch.setattr(gmail_auth, 'get_gmail_service', lambda user_email: FakeService(pages))
+    return MailboxBackfill(retry_passes=retry_passes).run('me@example.com', query='')
+
+
+def test_failed_messages_are_retried_before_completing(db, user, monkeypatch):
+    fake_downloads(monkeypatch, {'a2': 1, 'b1': 2})
+
+    result = run_backfill(monkeypatch, {None: ['a1', 'a2'], 'p2': ['b1', 'b2']})
+
+    assert result['success']
+    assert result['backfill']['status'] == 'completed'
+    assert result['backfill']['messages_missing'] == 0
+    assert stored_ids(db) == {'a1', 'a2', 'b1', 'b2'}
+
+
+def test_messages_still_failing_leave_the_job_incomplete(db, user, monkeypatch):
+    failures = {'a2': 5}
+    fake_downloads(monkeypatch, failures)
+
+    result = run_backfill(monkeypatch, {None: ['a1', 'a2'], 'p2': ['b1']}, retry_passes=2)
+
+    backfill = result['backfill']
+    assert backfill['status'] == 'incomplete'
+    assert backfill['messages_missing'] == 1
+    assert db.get_backfill_job(user.id).failed_ids == ['a2']
+    assert stored_ids(db) == {'a1', 'b1'}
+
+    # The next run only fetches the missing message instead of listing the mailbox again
+    failures['a2'] = 0
+    result = run_backfill(monkeypatch, {None: ['a1', 'a2'], 'p2': ['b1']})
+
+    assert result['success']
+    assert result['backfill']['status'] == 'completed'
+    assert result['backfill']['pages_completed'] == 2
+    assert stored_ids(db) == {'a1', 'a2', 'b1'}
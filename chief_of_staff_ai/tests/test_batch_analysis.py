@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from models.database import AnalysisBatchEmail, Email, Task, User
+from processors.batch_analysis import BatchAnalysis, LocalBatchBackend
+from processors.task_extractor import task_extractor
+
+
+def respond(params):
+    """Canned model output: a task list for task extraction, an analysis otherwise"""
+    if 'JSON array' in params['system']:
+        return json.dumps([{'description': 'Review the quarterly document', 'priority': 'high', 'confidence': 0.9}])
+    return json.dumps({'summary': 'Review request', 'topics': ['quarterly'], 'tasks': [{'description': 'Send feedback'}]})
+
+
+@pytest.fixture
+def emails(db, user):
+    for index in range(3):
+        db.save_email(user.id, {
+            'id': f'g{index}',
+            'sender': f'person{index}@corp.example',
+            'subject': f'Please review doc {index}',
+            'body_text': 'Please review the quarterly document by Friday and send feedback.',
+            'body_clean': 'Please review the quarterly document by Friday and send feedback.',
+            'message_type': 'regular',
+            'processing_metadata': {'normalizer_version': 'v1'}
+        })
+    return ['g0', 'g1', 'g2']
+
+
+@pytest.fixture
+def backend():
+    return LocalBatchBackend(respond, auto_complete=False)
+
+
+def count(db, model):
+    with db.get_session() as session:
+        return session.query(model).count()
+
+
+def test_submit_poll_and_import(db, emails, backend):
+    analysis = BatchAnalysis(backend, max_requests=2)
+
+    submitted = analysis.submit('me@example.com', 'intelligence')
+    assert submitted['submitted_emails'] == 3
+    assert len(submitted['batches']) == 2
+
+    # Emails waiting in an open batch are not submitted again
+    assert analysis.submit('me@example.com', 'intelligence')['submitted_emails'] == 0
+
+    polled = analysis.poll('me@example.com')
+    assert polled['in_progress'] == 2
+    assert polled['imported_batches'] == []
+
+    backend.complete()
+    polled = analysis.poll('me@example.com')
+    assert polled['in_progress'] == 0
+    assert sum(batch['succeeded_count'] for batch in polled['imported_batches']) == 3
+
+    with db.get_session() as session:
+        assert session.query(Email).filter(Email.ai_summary.isnot(None)).count() == 3
+
+    # Nothing is left to import
+    assert analysis.poll('me@example.com')['imported_batches'] == []
+
+
+def test_reimport_after_partial_failure_is_idempotent(db, emails, backend, monkeypatch):
+    analysis = BatchAnalysis(backend)
+    assert analysis.submit('me@example.com', 'tasks')['submitted_emails'] == 3
+    backend.complete()
+
+    save_tasks = task_extractor._save_tasks
+    calls = []
+
+    def fail_second_save(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError('database unavailable')
+        return save_tasks(*args)
+
+    monkeypatch.setattr(task_extractor, '_save_tasks', fail_second_save)
+    first = analysis.poll('me@example.com')
+    assert not first['imported_batches']
+    assert count(db, Task) == 1
+
+    monkeypatch.setattr(task_extractor, '_save_tasks', save_tasks)
+    retried = analysis.poll('me@example.com')
+
+    assert [batch['succeeded_count'] for batch in retried['imported_batches']] == [3]
+    # The result persisted before the failure is not imported a second time
+    assert count(db, Task) == 3
+
+
+def test_deleting_emails_removes_their_batch_entries(db, user, emails, backend):
+    BatchAnalysis(backend).submit('me@example.com', 'intelligence')
+    assert count(db, AnalysisBatchEmail) == 3
+
+    assert db.delete_emails(user.id, ['g0']) == 1
+    assert count(db, AnalysisBatchEmail) == 2
+
+    with db.get_session() as session:
+        session.delete(session.get(User, user.id))
+        session.commit()
+
+    assert count(db, AnalysisBatchEmail) == 0
+    assert count(db, Email) == 0
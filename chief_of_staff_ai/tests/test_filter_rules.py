@@ -0,0 +1,44 @@
+from ingest.filter_rules import GmailFilterRules
+
+
+def test_disabled_prefilter_neither_seeds_nor_saves_rules(db, user):
+    rules = GmailFilterRules(enabled=False)
+
+    assert rules.list_rules(user.id) == []
+    for result in (rules.add_rule(user.id, 'sender', 'news@example.com'),
+                   rules.disable_rule(user.id, 'category', 'promotions')):
+        assert not result['success']
+        assert result['prefilter_enabled'] is False
+
+    assert db.get_filter_rules(user.id) == []
+    assert rules.build_query(user.id, '-in:drafts') == ('-in:drafts', [])
+
+
+def test_only_full_addresses_are_excluded_in_the_gmail_query(db, user):
+    rules = GmailFilterRules(enabled=True)
+    rules.add_rule(user.id, 'sender', 'News@Example.com')
+    rules.add_rule(user.id, 'domain', 'ads.example')
+
+    compiled = rules.compile(user.id)
+
+    assert '-category:promotions' in compiled['query']
+    assert '-from:{news@example.com}' in compiled['query']
+    for local_only in ('noreply', 'ads.example'):
+        assert local_only not in compiled['query']
+
+    # Rules left out of the query still apply locally, with exact matching
+    assert rules.is_excluded(compiled, sender='noreply@example.com')
+    assert not rules.is_excluded(compiled, sender='noreply.team@example.com')
+    assert rules.is_excluded(compiled, sender='offers@mail.ads.example')
+    assert rules.is_excluded(compiled, sender='news@example.com')
+
+
+def test_senders_that_do_not_fit_are_applied_locally(db, user):
+    rules = GmailFilterRules(enabled=True, max_query_length=100)
+    for index in range(10):
+        rules.add_rule(user.id, 'sender', f'sender{index}@example.com')
+
+    compiled = rules.compile(user.id)
+
+    assert len(compiled['query']) <= 100
+    assert rules.is_excluded(compiled, sender='sender9@example.com')
@@ -0,0 +1,70 @@
+from ingest.gmail_batch import FetchStats
+from ingest.gmail_fetcher import gmail_fetcher
+from models.database import Email, with_bodies
+
+
+def stored_email(db, gmail_id):
+    with db.get_session() as session:
+        return session.query(Email).options(with_bodies('body_text', 'body_html')).filter(
+            Email.gmail_id == gmail_id
+        ).one()
+
+
+def test_force_refresh_keeps_body_of_metadata_only_download(db, user, monkeypatch):
+    db.save_email(user.id, {
+        'id': 'm1',
+        'sender': 'news@example.com',
+        'subject': 'Weekly digest',
+        'body_text': 'Full digest text',
+        'body_html': '<p>Full digest text</p>',
+        'body_clean': 'Full digest text',
+        'processing_metadata': {'normalizer_version': '1.1'}
+    })
+
+    # Header triage classified the message as bulk, so only its metadata was downloaded
+    def metadata_only(service, message_ids, stats, quota, prefilter):
+        for message_id in message_ids:
+            yield {
+                'id': message_id,
+                'sender': 'news@example.com',
+                'subject': 'Weekly digest',
+                'body_text': '',
+                'body_html': '',
+                'triage_type': 'newsletter',
+                'body_status': 'metadata'
+            }
+
+    monkeypatch.setattr(gmail_fetcher, '_download_emails', metadata_only)
+
+    refreshed = list(gmail_fetcher.stream_message_ids(None, user, ['m1'], FetchStats(), None, force_refresh=True))
+
+    assert refreshed == []
+    email = stored_email(db, 'm1')
+    assert email.body.body_text == 'Full digest text'
+    assert email.body.body_html == '<p>Full digest text</p>'
+    assert email.body_status == 'full'
+    assert email.normalizer_version == '1.1'
+
+
+def test_force_refresh_replaces_body_of_full_download(db, user, monkeypatch):
+    db.save_email(user.id, {
+        'id': 'm2',
+        'sender': 'sam@example.com',
+        'subject': 'Budget',
+        'body_text': 'Old text',
+        'body_clean': 'Old text',
+        'processing_metadata': {'normalizer_version': '1.1'}
+    })
+
+    def full(service, message_ids, stats, quota, prefilter):
+        for message_id in message_ids:
+            yield {'id': message_id, 'sender': 'sam@example.com', 'subject': 'Budget', 'body_text': 'New text'}
+
+    monkeypatch.setattr(gmail_fetcher, '_download_emails', full)
+
+    refreshed = list(gmail_fetcher.stream_message_ids(None, user, ['m2'], FetchStats(), None, force_refresh=True))
+
+    assert [email['gmail_id'] for email in refreshed] == ['m2']
+    email = stored_email(db, 'm2')
+    assert email.body.body_text == 'New text'
+    assert email.normalizer_version is None
@@ -0,0 +1,43 @@
+from models.database import User
+from processors.normalization_cache import NormalizationCache
+
+
+ENTRY = {'body_clean': 'Weekly digest', 'body_preview': 'Weekly digest', 'entities': {}}
+
+
+def other_user(db):
+    with db.get_session() as session:
+        record = User(email='other@example.com', name='Other', google_id='google-other')
+        session.add(record)
+        session.commit()
+        session.refresh(record)
+        return record
+
+
+def test_entries_are_not_shared_between_users(db, user):
+    cache = NormalizationCache(max_entries=10, enabled=True)
+    other = other_user(db)
+    content_hash = cache.content_hash({'body_html': '<p>Weekly digest</p>'})
+
+    cache.put_many(user.id, 'v1', {content_hash: ENTRY})
+
+    assert cache.get_many(user.id, 'v1', [content_hash]) == {content_hash: ENTRY}
+    assert cache.get_many(other.id, 'v1', [content_hash]) == {}
+
+    # The table is scoped the same way once the in-process entries are gone
+    cache.clear()
+    assert cache.get_many(other.id, 'v1', [content_hash]) == {}
+    assert cache.get_many(user.id, 'v1', [content_hash])[content_hash]['body_clean'] == 'Weekly digest'
+    assert cache.get_many(user.id, 'v2', [content_hash]) == {}
+
+
+def test_entries_are_deleted_with_their_user(db, user):
+    cache = NormalizationCache(max_entries=10, enabled=True)
+    content_hash = cache.content_hash({'body_text': 'Weekly digest'})
+    cache.put_many(user.id, 'v1', {content_hash: ENTRY})
+
+    with db.get_session() as session:
+        session.delete(session.get(User, user.id))
+        session.commit()
+
+    assert db.get_normalization_cache_entries(user.id, 'v1', [content_hash]) == {}
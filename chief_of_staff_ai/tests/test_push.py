@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from auth.gmail_auth import gmail_auth
+from ingest.gmail_fetcher import gmail_fetcher
+from ingest.push import LocalNotificationSource, PushIngest
+from processors.email_normalizer import email_normalizer
+
+
+def local_push(monkeypatch, service=object()):
+    monkeypatch.setattr(gmail_auth, 'get_gmail_service', lambda user_email: service)
+    return PushIngest(source=LocalNotificationSource(), max_workers=1)
+
+
+def test_published_notification_runs_history_sync(db, user, monkeypatch):
+    syncs = []
+
+    def fetch_recent_emails(user_email, incremental=False, **kwargs):
+        syncs.append((user_email, incremental))
+        return {'success': True, 'count': 1, 'source': 'history'}
+
+    monkeypatch.setattr(gmail_fetcher, 'fetch_recent_emails', fetch_recent_emails)
+    monkeypatch.setattr(email_normalizer, 'normalize_user_emails', lambda user_email: {'success': True})
+    db.update_user_history_id(user.id, '100')
+
+    push = local_push(monkeypatch)
+    assert push.register_watch('me@example.com')['success']
+
+    result = push.source.publish('me@example.com', 200)
+    assert result['scheduled']
+    assert push.wait_idle(timeout=5)
+
+    assert syncs == [('me@example.com', True)]
+    assert push.last_sync['me@example.com']['source'] == 'history'
+
+    # At or below the stored watermark there is nothing new to sync
+    result = push.source.publish('me@example.com', 100)
+    assert result['reason'] == 'already_synced'
+    assert push.wait_idle(timeout=5)
+    assert len(syncs) == 1
+
+
+def test_renewal_registers_expiring_watches_and_reports_failures(db, user, monkeypatch):
+    push = local_push(monkeypatch)
+    db.update_user_watch(user.id, datetime.utcnow() + timedelta(hours=2))
+
+    result = push.renew_expiring_watches()
+
+    assert result == {'success': True, 'renewed': 1, 'due': 1, 'failed': []}
+    assert 'me@example.com' in push.source.registered
+    assert db.get_user_by_email('me@example.com').gmail_watch_expires_at > datetime.utcnow() + timedelta(days=6)
+
+    # Credentials revoked: the watch cannot be renewed and is reported
+    db.update_user_watch(user.id, datetime.utcnow() + timedelta(hours=2))
+    monkeypatch.setattr(gmail_auth, 'get_gmail_service', lambda user_email: None)
+
+    result = push.renew_expiring_watches()
+
+    assert not result['success']
+    assert result['failed'] == ['me@example.com']
+
+
+def test_watch_renewer_runs_until_stopped(db, user, monkeypatch):
+    push = local_push(monkeypatch)
+    db.update_user_watch(user.id, datetime.utcnow() + timedelta(hours=2))
+
+    assert push.start_watch_renewer(interval=60)
+    assert not push.start_watch_renewer(interval=60)
+    push.stop_watch_renewer()
+    push._renewer.join(timeout=5)
+
+    assert not push._renewer.is_alive()
+    assert 'me@example.com' in push.source.registered
@@ -0,0 +1,43 @@
+import pytest
+
+from processors.quote_stripper import quote_stripper
+
+
+# (body, expected text): a sign-off only starts a signature when name, title and contact lines follow it
+SIGNATURE_CASES = [
+    ('Hi team,\n\nThanks!\nCan you send the deck by Friday?\nAlso book the room for 3pm.',
+     'Hi team,\n\nThanks!\nCan you send the deck by Friday?\nAlso book the room for 3pm.'),
+    ('Quick update.\nBest\nplan is to ship Monday',
+     'Quick update.\nBest\nplan is to ship Monday'),
+    ('Numbers attached.\n\nThanks,\nAlex\nDirector, Example Inc.\n+1 555 0100\nalex@example.com',
+     'Numbers attached.\n\nThanks,'),
+    ('Done.\n\nBest regards,\nJane Doe\nVP of Sales at Acme\nmobile: +1 555 0100',
+     'Done.\n\nBest regards,')
+]
+
+
+@pytest.mark.parametrize('body, expected', SIGNATURE_CASES)
+def test_signature_needs_contact_block_after_sign_off(body, expected):
+    assert quote_stripper.strip(body)['text'] == expected
+
+
+@pytest.mark.parametrize('body, expected, reason', [
+    ('Sounds good.\n\nOn Mon, Oct 12, 2026 at 10:00 AM Sam <sam@example.com> wrote:\n> Can we meet?\n> Thanks',
+     'Sounds good.', 'reply_header'),
+    ('See below.\n\n-----Original Message-----\nFrom: Sam\nSent: Monday\nTo: Alex\nSubject: Budget\n\nOld text',
+     'See below.', 'original_message')
+])
+def test_terminal_markers_cut_quoted_history(body, expected, reason):
+    result = quote_stripper.strip(body)
+
+    assert result['text'] == expected
+    assert result['cut_reason'] == reason
+    assert body[:result['cut_offset']].rstrip() == expected
+
+
+def test_interleaved_quotes_and_mobile_footers_are_removed_in_place():
+    result = quote_stripper.strip('Reply line\n> quoted\nafter quote\n\nSent from my iPhone')
+
+    assert result['text'] == 'Reply line\nafter quote'
+    assert result['cut_offset'] is None
+    assert [removed['reason'] for removed in result['removed']] == ['quote_block', 'mobile_footer']
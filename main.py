@@ -201,19 +201,21 @@ def create_app():
             max_emails = data.get('max_emails', 10)
             days_back = data.get('days_back', 7)
             force_refresh = data.get('force_refresh', False)
+            incremental = data.get('incremental', False)
             
-            # First fetch emails if needed
-            fetch_result = gmail_fetcher.fetch_recent_emails(
+            # Fetch, normalize and store new emails in a single streaming pass
+            fetch_result = gmail_fetcher.ingest_emails(
                 user_email=user_email,
                 limit=max_emails,
                 days_back=days_back,
+                incremental=incremental,
                 force_refresh=force_refresh
             )
             
             if not fetch_result.get('success'):
                 return jsonify(fetch_result), 400
             
-            # Normalize emails first
+            # Normalize any stored emails that were not normalized at ingest
             normalize_result = email_normalizer.normalize_user_emails(user_email, limit=max_emails)
             
             # Use intelligent processing instead of basic task extraction